@@ -0,0 +1,149 @@
+# Corpus batch mode: analyze many PDFs in one long-lived process pool
+# - inputs can be PDF paths, directories (searched recursively), glob patterns,
+#   or text files listing one path per line
+# - every finished file appends one JSON line to the manifest (status, timings,
+#   page count, error), so a crashed run can be resumed: files whose last record
+#   is "ok" and whose size/mtime did not change are skipped
+# - a corrupt PDF only produces an "error" record; a worker that dies outright
+#   (e.g. a segfault inside MuPDF) is replaced and the run continues; the files that
+#   were in flight at that moment are re-run one at a time to find the culprit
+#
+# usage: python pdf_batch.py docs/ "scans/**/*.pdf" --outdir out --workers 8
+
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List
+
+def collect_inputs(inputs: Iterable[str]) -> List[str]:
+    """Expands directories, globs and list files into a sorted, de-duplicated list of PDF paths."""
+    found: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found.extend(glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True))
+        elif os.path.isfile(item) and not item.lower().endswith(".pdf"):
+            with open(item, encoding="utf-8") as fh:
+                found.extend(ln.strip() for ln in fh if ln.strip() and not ln.startswith("#"))
+        elif any(ch in item for ch in "*?["):
+            found.extend(glob.glob(item, recursive=True))
+        else:
+            found.append(item)
+    return sorted(set(os.path.abspath(p) for p in found))
+
+def read_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """Last manifest record per input path (later lines win)."""
+    records: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path): return records
+    with open(path, encoding="utf-8") as fh:
+        for ln in fh:
+            try:
+                rec = json.loads(ln)
+            except json.JSONDecodeError:
+                continue  # torn last line after a crash
+            records[rec["path"]] = rec
+    return records
+
+def _is_done(rec: Dict[str, Any] | None, path: str) -> bool:
+    if not rec or rec.get("status") != "ok" or not os.path.exists(rec.get("output") or ""): return False
+    st = os.stat(path)
+    return rec.get("size") == st.st_size and rec.get("mtime") == st.st_mtime
+
+def output_path(pdf_path: str, outdir: str) -> str:
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    tag = hashlib.sha1(pdf_path.encode("utf-8")).hexdigest()[:8]  # same names in different folders
+    return os.path.join(outdir, f"{stem}_{tag}.json")
+
+def _warm_worker():
+    import pdf_parser  # noqa: F401  (pay the import once per worker, not once per file)
+
+def _run_one(pdf_path: str, outdir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    import pdf_parser
+    from pdf_cache import file_sha256
+    rec: Dict[str, Any] = {"path": pdf_path, "pid": os.getpid()}
+    t0 = time.perf_counter()
+    try:
+        st = os.stat(pdf_path)
+        rec.update(size=st.st_size, mtime=st.st_mtime, sha256=file_sha256(pdf_path))
+        struct = pdf_parser.analyze_pdf(pdf_path, output_dir=os.path.join(outdir, "assets"), **options)
+        t1 = time.perf_counter()
+        out = output_path(pdf_path, outdir)
+        pdf_parser.save_structure_json(struct, out)
+        rec.update(status="ok", output=out, page_count=struct.get("page_count", 0),
+                   analyze_seconds=round(t1 - t0, 4), write_seconds=round(time.perf_counter() - t1, 4))
+    except Exception as e:
+        rec.update(status="error", error=f"{type(e).__name__}: {e}")
+    rec["seconds"] = round(time.perf_counter() - t0, 4)
+    return rec
+
+def run_batch(inputs: Iterable[str], outdir: str = "batch_out", manifest: str | None = None, workers: int = 4,
+              resume: bool = True, **options) -> Dict[str, int]:
+    """
+    Analyzes every input PDF with analyze_pdf(**options) and writes <outdir>/<name>_<tag>.json.
+    Returns counts of ok / error / skipped files.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    manifest = manifest or os.path.join(outdir, "manifest.jsonl")
+    done = read_manifest(manifest) if resume else {}
+    paths = collect_inputs(inputs)
+    todo = [p for p in paths if not (os.path.exists(p) and _is_done(done.get(p), p))]
+    counts = {"ok": 0, "error": 0, "skipped": len(paths) - len(todo)}
+    print(f"[batch] {len(paths)} file(s), {counts['skipped']} already done, {len(todo)} to run")
+    queue = list(reversed(todo))
+
+    with open(manifest, "a", encoding="utf-8") as mf:
+        def record(rec: Dict[str, Any]):
+            rec["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            mf.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            mf.flush()
+            counts[rec["status"]] += 1
+            extra = f"{rec.get('page_count', 0)} page(s)" if rec["status"] == "ok" else rec.get("error")
+            print(f"[batch] {rec['status']:5s} {rec['seconds']:8.2f}s {os.path.basename(rec['path'])}: {extra}")
+
+        suspects: List[str] = []
+        while queue or suspects:
+            # After a crash, the files that were in flight are re-run one at a time so that
+            # only the file that actually kills its worker gets the error record
+            isolate = bool(suspects)
+            source, limit = (suspects, 1) if isolate else (queue, workers * 2)
+            pool = ProcessPoolExecutor(max_workers=1 if isolate else workers, initializer=_warm_worker)
+            in_flight: Dict[Any, str] = {}
+            try:
+                while source or in_flight:
+                    while source and len(in_flight) < limit:
+                        in_flight[pool.submit(_run_one, source[-1], outdir, options)] = source[-1]
+                        source.pop()
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        if isinstance(fut.exception(), BrokenProcessPool): raise BrokenProcessPool()
+                        record(fut.result())
+                        del in_flight[fut]
+            except BrokenProcessPool:
+                if isolate:
+                    for path in in_flight.values():
+                        record({"path": path, "status": "error", "error": "worker process crashed", "seconds": 0.0})
+                else:
+                    suspects.extend(in_flight.values())
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+    print(f"[batch] done: {counts['ok']} ok, {counts['error']} error(s), {counts['skipped']} skipped. Manifest: {manifest}")
+    return counts
+
+if __name__ == "__main__":
+    import argparse
+    from pdf_images import DEFAULT_IMAGE_MODE, IMAGE_MODES
+    parser = argparse.ArgumentParser(description="Batch PDF extraction with a resumable manifest")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories, glob patterns or text files listing paths")
+    parser.add_argument("--outdir", default="batch_out", help="output dir for JSON files, assets and the manifest")
+    parser.add_argument("--manifest", default=None, help="manifest path (default: <outdir>/manifest.jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--images", default=DEFAULT_IMAGE_MODE, choices=IMAGE_MODES, help="image handling: none, metadata, lazy or eager")
+    parser.add_argument("--cache", default=None, help="SQLite file for the per-page result cache")
+    parser.add_argument("--no-resume", action="store_true", help="re-run files that the manifest lists as done")
+    args = parser.parse_args()
+    result = run_batch(args.inputs, outdir=args.outdir, manifest=args.manifest, workers=args.workers,
+                       resume=not args.no_resume, images=args.images, cache=args.cache)
+    raise SystemExit(1 if result["error"] else 0)
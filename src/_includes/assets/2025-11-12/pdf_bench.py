@@ -0,0 +1,302 @@
+# Benchmarks for the extraction + layout pipeline
+# - synthetic PDFs generated with PyMuPDF (page count, span density, columns, table size,
+#   image reuse and vector density are all controlled), plus the sample PDFs next to this file
+# - every case runs in a fresh process, so its peak RSS is its own
+# - per-stage wall time comes from the pipeline's own metrics (analyze_pdf(metrics=True))
+# - results can be saved as a baseline JSON and later runs compared against it
+# - --startup measures cold start (interpreter + import + one-page analyze_pdf) in fresh
+#   interpreters, with and without the optional matplotlib/sklearn backends preloaded
+#
+# usage: python pdf_bench.py --save bench_baselines/before.json
+#        python pdf_bench.py --compare bench_baselines/before.json
+#        python pdf_bench.py --quick --only spans_
+#        python pdf_bench.py --startup --only sample_test-pdf
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_PDFS = ("test-pdf.pdf", "test-doc-2.pdf", "test-doc-3.pdf", "green-on-green.pdf")
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore".split()
+
+# -------------------------
+# Synthetic documents
+# -------------------------
+
+def make_synthetic_pdf(path: str, pages: int = 4, spans_per_page: int = 400, columns: int = 2,
+                       table_rows: int = 10, table_cols: int = 5, table_ruled: bool = False, images_per_page: int = 0,
+                       image_reuse: float = 1.0, vectors_per_page: int = 0, vector_chart: bool = False,
+                       seed: int = 0) -> str:
+    """
+    Writes a deterministic test PDF. Body text fills `columns` columns with roughly `spans_per_page`
+    one-word spans (alternating fonts keep MuPDF from merging them), followed by a
+    `table_rows` x `table_cols` grid of cells (`table_ruled` draws its grid lines; rows that do not
+    fit on the page are dropped). `image_reuse` is the share of images that repeat
+    one shared picture instead of a unique one; vectors are small outlined rectangles in one path,
+    or with `vector_chart` one path per mark (filled dots and diagonal strokes, like a scatter chart).
+    """
+    import fitz
+    import numpy as np
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    fonts = ("helv", "tiro")
+    width, height, margin = 612, 792, 36
+    table_h = min(table_rows * 11, height - 2 * margin - 12) if table_rows and table_cols else 0
+    body_bottom = height - margin - table_h - (12 if table_h else 0)
+    col_w = (width - 2 * margin) / max(columns, 1)
+    shared_png = _png(rnd, 0)
+    for pno in range(pages):
+        page = doc.new_page(width=width, height=height)
+        # Font size shrinks with density so the requested span count fits on the page
+        rows = max(1, int((body_bottom - margin) / 11))
+        per_row = max(1, -(-spans_per_page // (rows * max(columns, 1))))
+        fs = max(3.0, min(10.0, col_w / (per_row * 5.2)))
+        placed = 0
+        for c in range(max(columns, 1)):
+            y = margin + fs
+            while y < body_bottom and placed < spans_per_page:
+                x, k = margin + c * col_w, 0
+                while placed < spans_per_page:
+                    word = rnd.choice(WORDS)
+                    w = fitz.get_text_length(word, fontname=fonts[k % 2], fontsize=fs)
+                    if x + w > margin + (c + 1) * col_w - 8: break
+                    page.insert_text((x, y), word, fontsize=fs, fontname=fonts[k % 2])
+                    x += w + fs * 0.3
+                    k += 1
+                    placed += 1
+                y += fs * 1.25 + (fs if rnd.random() < 0.1 else 0)  # occasional paragraph break
+        y = body_bottom + 12
+        cell_w = (width - 2 * margin) / max(table_cols, 1)
+        top = y - 8
+        for r in range(table_rows if table_cols else 0):
+            if y > height - margin: break
+            for k in range(table_cols):
+                page.insert_text((margin + k * cell_w + 2, y), f"r{r}c{k} {rnd.randint(0, 9999)}", fontsize=7)
+            y += 11
+        if table_ruled and y - 8 > top:
+            grid = page.new_shape()
+            for yy in np.arange(top, y - 7, 11):
+                grid.draw_line((margin, yy), (width - margin, yy))
+            for k in range(table_cols + 1):
+                grid.draw_line((margin + k * cell_w, top), (margin + k * cell_w, y - 8))
+            grid.finish(color=(0, 0, 0), width=0.5)
+            grid.commit()
+        for i in range(images_per_page):
+            png = shared_png if rnd.random() < image_reuse else _png(rnd, pno * 1000 + i + 1)
+            x0, y0 = rnd.uniform(margin, width - 120), rnd.uniform(margin, height - 120)
+            page.insert_image(fitz.Rect(x0, y0, x0 + 48, y0 + 48), stream=png, overlay=False)
+        if vectors_per_page and vector_chart:
+            for i in range(vectors_per_page):
+                shape = page.new_shape()
+                x0, y0 = rnd.uniform(margin, width - margin), rnd.uniform(margin, height - margin)
+                if i % 2:
+                    shape.draw_line((x0, y0), (x0 + rnd.uniform(2, 12), y0 + rnd.uniform(-8, 8)))
+                    shape.finish(color=(0.2, 0.3, 0.8), width=0.8)
+                else:
+                    shape.draw_circle((x0, y0), 1.5)
+                    shape.finish(color=None, fill=(0.8, 0.2, 0.2))
+                shape.commit(overlay=False)
+        elif vectors_per_page:
+            shape = page.new_shape()
+            for _ in range(vectors_per_page):
+                x0, y0 = rnd.uniform(0, width - 40), rnd.uniform(0, height - 20)
+                shape.draw_rect(fitz.Rect(x0, y0, x0 + rnd.uniform(2, 40), y0 + rnd.uniform(2, 20)))
+            shape.finish(color=(0.6, 0.6, 0.6), width=0.5)
+            shape.commit(overlay=False)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+def _png(rnd: random.Random, salt: int) -> bytes:
+    import fitz
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+    pix.set_rect(pix.irect, (rnd.randint(0, 255), rnd.randint(0, 255), salt % 256))
+    return pix.tobytes("png")
+
+def default_cases(quick: bool = False) -> List[Dict[str, Any]]:
+    """Benchmark cases: the sample PDFs plus page-count and span-density sweeps and feature-heavy documents."""
+    cases = [{"name": f"sample_{os.path.splitext(f)[0]}", "pdf": os.path.join(HERE, f)} for f in SAMPLE_PDFS]
+    page_steps = (1, 4, 16) if quick else (1, 4, 16, 64)
+    span_steps = (100, 400, 1600) if quick else (100, 400, 1600, 6400)
+    cases += [{"name": f"pages_{n}", "synthetic": {"pages": n, "spans_per_page": 400}} for n in page_steps]
+    cases += [{"name": f"spans_{n}", "synthetic": {"pages": 4, "spans_per_page": n}} for n in span_steps]
+    cases += [
+        {"name": "columns_4", "synthetic": {"pages": 4, "spans_per_page": 800, "columns": 4}},
+        {"name": "table_30x8", "synthetic": {"pages": 4, "spans_per_page": 200, "table_rows": 30, "table_cols": 8}},
+        {"name": "table_5000_rows", "synthetic": {"pages": 100, "spans_per_page": 0, "table_rows": 50, "table_cols": 6}},
+        {"name": "table_5000_ruled", "synthetic": {"pages": 100, "spans_per_page": 0, "table_rows": 50, "table_cols": 6,
+                                                   "table_ruled": True}},
+        {"name": "images_shared", "synthetic": {"pages": 8, "images_per_page": 8, "image_reuse": 1.0}},
+        {"name": "images_unique", "synthetic": {"pages": 8, "images_per_page": 8, "image_reuse": 0.0}},
+        {"name": "vectors_2000", "synthetic": {"pages": 4, "vectors_per_page": 2000}},
+        {"name": "vectors_chart", "synthetic": {"pages": 4, "vectors_per_page": 5000, "vector_chart": True}},
+    ]
+    return cases
+
+# -------------------------
+# Measurement
+# -------------------------
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+def _run_case(pdf_path: str, repeat: int, images: str) -> Dict[str, Any]:
+    # Runs in a fresh process: import cost and peak RSS belong to this case only
+    t0 = time.perf_counter()
+    import pdf_parser
+    import_seconds = time.perf_counter() - t0
+    rss_start = _peak_rss_mb()
+    best: Dict[str, Any] | None = None
+    for _ in range(max(1, repeat)):
+        assets = tempfile.mkdtemp(prefix="pdf_bench_assets_")
+        try:
+            t0 = time.perf_counter()
+            struct = pdf_parser.analyze_pdf(pdf_path, output_dir=assets, images=images, metrics=True)
+            total = time.perf_counter() - t0
+        finally:
+            shutil.rmtree(assets, ignore_errors=True)
+        if best is None or total < best["seconds"]:
+            stages = dict(struct["metrics"]["stages"])
+            stages["other"] = max(0.0, total - sum(stages.values()))
+            best = {"seconds": total, "stages": {k: round(v, 6) for k, v in stages.items()}}
+    counts = struct["metrics"]["counts"]
+    best.update(
+        pages=struct["page_count"], spans=counts.get("spans", 0), lines=counts.get("lines", 0),
+        tables=counts.get("tables", 0), images=counts.get("images", 0), vectors=counts.get("drawings", 0),
+        import_seconds=round(import_seconds, 4), rss_start_mb=round(rss_start, 1), peak_rss_mb=round(_peak_rss_mb(), 1),
+    )
+    best["pages_per_second"] = round(best["pages"] / best["seconds"], 2) if best["seconds"] else None
+    best["spans_per_second"] = round(best["spans"] / best["seconds"], 1) if best["seconds"] else None
+    best["seconds"] = round(best["seconds"], 6)
+    return best
+
+# Child script of startup_benchmark: `preload` stands in for what pdf_parser used to import eagerly
+_STARTUP_SCRIPT = """
+import sys, tempfile, time
+t0 = time.perf_counter()
+{preload}
+import pdf_parser
+t1 = time.perf_counter()
+pdf_parser.analyze_pdf(sys.argv[1], output_dir=tempfile.mkdtemp(prefix="pdf_bench_startup_"), images="none")
+t2 = time.perf_counter()
+heavy = sorted(m for m in ("matplotlib", "sklearn", "scipy") if m in sys.modules)
+print(round(t1 - t0, 6), round(t2 - t1, 6), ",".join(heavy))
+"""
+STARTUP_VARIANTS = {
+    "core": "",
+    "with_matplotlib": "import matplotlib.pyplot",
+    "with_matplotlib_sklearn": "import matplotlib.pyplot, sklearn.cluster",
+}
+
+def startup_benchmark(pdf_path: str, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Cold-start cost of one-page extraction in fresh interpreters: process wall time, import time
+    and first analyze_pdf call (fastest of `repeat`). Variants that fail (backend not installed) are skipped.
+    """
+    results: Dict[str, Any] = {}
+    for name, preload in STARTUP_VARIANTS.items():
+        script = _STARTUP_SCRIPT.format(preload=preload)
+        best = None
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", script, pdf_path], cwd=HERE, capture_output=True, text=True)
+            wall = time.perf_counter() - t0
+            if proc.returncode != 0: break
+            import_s, analyze_s, heavy = (proc.stdout.strip().splitlines()[-1].split(" ") + [""])[:3]
+            if best is None or wall < best["wall_seconds"]:
+                best = {"wall_seconds": round(wall, 4), "import_seconds": float(import_s),
+                        "analyze_seconds": float(analyze_s), "heavy_modules": [m for m in heavy.split(",") if m]}
+        if best is None:
+            print(f"[warn] startup variant {name} failed: {proc.stderr.strip().splitlines()[-1:]}"); continue
+        results[name] = best
+        print(f"startup {name:24s} wall {best['wall_seconds']:.3f}s  import {best['import_seconds']:.3f}s  "
+              f"analyze {best['analyze_seconds']:.3f}s  heavy: {','.join(best['heavy_modules']) or '-'}")
+    return results
+
+# -------------------------
+# Runner and baselines
+# -------------------------
+
+def run_benchmarks(cases: List[Dict[str, Any]], workdir: str | None = None, repeat: int = 3,
+                   images: str = "eager") -> Dict[str, Any]:
+    """Generates missing synthetic PDFs into `workdir` and runs every case in its own process."""
+    import fitz
+    import numpy as np
+    workdir = workdir or os.path.join(tempfile.gettempdir(), "pdf_bench")
+    os.makedirs(workdir, exist_ok=True)
+    ctx = multiprocessing.get_context("spawn")
+    results: Dict[str, Any] = {}
+    for case in cases:
+        pdf = case.get("pdf")
+        if pdf is None:
+            spec = case["synthetic"]
+            tag = "_".join(f"{k}{v}" for k, v in sorted(spec.items()))
+            pdf = os.path.join(workdir, f"{case['name']}_{tag}.pdf")
+            if not os.path.exists(pdf): make_synthetic_pdf(pdf, **spec)
+        if not os.path.exists(pdf):
+            print(f"[warn] skipping {case['name']}: {pdf} not found"); continue
+        with ctx.Pool(1) as pool:
+            res = pool.apply(_run_case, (pdf, repeat, images))
+        res["pdf"] = os.path.basename(pdf)
+        if "synthetic" in case: res["synthetic"] = case["synthetic"]
+        results[case["name"]] = res
+        top = sorted(res["stages"].items(), key=lambda kv: -kv[1])[:3]
+        print(f"{case['name']:22s} {res['pages']:4d} pg {res['spans']:7d} spans {res['seconds']:8.3f}s "
+              f"{res['pages_per_second'] or 0:8.1f} pg/s {res['peak_rss_mb']:7.1f} MB  "
+              + ", ".join(f"{k} {v:.3f}s" for k, v in top))
+    meta = {"python": platform.python_version(), "pymupdf": fitz.VersionBind, "numpy": np.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "repeat": repeat, "images": images,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "cases": results}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 1.2) -> List[str]:
+    """Prints time/RSS ratios against a saved baseline; returns the cases slower than `threshold`x."""
+    regressions = []
+    for name, res in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base: continue
+        ratio = res["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        rss = res["peak_rss_mb"] / base["peak_rss_mb"] if base.get("peak_rss_mb") else 1.0
+        worst = sorted(((res["stages"].get(k, 0.0) - v, k) for k, v in base["stages"].items()), reverse=True)[0]
+        flag = "REGRESSION" if ratio > threshold else ("faster" if ratio < 1 / threshold else "")
+        print(f"{name:22s} time x{ratio:5.2f}  rss x{rss:5.2f}  biggest stage change: {worst[1]} {worst[0]:+.3f}s  {flag}")
+        if ratio > threshold: regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the PDF extraction and layout pipeline")
+    parser.add_argument("--quick", action="store_true", help="smaller page/span sweeps")
+    parser.add_argument("--only", default=None, help="run only cases whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (the fastest one is reported)")
+    parser.add_argument("--images", default="eager", help="image mode passed to analyze_pdf")
+    parser.add_argument("--workdir", default=None, help="where generated PDFs are kept between runs")
+    parser.add_argument("--save", default=None, help="write results to this baseline JSON")
+    parser.add_argument("--compare", default=None, help="compare against this baseline JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    parser.add_argument("--startup", action="store_true", help="also measure cold start (import + one-page analyze)")
+    args = parser.parse_args()
+    selected = [c for c in default_cases(args.quick) if not args.only or args.only in c["name"]]
+    result = run_benchmarks(selected, workdir=args.workdir, repeat=args.repeat, images=args.images)
+    if args.startup:
+        result["startup"] = startup_benchmark(os.path.join(HERE, SAMPLE_PDFS[0]), repeat=max(args.repeat, 5))
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline: {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressed = compare(result, json.load(f), threshold=args.threshold)
+        raise SystemExit(1 if regressed else 0)
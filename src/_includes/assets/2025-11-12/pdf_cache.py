@@ -0,0 +1,138 @@
+# Persistent per-page result cache (single SQLite file, size-bounded LRU)
+# Entries are keyed by (document content hash, page number, stage, parameter fingerprint):
+# - stage "extract": the raw page from extract_page (span table, images, vectors)
+# - stage "layout":  the fully analyzed page
+# The layout fingerprint includes the extract fingerprint, so changing e.g. a table threshold
+# misses only the layout entry and re-runs the heuristics on the cached extraction instead
+# of re-parsing the PDF.
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from multiprocessing.util import Finalize
+from typing import Any, Dict
+
+DEFAULT_CACHE_BYTES = 2 * 1024 ** 3
+RESYNC_PUTS = 256  # puts between recounts of the cache size (other processes write to the same file)
+
+# Connections of caches unpickled in this process (worker side), one per path and shared by
+# every chunk the process runs; closed when the process exits
+_shared: Dict[str, sqlite3.Connection] = {}
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file, used as the document identity."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def fingerprint(params: Dict[str, Any]) -> str:
+    """Stable short hash of a parameter dict."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path, timeout=60, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("""CREATE TABLE IF NOT EXISTS pages (
+        key TEXT PRIMARY KEY, doc TEXT, page INTEGER, stage TEXT,
+        size INTEGER, last_used REAL, value BLOB)""")
+    db.execute("CREATE INDEX IF NOT EXISTS pages_lru ON pages (last_used)")
+    return db
+
+def _shared_connection(path: str) -> sqlite3.Connection:
+    db = _shared.get(path)
+    if db is None:
+        if not _shared: Finalize(None, close_shared_connections, exitpriority=0)  # runs on worker exit too
+        db = _shared[path] = _connect(path)
+    return db
+
+def close_shared_connections():
+    for db in _shared.values(): db.close()
+    _shared.clear()
+
+class PageCache:
+    """
+    On-disk LRU of pickled page results. Safe to open from several processes at once
+    (WAL journal). The instance that was created keeps the size and evicts; copies pickled to
+    worker processes only read and write, through one connection per process, and the owner
+    catches up on their writes with trim() once the run is over.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.path, self.max_bytes = path, max_bytes
+        self._connection = _connect(path)
+        self._owner = True
+        # Running size total, so a put does not have to sum the whole table; counted on the first put
+        self._total, self._puts = None, 0
+
+    def __getstate__(self):
+        # Travel to worker processes as (path, max_bytes)
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.path, self.max_bytes = state["path"], state["max_bytes"]
+        self._connection = None  # connected on first use
+        self._owner, self._total, self._puts = False, None, 0
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None: self._connection = _shared_connection(os.path.abspath(self.path))
+        return self._connection
+
+    @staticmethod
+    def _key(doc_hash: str, page: int, stage: str, params_fp: str) -> str:
+        return f"{doc_hash}:{page}:{stage}:{params_fp}"
+
+    def get(self, doc_hash: str, page: int, stage: str, params_fp: str) -> Any | None:
+        key = self._key(doc_hash, page, stage, params_fp)
+        row = self._db.execute("SELECT value FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None: return None
+        self._db.execute("UPDATE pages SET last_used = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, doc_hash: str, page: int, stage: str, params_fp: str, value: Any):
+        key = self._key(doc_hash, page, stage, params_fp)
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 3)
+        old = self._db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone() if self._owner else None
+        self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, doc_hash, page, stage, len(blob), time.time(), blob))
+        if not self._owner: return
+        self._puts += 1
+        if self._total is None or self._puts % RESYNC_PUTS == 0: self._total = self._size()
+        else: self._total += len(blob) - (old[0] if old else 0)
+        if self._total > self.max_bytes: self._evict()
+
+    def trim(self):
+        """Recounts the size (workers wrote without counting) and evicts down to max_bytes."""
+        self._total = self._size()
+        if self._total > self.max_bytes: self._evict()
+
+    def _size(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under the limit
+        for key, size in self._db.execute("SELECT key, size FROM pages ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self._total -= size
+            if self._total <= self.max_bytes: break
+
+    def drop_document(self, doc_hash: str):
+        self._db.execute("DELETE FROM pages WHERE doc = ?", (doc_hash,))
+        if self._total is not None: self._total = self._size()
+
+    def stats(self) -> Dict[str, int]:
+        n, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"entries": n, "bytes": total}
+
+    def close(self):
+        # A worker's shared connection outlives this copy; close_shared_connections ends it
+        if self._owner: self._connection.close()
+        else: self._connection = None
@@ -0,0 +1,225 @@
+# Duplicate pages and recurring header/footer lines (opt-in: analyze_pdf(..., dedup=True), CLI --dedup)
+# - exact:       page_key hashes every non-boilerplate span (text, font, size, flags, bbox) and
+#                vector row plus the page size; pages with equal keys get the same
+#                layout result, so it is computed once and reused (LayoutMemo within a worker, the
+#                page cache across runs and documents). The key travels with the page
+#                (CONTENT_KEY) to the parent, which sets page["duplicate_of"] to the first page
+#                with that key in page order, so the flags do not depend on the worker split
+# - near:        MinHash over span shingles (text + coarse position), LSH bands in a plain dict;
+#                pages at or above NEAR_DUPLICATE_SIMILARITY get page["near_duplicate_of"] (also
+#                assigned in the parent, in page order)
+# - boilerplate: before layout, lines in the top and bottom `boilerplate_margin` of every page are
+#                reduced to keys (text with page numbers masked, distance from the nearest edge; x is
+#                ignored so alternating left/right page numbers match). Keys on at least
+#                `boilerplate_min_pages` pages, and on half of the pages (of an evenly spread sample),
+#                are boilerplate. The spans of those lines are taken out before
+#                layout (no columns, tables or paragraphs) and come back afterwards, appended to
+#                page["text"] and as their own lines with "boilerplate": true
+#
+# Exact matching is a dict keyed by content hash (first page wins), as in assets/python-dedup.ipynb;
+# the rest is set/Counter based, only the MinHash permutations use NumPy.
+
+import hashlib
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Set
+
+import numpy as np
+
+from pdf_spans import SpanTable, group_lines
+from pdf_vectors import VectorTable
+
+BAND_SNAP = 2.0                    # pt; header/footer positions are compared on this grid
+MAX_MASKED_NUMBERS = 2             # header/footer lines with up to this many numbers match with any numbers
+BOILERPLATE_MIN_SHARE = 0.5        # ...and must recur on at least this share of the pages
+BOILERPLATE_SAMPLE = 16            # pages scanned for boilerplate, evenly spread over the document
+NUM_PERM = 64                      # MinHash signature length
+LSH_BANDS = 16                     # NUM_PERM / LSH_BANDS rows per band
+NEAR_DUPLICATE_SIMILARITY = 0.8    # estimated Jaccard similarity of the span shingles
+SHINGLE_GRID = 10.0                # pt; span positions in shingles are snapped to this grid
+
+CONTENT_KEY = "_content_key"       # page_key of an analyzed page, on its way to the parent process
+
+_MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(20251112)
+# Universal hashing (a * x + b) mod p with a, b uniform below p; a is split into 29 + 32 bits so
+# every partial product of a 32-bit x fits into uint64
+_PERM_A = _rng.integers(1, _MERSENNE, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE, NUM_PERM, dtype=np.uint64)
+_A_HI, _A_LO = _PERM_A >> np.uint64(32), _PERM_A & np.uint64(0xFFFFFFFF)
+_DIGITS = re.compile(r"\d+")
+
+# -------------------------
+# Boilerplate (recurring header/footer lines)
+# -------------------------
+
+def _mask(text: str) -> str:
+    # Page numbers and dates vary between pages; lines with more numbers than that (table rows)
+    # only count when they repeat verbatim
+    text = " ".join(text.lower().split())
+    return _DIGITS.sub("#", text) if len(_DIGITS.findall(text)) <= MAX_MASKED_NUMBERS else text
+
+def band_lines(spans: SpanTable, height: float, margin: float) -> Iterator[tuple]:
+    """(key, span indices) per line of the spans inside the top or bottom `margin` of the page."""
+    d = spans.data
+    for zone, inside in (("t", d["y1"] <= height * margin), ("b", d["y0"] >= height * (1 - margin))):
+        idx = np.flatnonzero(inside)
+        if not idx.size: continue
+        lines = group_lines(SpanTable(d[idx], spans.fonts, spans.texts))
+        for i in range(len(lines)):
+            edge = lines.y0[i] if zone == "t" else height - lines.y1[i]
+            yield f"{zone}{round(float(edge) / BAND_SNAP)}:{_mask(lines.text[i])}", idx[lines.order[lines.starts[i]:lines.starts[i + 1]]]
+
+class BoilerplateIndex:
+    """Counts on how many pages each header/footer key occurs; feed it pages of one document or a corpus."""
+
+    def __init__(self, min_pages: int = 3, min_share: float = BOILERPLATE_MIN_SHARE):
+        self.min_pages, self.min_share = min_pages, min_share
+        self.counts: Counter = Counter()
+        self.pages = 0
+
+    def add(self, keys: Iterable[str | None]):
+        self.counts.update({k for k in keys if k is not None})
+        self.pages += 1
+
+    def keys(self) -> frozenset:
+        need = max(self.min_pages, self.min_share * self.pages)
+        return frozenset(k for k, n in self.counts.items() if n >= need)
+
+def scan_boilerplate(doc: "fitz.Document", margin: float, min_pages: int, sample: int = BOILERPLATE_SAMPLE) -> frozenset:
+    """
+    Boilerplate keys of a document from `sample` evenly spread pages (all pages of shorter
+    documents); only the top and bottom margin bands of those pages are extracted.
+    """
+    import fitz
+    index = BoilerplateIndex(min(min_pages, sample))
+    for pno in sorted(set(np.linspace(0, len(doc) - 1, min(len(doc), sample)).round().astype(int).tolist())):
+        page = doc[pno]
+        r = page.rect
+        keys: List[str | None] = []
+        for clip in (fitz.Rect(r.x0, r.y0, r.x1, r.y0 + r.height * margin),
+                     fitz.Rect(r.x0, r.y1 - r.height * margin, r.x1, r.y1)):
+            keys += [k for k, _ in band_lines(SpanTable.from_text_dict(page.get_text("dict", clip=clip)), r.height, margin)]
+        index.add(keys)
+    return index.keys()
+
+def split_boilerplate(spans: SpanTable, height: float, margin: float, boilerplate: Set[str]) -> tuple:
+    """
+    (content, boilerplate spans or None). Nothing is split off when no span, or every span, is
+    boilerplate (a page holding only a running header is analyzed as it is).
+    """
+    if not boilerplate or not len(spans): return spans, None
+    flagged = np.zeros(len(spans), dtype=bool)
+    for key, members in band_lines(spans, height, margin):
+        if key in boilerplate: flagged[members] = True
+    if not flagged.any() or flagged.all(): return spans, None
+    return SpanTable(spans.data[~flagged], spans.fonts, spans.texts), SpanTable(spans.data[flagged], spans.fonts, spans.texts)
+
+def add_boilerplate(page: Dict[str, Any], extra: SpanTable | None) -> Dict[str, Any]:
+    """Appends boilerplate spans and their lines ("boilerplate": true) to an analyzed page, as new lists."""
+    if extra is None: return page
+    span_dicts = extra.to_dicts()
+    lines = group_lines(extra).to_dicts(span_dicts, with_col=False)
+    for ln in lines: ln["boilerplate"] = True
+    page["text"] = page.get("text", []) + span_dicts
+    page["lines"] = page.get("lines", []) + lines
+    return page
+
+# -------------------------
+# Exact duplicates
+# -------------------------
+
+def page_key(spans: SpanTable, vectors: VectorTable, width: float, height: float) -> str:
+    """Hash of everything analyze_page looks at."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((width, height)).encode())
+    d = spans.data
+    h.update(np.ascontiguousarray(d[["x0", "y0", "x1", "y1", "size", "flags"]]).tobytes())
+    h.update("\x00".join(spans.texts[i] for i in d["text"].tolist()).encode("utf-8", "surrogatepass"))
+    h.update("\x00".join(str(spans.fonts[i]) for i in d["font"].tolist()).encode("utf-8", "surrogatepass"))
+    h.update(vectors.data.tobytes())
+    return h.hexdigest()
+
+# Keys of an analyzed page that depend only on its spans and vectors
+LAYOUT_KEYS = ("text", "vectors", "vectors_dropped", "tables", "lines", "paragraphs_by_col")
+
+class LayoutMemo:
+    """
+    page_key -> layout result of the first page with that key (LRU of `max_pages`). Reused pages
+    share the layout lists and dicts with that first page; copy them before mutating one.
+    """
+
+    def __init__(self, max_pages: int = 256):
+        self.max_pages = max_pages
+        self._pages: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def reuse(self, key: str, raw: Dict[str, Any]) -> Dict[str, Any] | None:
+        """`raw` completed with the layout of an earlier equal page, or None."""
+        first = self._pages.get(key)
+        if first is None: return None
+        self._pages.move_to_end(key)
+        return with_layout(raw, first)
+
+    def remember(self, key: str, page: Dict[str, Any]):
+        self._pages[key] = layout_part(page)
+        if len(self._pages) > self.max_pages: self._pages.popitem(last=False)
+
+def with_layout(raw: Dict[str, Any], analyzed: Dict[str, Any]) -> Dict[str, Any]:
+    """`raw` (an extracted page) with the LAYOUT_KEYS of `analyzed` (a page or a layout_part)."""
+    # same key order as analyze_page: raw keys in place, then the keys layout appends
+    page = {k: analyzed.get(k, v) if k in LAYOUT_KEYS else v for k, v in raw.items()}
+    page.update((k, v) for k, v in analyzed.items() if k in LAYOUT_KEYS and k not in page)
+    return page
+
+def layout_part(page: Dict[str, Any]) -> Dict[str, Any]:
+    """The LAYOUT_KEYS of an analyzed page (what the page cache stores under a page_key)."""
+    return {k: page[k] for k in LAYOUT_KEYS if k in page}
+
+# -------------------------
+# Near duplicates (MinHash + LSH)
+# -------------------------
+
+def page_shingles(span_dicts: Sequence[Dict[str, Any]]) -> Set[str]:
+    return {f"{s['text']}|{round(s['bbox'][0] / SHINGLE_GRID)}|{round(s['bbox'][1] / SHINGLE_GRID)}" for s in span_dicts}
+
+def _mod_mersenne(v: np.ndarray) -> np.ndarray:
+    # v mod 2**61 - 1 for any uint64 v (2**61 = 1 mod p)
+    v = (v & np.uint64(_MERSENNE)) + (v >> np.uint64(61))
+    return np.where(v >= np.uint64(_MERSENNE), v - np.uint64(_MERSENNE), v)
+
+def permute(x: np.ndarray) -> np.ndarray:
+    """(NUM_PERM, n) values (a * x + b) mod 2**61 - 1 of 32-bit hashes `x`, computed without overflow."""
+    x = x[None, :]
+    hi = _mod_mersenne(_A_HI[:, None] * x)  # a_hi < 2**29: product < 2**61
+    # hi * 2**32 mod p: the bits shifted past 2**61 come back at the bottom
+    hi = ((hi & np.uint64((1 << 29) - 1)) << np.uint64(32)) + (hi >> np.uint64(29))
+    lo = _mod_mersenne(_A_LO[:, None] * x)  # both factors < 2**32: product < 2**64
+    return _mod_mersenne(_mod_mersenne(hi + lo) + _PERM_B[:, None])
+
+def minhash(shingles: Iterable[str]) -> np.ndarray:
+    """NUM_PERM-long MinHash signature; an empty set gives all _MERSENNE."""
+    x = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8", "surrogatepass"), digest_size=4).digest(), "little")
+                  for s in shingles], dtype=np.uint64)
+    if not x.size: return np.full(NUM_PERM, _MERSENNE, dtype=np.uint64)
+    return permute(x).min(axis=1)
+
+class NearDuplicateIndex:
+    """Signatures bucketed by LSH band; add() returns the most similar earlier page above the threshold."""
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_SIMILARITY):
+        self.threshold = threshold
+        self._buckets: Dict[tuple, List[Any]] = {}
+        self._sigs: Dict[Any, np.ndarray] = {}
+
+    def add(self, page_id: Any, sig: np.ndarray) -> tuple | None:
+        """(earlier page_id, estimated similarity) or None; the page is indexed either way."""
+        rows = NUM_PERM // LSH_BANDS
+        bands = [(b, sig[b * rows:(b + 1) * rows].tobytes()) for b in range(LSH_BANDS)]
+        candidates = {other for band in bands for other in self._buckets.get(band, ())}
+        best = None
+        for other in candidates:
+            sim = float(np.mean(self._sigs[other] == sig))
+            if sim >= self.threshold and (best is None or sim > best[1]): best = (other, sim)
+        for band in bands: self._buckets.setdefault(band, []).append(page_id)
+        self._sigs[page_id] = sig
+        return best
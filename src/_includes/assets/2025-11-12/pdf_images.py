@@ -0,0 +1,87 @@
+# Content-addressed image extraction
+# Every image is written as img_<sha256 prefix>.<ext>: an xref is decoded at most once per
+# store, and identical payloads (same logo under different xrefs, or seen by different
+# worker processes) end up in the same file, which is only written if it does not exist yet.
+#
+# Modes for extract_page(..., images=...):
+# - "none":     no image entries at all, get_images is not even called
+# - "metadata": bbox, xref and pixel size from the page's image list, nothing is decoded
+# - "lazy":     like "metadata" plus filename/ext placeholders, filled in on demand by
+#               materialize_images() for the xrefs a caller actually needs
+# - "eager":    decode and write while extracting (default)
+
+import hashlib
+import os
+from typing import Any, Dict, Iterable
+
+IMAGE_MODES = ("none", "metadata", "lazy", "eager")
+DEFAULT_IMAGE_MODE = "eager"
+
+class ImageStore:
+    """Decoded image files of one document, keyed by xref and by content hash."""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self._by_xref: Dict[int, Dict[str, Any]] = {}
+
+    def get(self, doc, xref: int) -> Dict[str, Any]:
+        """Returns {"filename", "ext", "width", "height", "sha256"} for `xref`, decoding/writing it only once."""
+        info = self._by_xref.get(xref)
+        if info is None:
+            base = doc.extract_image(xref)
+            img_bytes, img_ext = base["image"], base.get("ext", "png")
+            digest = hashlib.sha256(img_bytes).hexdigest()
+            outpath = os.path.join(self.output_dir, f"img_{digest[:20]}.{img_ext}")
+            if not os.path.exists(outpath):
+                # write-then-rename so concurrent workers never see a half-written file
+                tmp = f"{outpath}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as fh: fh.write(img_bytes)
+                os.replace(tmp, outpath)
+            info = self._by_xref[xref] = {"filename": outpath, "ext": img_ext, "width": base.get("width"),
+                                          "height": base.get("height"), "sha256": digest}
+        return info
+
+def image_entries(doc, page, store: ImageStore | None, mode: str = DEFAULT_IMAGE_MODE) -> list:
+    """Image entries of one page for the given mode (see module header)."""
+    if mode not in IMAGE_MODES:
+        raise ValueError(f"unknown image mode '{mode}', expected one of {IMAGE_MODES}")
+    entries = []
+    if mode == "none": return entries
+    for img in page.get_images(full=True):
+        xref = img[0]
+        try:
+            ib = page.get_image_bbox(img).irect
+            entry = {"bbox": [ib.x0, ib.y0, ib.x1, ib.y1], "xref": xref}
+            if mode == "eager":
+                info = store.get(doc, xref)
+                entry.update(filename=info["filename"], ext=info["ext"], width=info["width"], height=info["height"],
+                             sha256=info["sha256"])
+            else:
+                if mode == "lazy": entry.update(filename=None, ext=None)
+                entry.update(width=img[2], height=img[3])
+            entries.append(entry)
+        except Exception as e:
+            print(f"[warn] could not extract image xref {xref} on page {page.number + 1}: {e}")
+    return entries
+
+def materialize_images(pdf_path: str, pages: Iterable[Dict[str, Any]], output_dir: str = "extracted_pdf_assets",
+                       xrefs: Iterable[int] | None = None) -> int:
+    """
+    Decodes and writes the images referenced by lazy entries of `pages` (optionally only `xrefs`),
+    filling in filename/ext/sha256 in place. Returns the number of entries filled.
+    """
+    import fitz
+    wanted = set(xrefs) if xrefs is not None else None
+    os.makedirs(output_dir, exist_ok=True)
+    store, filled = ImageStore(output_dir), 0
+    doc = fitz.open(pdf_path)
+    try:
+        for page in pages:
+            for entry in page.get("images", []):
+                if entry.get("filename") or (wanted is not None and entry["xref"] not in wanted): continue
+                info = store.get(doc, entry["xref"])
+                entry.update(filename=info["filename"], ext=info["ext"], sha256=info["sha256"])
+                filled += 1
+    finally:
+        doc.close()
+    return filled
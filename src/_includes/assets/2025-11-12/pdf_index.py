@@ -0,0 +1,310 @@
+# Positional full-text index over analyzed documents (one SQLite file, updated per document)
+# - blocks: every paragraph (paragraphs_by_col) and every table cell (tables[].rows) of a page;
+#   their terms (lowercased \w+ tokens) are posted with (doc, page, block, position, box)
+# - boxes: a term gets the slice of its line's bbox given by its character offsets (cells: of the
+#   cell's span inside the table, or of the table bbox when no single span holds the cell text)
+# - documents are identified by the PDF's sha256 (file_sha256, as in the page cache and the
+#   batch manifest): adding a known hash does nothing, a path re-added under a new hash replaces
+#   the old entry. add/remove touch only that document's rows
+# - search: blocks holding all query terms (phrase=True: as consecutive terms), the rarest term
+#   is looked up first and the others only in the documents it occurs in
+#
+#     index = SearchIndex("corpus.idx")
+#     index.add_pdf("report.pdf")                      # analyzed only if this content is new
+#     index.add_manifest("batch_out/manifest.jsonl")   # outputs of pdf_batch.py, hashes from the manifest
+#     for hit in index.search("operating income", phrase=True):
+#         print(hit["path"], hit["page_number"], hit["boxes"])
+
+import os
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from pdf_cache import file_sha256
+
+_TOKEN = re.compile(r"\w+")
+_BATCH = 500  # SQLite host parameters per IN (...) query
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN.findall(text)]
+
+def _term_boxes(text: str, bbox: Sequence[float]) -> Iterator[tuple]:
+    """(term, box) per token of `text`; the box is the part of `bbox` spanned by the token's characters."""
+    x0, y0, x1, y1 = bbox
+    w, n = x1 - x0, max(len(text), 1)
+    for m in _TOKEN.finditer(text):
+        yield m.group().lower(), (round(x0 + w * m.start() / n, 2), y0, round(x0 + w * m.end() / n, 2), y1)
+
+def _union(boxes: Iterable[Sequence[float]]) -> List[float]:
+    x0, y0, x1, y1 = zip(*boxes)
+    return [min(x0), min(y0), max(x1), max(y1)]
+
+def page_blocks(page: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Indexable blocks of an analyzed page: {"kind", "bbox", "text", "terms": [(term, box)], ...}
+    with "col"/"paragraph" for paragraphs and "table"/"row"/"col" for table cells.
+    """
+    for col, paras in sorted(page.get("paragraphs_by_col", {}).items(), key=lambda kv: int(kv[0])):
+        for i, para in enumerate(paras):
+            if not para: continue
+            terms = [tb for ln in para for tb in _term_boxes(ln["text"], ln["bbox"])]
+            yield {"kind": "paragraph", "col": int(col), "paragraph": i, "bbox": _union(ln["bbox"] for ln in para),
+                   "text": " ".join(ln["text"] for ln in para), "terms": terms}
+    spans = page.get("text", [])
+    for t, table in enumerate(page.get("tables", [])):
+        tx0, ty0, tx1, ty1 = table["bbox"]
+        # Cells carry no boxes; a span inside the table with exactly the cell's text stands in,
+        # taken in reading order so repeated values map to successive spans
+        inside: Dict[str, List[List[float]]] = defaultdict(list)
+        for s in sorted(spans, key=lambda s: (s["bbox"][1], s["bbox"][0])):
+            x0, y0, x1, y1 = s["bbox"]
+            if tx0 <= (x0 + x1) / 2 <= tx1 and ty0 <= (y0 + y1) / 2 <= ty1: inside[s["text"].strip()].append(s["bbox"])
+        for r, row in enumerate(table.get("rows", [])):
+            for c, cell in enumerate(row):
+                if not cell or not cell.strip(): continue
+                boxes = inside.get(cell.strip())
+                bbox = boxes.pop(0) if boxes else table["bbox"]
+                yield {"kind": "cell", "table": t, "row": r, "col": c, "bbox": list(bbox), "text": cell,
+                       "terms": list(_term_boxes(cell, bbox))}
+
+class SearchIndex:
+    """
+    Inverted index in a SQLite file. Safe to read from several processes at once (WAL journal);
+    writers are serialized by SQLite.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY, hash TEXT UNIQUE, path TEXT, page_count INTEGER, blocks INTEGER, added REAL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS docs_path ON docs (path)")
+            # postings: number of postings of the term, so queries can start with the rarest one
+            self._db.execute("CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE, postings INTEGER)")
+            # kind-specific columns: paragraphs (col, item = paragraph, row NULL), cells (col, item = table, row)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS blocks (
+                doc INTEGER, page INTEGER, block INTEGER, kind TEXT, col INTEGER, item INTEGER, row INTEGER,
+                x0 REAL, y0 REAL, x1 REAL, y1 REAL, text TEXT, PRIMARY KEY (doc, page, block)) WITHOUT ROWID""")
+            # Clustered by term: a lookup is one range scan, (term, doc) narrows it to a document
+            self._db.execute("""CREATE TABLE IF NOT EXISTS postings (
+                term INTEGER, doc INTEGER, page INTEGER, block INTEGER, pos INTEGER,
+                x0 REAL, y0 REAL, x1 REAL, y1 REAL, PRIMARY KEY (term, doc, page, block, pos)) WITHOUT ROWID""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)")
+
+    # -------------------------
+    # Documents
+    # -------------------------
+
+    def __contains__(self, doc_hash: str) -> bool:
+        return self._db.execute("SELECT 1 FROM docs WHERE hash = ?", (doc_hash,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def documents(self) -> List[Dict[str, Any]]:
+        rows = self._db.execute("SELECT hash, path, page_count, blocks, added FROM docs ORDER BY id").fetchall()
+        return [dict(zip(("hash", "path", "page_count", "blocks", "added"), r)) for r in rows]
+
+    def add(self, struct: Dict[str, Any], doc_hash: str | None = None) -> bool:
+        """
+        Indexes an analyze_pdf structure. `doc_hash` defaults to the sha256 of struct["path"].
+        Returns False (and changes nothing) when that hash is already indexed.
+        """
+        path = os.path.abspath(struct["path"]) if struct.get("path") else None
+        if doc_hash is None:
+            if not path or not os.path.isfile(path): raise ValueError("doc_hash is required when struct['path'] is not a readable file")
+            doc_hash = file_sha256(path)
+        if doc_hash in self: return False
+        blocks, postings, counts = [], [], defaultdict(int)
+        for page in struct.get("pages", []):
+            pno = page["page_number"]
+            for b, block in enumerate(page_blocks(page)):
+                item, row = (block["paragraph"], None) if block["kind"] == "paragraph" else (block["table"], block["row"])
+                blocks.append((pno, b, block["kind"], block["col"], item, row, *block["bbox"], block["text"]))
+                for pos, (term, box) in enumerate(block["terms"]):
+                    postings.append((term, pno, b, pos, *box))
+                    counts[term] += 1
+        with self._db:
+            if path:
+                for (old,) in self._db.execute("SELECT hash FROM docs WHERE path = ?", (path,)).fetchall(): self._remove(old)
+            doc = self._db.execute("INSERT INTO docs (hash, path, page_count, blocks, added) VALUES (?, ?, ?, ?, ?)",
+                                   (doc_hash, path, struct.get("page_count", len(struct.get("pages", []))), len(blocks),
+                                    time.time())).lastrowid
+            self._db.executemany("INSERT OR IGNORE INTO terms (term, postings) VALUES (?, 0)", ((t,) for t in counts))
+            self._db.executemany("UPDATE terms SET postings = postings + ? WHERE term = ?", ((n, t) for t, n in counts.items()))
+            ids = self._term_ids(counts)
+            self._db.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", ((doc, *b) for b in blocks))
+            self._db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 ((ids[p[0]], doc, *p[1:]) for p in postings))
+        return True
+
+    def add_pdf(self, pdf_path: str, **options) -> bool:
+        """Analyzes (analyze_pdf(**options)) and indexes a PDF, unless its content is already indexed."""
+        doc_hash = file_sha256(pdf_path)
+        if doc_hash in self: return False
+        import pdf_parser
+        return self.add(pdf_parser.analyze_pdf(pdf_path, **options), doc_hash)
+
+    def add_json(self, json_path: str, doc_hash: str | None = None) -> bool:
+        """Indexes a structure JSON written by pdf_parser.py (nested or compact)."""
+        from pdf_output import load_structure_json
+        return self.add(load_structure_json(json_path), doc_hash)
+
+    def add_manifest(self, manifest: str) -> Dict[str, int]:
+        """Indexes the outputs of a pdf_batch.py run, using the sha256 the manifest recorded per file."""
+        from pdf_batch import read_manifest
+        counts = {"added": 0, "unchanged": 0, "skipped": 0}
+        for rec in read_manifest(manifest).values():
+            if rec.get("status") != "ok" or not rec.get("sha256") or not os.path.exists(rec.get("output") or ""):
+                counts["skipped"] += 1
+            elif rec["sha256"] in self:
+                counts["unchanged"] += 1
+            else:
+                self.add_json(rec["output"], rec["sha256"])
+                counts["added"] += 1
+        return counts
+
+    def remove(self, doc: str) -> bool:
+        """Drops a document, given its hash or its path. Returns False if it was not indexed."""
+        row = self._db.execute("SELECT hash FROM docs WHERE hash = ? OR path = ?", (doc, os.path.abspath(doc))).fetchone()
+        if row is None: return False
+        with self._db:
+            self._remove(row[0])
+        return True
+
+    def _remove(self, doc_hash: str):
+        doc = self._db.execute("SELECT id FROM docs WHERE hash = ?", (doc_hash,)).fetchone()[0]
+        counts = self._db.execute("SELECT term, COUNT(*) FROM postings WHERE doc = ? GROUP BY term", (doc,)).fetchall()
+        self._db.executemany("UPDATE terms SET postings = postings - ? WHERE id = ?", ((n, t) for t, n in counts))
+        self._db.execute("DELETE FROM terms WHERE postings <= 0")
+        self._db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        self._db.execute("DELETE FROM blocks WHERE doc = ?", (doc,))
+        self._db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+
+    def _term_ids(self, terms: Iterable[str]) -> Dict[str, int]:
+        terms, ids = list(terms), {}
+        for a in range(0, len(terms), _BATCH):
+            chunk = terms[a:a + _BATCH]
+            ids.update(self._db.execute(f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+        return ids
+
+    # -------------------------
+    # Queries
+    # -------------------------
+
+    def search(self, query: str, phrase: bool = False, limit: int = 50, docs: Sequence[str] | None = None) -> List[Dict[str, Any]]:
+        """
+        Blocks containing every term of `query` (with phrase=True: the terms in order, adjacent),
+        in index order, at most `limit`. `docs` restricts the search to these document hashes.
+        Hits: {"doc", "path", "page_number", "kind", "bbox" (block), "boxes" (matched terms), "text", ...}.
+        """
+        terms = tokenize(query)
+        if not terms: return []
+        rows = self._db.execute(f"SELECT term, id, postings FROM terms WHERE term IN ({','.join('?' * len(set(terms)))})",
+                                list(set(terms))).fetchall()
+        if len(rows) < len(set(terms)): return []  # some term occurs nowhere
+        ids = {t: i for t, i, _ in rows}
+        doc_ids = None
+        if docs is not None:
+            doc_ids = [r[0] for r in self._db.execute(f"SELECT id FROM docs WHERE hash IN ({','.join('?' * len(docs))})", list(docs))]
+            if not doc_ids: return []
+        # Rarest term first; every further term is only read in the documents still in play
+        hits: Dict[tuple, Dict[str, Dict[int, tuple]]] | None = None
+        for term, term_id, _ in sorted(rows, key=lambda r: r[2]):
+            found: Dict[tuple, Dict[str, Dict[int, tuple]]] = {}
+            for doc, page, block, pos, *box in self._postings(term_id, doc_ids):
+                if hits is not None and (doc, page, block) not in hits: continue
+                found.setdefault((doc, page, block), {}).setdefault(term, {})[pos] = tuple(box)
+            if hits is not None:
+                for key, by_term in found.items(): by_term.update(hits[key])
+            hits = found
+            if not hits: return []
+            doc_ids = sorted({k[0] for k in hits})
+        out = []
+        for key in sorted(hits):
+            boxes = _matched_boxes(terms, ids, hits[key], phrase)
+            if not boxes: continue
+            out.append(self._hit(key, boxes))
+            if len(out) >= limit: break
+        return out
+
+    def _postings(self, term_id: int, doc_ids: List[int] | None) -> Iterator[tuple]:
+        sql = "SELECT doc, page, block, pos, x0, y0, x1, y1 FROM postings WHERE term = ?"
+        if doc_ids is None:
+            yield from self._db.execute(sql, (term_id,))
+            return
+        for a in range(0, len(doc_ids), _BATCH):
+            chunk = doc_ids[a:a + _BATCH]
+            yield from self._db.execute(f"{sql} AND doc IN ({','.join('?' * len(chunk))})", (term_id, *chunk))
+
+    def _hit(self, key: tuple, boxes: List[tuple]) -> Dict[str, Any]:
+        doc, page, block = key
+        h, path = self._db.execute("SELECT hash, path FROM docs WHERE id = ?", (doc,)).fetchone()
+        kind, col, item, row, x0, y0, x1, y1, text = self._db.execute(
+            "SELECT kind, col, item, row, x0, y0, x1, y1, text FROM blocks WHERE doc = ? AND page = ? AND block = ?", key).fetchone()
+        hit = {"doc": h, "path": path, "page_number": page, "kind": kind, "bbox": [x0, y0, x1, y1],
+               "boxes": [list(b) for b in boxes], "text": text}
+        hit.update({"col": col, "paragraph": item} if kind == "paragraph" else {"table": item, "row": row, "col": col})
+        return hit
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _matched_boxes(terms: List[str], ids: Dict[str, int], positions: Dict[str, Dict[int, tuple]], phrase: bool) -> List[tuple]:
+    """Boxes of the matched occurrences in one block; empty when a phrase does not occur."""
+    if not phrase: return sorted({box for t in terms for box in positions[t].values()})
+    first = positions[terms[0]]
+    boxes = []
+    for start in sorted(first):
+        if all(start + i in positions[t] for i, t in enumerate(terms)):
+            boxes.extend(positions[t][start + i] for i, t in enumerate(terms))
+    return boxes
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Full-text index over analyzed PDFs")
+    parser.add_argument("index", help="SQLite index file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_add = sub.add_parser("add", help="index PDFs, structure JSON files or pdf_batch.py manifests (.jsonl)")
+    p_add.add_argument("inputs", nargs="+")
+    p_rm = sub.add_parser("remove", help="drop documents by path or hash")
+    p_rm.add_argument("docs", nargs="+")
+    p_q = sub.add_parser("search", help="print hits as page, bbox and block text")
+    p_q.add_argument("query")
+    p_q.add_argument("--phrase", action="store_true", help="terms must be adjacent and in order")
+    p_q.add_argument("--limit", type=int, default=20)
+    sub.add_parser("list", help="indexed documents")
+    args = parser.parse_args()
+    with SearchIndex(args.index) as index:
+        if args.command == "add":
+            for item in args.inputs:
+                t0 = time.perf_counter()
+                if item.endswith(".jsonl"): result = index.add_manifest(item)
+                elif item.lower().endswith(".pdf"): result = "added" if index.add_pdf(item, images="none") else "unchanged"
+                else: result = "added" if index.add_json(item) else "unchanged"
+                print(f"{item}: {result} ({time.perf_counter() - t0:.2f}s)")
+        elif args.command == "remove":
+            for doc in args.docs:
+                print(f"{doc}: {'removed' if index.remove(doc) else 'not indexed'}")
+        elif args.command == "search":
+            t0 = time.perf_counter()
+            hits = index.search(args.query, phrase=args.phrase, limit=args.limit)
+            for hit in hits:
+                print(f"{os.path.basename(hit['path'] or hit['doc'][:12])} p{hit['page_number']} {hit['kind']:9s} "
+                      f"{hit['bbox']}  {hit['text'][:80]}")
+            print(f"{len(hits)} hit(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        else:
+            for d in index.documents():
+                print(f"{d['hash'][:12]}  {d['page_count']:5d} page(s) {d['blocks']:7d} block(s)  {d['path']}")
@@ -0,0 +1,199 @@
+# Lazy document facade: analyze only the pages (and stages) somebody looks at
+#
+#     with LazyDocument("big.pdf") as doc:
+#         first = doc[0].tables           # text -> lines -> tables of page 1, nothing else
+#         doc[417].to_dict()              # one full page, same dict as analyze_pdf produces
+#         doc.analyze(pages=range(3), stages=("text", "paragraphs"))
+#
+# Stages and what they need:
+#   text                       get_text("dict") -> span table
+#   images                     image_entries (mode as in analyze_pdf)
+#   vectors                    get_cdrawings -> VectorTable (rulings, boxes, fills, decoration)
+#   lines                      text; also assigns columns
+#   tables                     lines (+ vectors for ruled grids when params["ruled_tables"])
+#   paragraphs                 lines + tables
+# Each stage runs once per page, on first access. Pages are kept in an LRU of `max_pages`.
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+import pdf_parser
+from pdf_images import DEFAULT_IMAGE_MODE, ImageStore
+
+STAGES = ("text", "images", "vectors", "lines", "tables", "paragraphs")
+
+class LazyPage:
+    """One page whose stages are computed on first access."""
+
+    def __init__(self, owner: "LazyDocument", pno: int):
+        self._owner, self.pno = owner, pno
+        page = owner.doc[pno]
+        self.page_number, self.width, self.height = pno + 1, page.rect.width, page.rect.height
+        self._fitz_page = page
+        self._spans = self._lines = self._segments = None
+        self._images = self._vectors = self._tables = self._runs = None
+        self._span_dicts = self._line_dicts = self._paragraphs = self._vector_dicts = None
+        self.vectors_dropped = 0
+
+    # -- raw stages --
+    def _text(self):
+        if self._spans is None: self._spans = pdf_parser.page_text(self._fitz_page)
+        return self._spans
+
+    @property
+    def images(self) -> List[Dict[str, Any]]:
+        if self._images is None:
+            o = self._owner
+            self._images = pdf_parser.page_images(o.doc, self._fitz_page, o.store, o.images)
+        return self._images
+
+    def _vector_table(self):
+        if self._vectors is None: self._vectors = pdf_parser.page_vectors(self._fitz_page)
+        return self._vectors
+
+    @property
+    def vectors(self) -> List[Dict[str, Any]]:
+        """Vector dicts after the page caps (params["max_vectors"], params["max_decoration"])."""
+        if self._vector_dicts is None:
+            p = self._owner.params
+            self._vector_dicts, self.vectors_dropped = self._vector_table().to_dicts(p["max_vectors"], p["max_decoration"])
+        return self._vector_dicts
+
+    # -- layout stages --
+    def _layout_lines(self):
+        if self._lines is None and len(self._text()):
+            self._lines = pdf_parser.layout_lines(self._spans, self._owner.params)
+            self._span_dicts = None  # spans just got their column labels
+        return self._lines
+
+    def _layout_tables(self):
+        if self._tables is None:
+            lines = self._layout_lines()
+            if lines is None:
+                self._tables = []
+            else:
+                vectors = self._vector_table() if self._owner.params["ruled_tables"] else None
+                self._segments, self._tables = pdf_parser.layout_tables(self._spans, lines, vectors, self._owner.params)
+        return self._tables
+
+    @property
+    def text(self) -> List[Dict[str, Any]]:
+        """Span dicts; they carry "col" once lines (or anything after them) have been computed."""
+        if self._span_dicts is None: self._span_dicts = self._text().to_dicts()
+        return self._span_dicts
+
+    @property
+    def lines(self) -> List[Dict[str, Any]]:
+        if self._line_dicts is None:
+            lines = self._layout_lines()
+            self._line_dicts = lines.to_dicts(self.text) if lines is not None else []
+        return self._line_dicts
+
+    @property
+    def tables(self) -> List[Dict[str, Any]]:
+        return self._layout_tables()
+
+    @property
+    def paragraphs_by_col(self) -> Dict[int, List[List[Dict[str, Any]]]]:
+        if self._paragraphs is None:
+            tables, lines = self._layout_tables(), self._lines
+            self._runs = pdf_parser.layout_paragraphs(lines, tables) if lines is not None else {}
+            self._paragraphs = pdf_parser.paragraphs_to_dicts(self._runs, self.lines)
+        return self._paragraphs
+
+    def computed(self) -> List[str]:
+        """Stages that have already run for this page."""
+        done = {"text": self._spans, "images": self._images, "vectors": self._vectors, "lines": self._lines,
+                "tables": self._tables, "paragraphs": self._runs}
+        return [s for s in STAGES if done[s] is not None]
+
+    def to_dict(self, stages: Iterable[str] | None = None) -> Dict[str, Any]:
+        """
+        Page dict with the given stages (default: all). With every stage selected this is the dict
+        analyze_pdf produces for the page.
+        """
+        stages = _check_stages(stages)
+        if "lines" in stages or "tables" in stages or "paragraphs" in stages: self._layout_lines()
+        out: Dict[str, Any] = {"page_number": self.page_number, "width": self.width, "height": self.height}
+        if "text" in stages: out["text"] = self.text
+        if "images" in stages: out["images"] = self.images
+        if "vectors" in stages:
+            out["vectors"] = self.vectors
+            if self.vectors_dropped: out["vectors_dropped"] = self.vectors_dropped
+        if not len(self._text()): return out  # like analyze_page: no layout keys on pages without text
+        if "tables" in stages: out["tables"] = self.tables
+        if "lines" in stages: out["lines"] = self.lines
+        if "paragraphs" in stages: out["paragraphs_by_col"] = self.paragraphs_by_col
+        return out
+
+def _check_stages(stages: Iterable[str] | None) -> Sequence[str]:
+    if stages is None: return STAGES
+    stages = tuple(stages)
+    unknown = set(stages) - set(STAGES)
+    if unknown: raise ValueError(f"unknown stage(s) {sorted(unknown)}, expected some of {STAGES}")
+    return stages
+
+class LazyDocument:
+    """
+    Page-indexable view of a PDF (`doc[i]`, 0-based like fitz, negative indices allowed) that runs
+    extraction and layout per page and per stage on demand. At most `max_pages` analyzed pages
+    are kept (least recently used are dropped and recomputed if asked for again).
+    `pages` limits iteration and analyze() to a page range; `stages` is their default selection.
+    """
+
+    def __init__(self, pdf_path: str, output_dir: str = "extracted_pdf_assets", images: str = DEFAULT_IMAGE_MODE,
+                 params: Dict[str, Any] | None = None, max_pages: int = 32, pages: Iterable[int] | None = None,
+                 stages: Iterable[str] | None = None):
+        self.path = pdf_path
+        self.doc = pdf_parser._open_pdf(pdf_path)
+        self.images, self.params = images, pdf_parser.layout_params(params)
+        self.store = ImageStore(pdf_parser.safe_mkdir(output_dir))
+        self.max_pages = max(1, max_pages)
+        self.page_range = list(pages) if pages is not None else range(len(self.doc))
+        self.stages = _check_stages(stages)
+        self._pages: "OrderedDict[int, LazyPage]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.doc)
+
+    def __getitem__(self, i: int) -> LazyPage:
+        n = len(self.doc)
+        pno = i + n if i < 0 else i
+        if not 0 <= pno < n: raise IndexError(f"page index {i} out of range for {n} page(s)")
+        page = self._pages.get(pno)
+        if page is None:
+            page = self._pages[pno] = LazyPage(self, pno)
+            if len(self._pages) > self.max_pages: self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(pno)
+        return page
+
+    def __iter__(self) -> Iterator[LazyPage]:
+        for pno in self.page_range:
+            yield self[pno]
+
+    def iter_dicts(self, pages: Iterable[int] | None = None, stages: Iterable[str] | None = None) -> Iterator[Dict[str, Any]]:
+        """Page dicts of `pages` (default: the document's page range) with the selected stages."""
+        stages = self.stages if stages is None else stages
+        for pno in (self.page_range if pages is None else pages):
+            yield self[pno].to_dict(stages)
+
+    def analyze(self, pages: Iterable[int] | None = None, stages: Iterable[str] | None = None) -> Dict[str, Any]:
+        """analyze_pdf-shaped result restricted to a page range and a stage selection."""
+        struct: Dict[str, Any] = {"path": self.path, "pages": list(self.iter_dicts(pages, stages))}
+        struct["page_count"] = len(struct["pages"])
+        return struct
+
+    def cached_pages(self) -> List[int]:
+        """0-based numbers of the pages currently held, least recently used first."""
+        return list(self._pages)
+
+    def close(self):
+        self._pages.clear()
+        self.doc.close()
+
+    def __enter__(self) -> "LazyDocument":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,146 @@
+# Per-stage instrumentation of the extraction + layout pipeline
+# - Metrics:        timings, counts and (optionally) tracemalloc deltas of one page
+# - MetricsSummary: running per-document totals, built from the page metrics in page order
+# - hooks:          callables `hook(event, data)` invoked in the calling process with
+#                   event "page" (one page's metrics) and "document" (the summary)
+#
+# Stages: get_text, spans, images, drawings (extraction); lines, columns, segments, tables,
+# paragraphs, to_dicts (layout); cache (page cache lookups and writes).
+#
+# Memory metrics switch tracemalloc on only if nothing traces yet, and whoever switched it on
+# switches it off again (the document summary when the document is done, a worker after its
+# chunk), so a long-lived process does not keep tracing after one --metrics memory run.
+
+import heapq
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+MetricsHook = Callable[[str, Dict[str, Any]], None]
+
+def start_tracing(memory: bool = True) -> bool:
+    """Starts tracemalloc for memory metrics unless it is already tracing; True if this call started it."""
+    if not memory or tracemalloc.is_tracing(): return False
+    tracemalloc.start()
+    return True
+
+def stop_tracing(started: bool):
+    """Stops tracemalloc if `started` (the result of start_tracing) says the caller started it."""
+    if started and tracemalloc.is_tracing(): tracemalloc.stop()
+
+class Metrics:
+    """Stage timings and counts of one page. `memory=True` also records tracemalloc deltas per stage."""
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.alloc: Dict[str, Dict[str, int]] = {}
+        self.started_tracing = start_tracing(memory)
+
+    def stop_tracing(self):
+        stop_tracing(self.started_tracing)
+        self.started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.memory:
+            tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                slot = self.alloc.setdefault(name, {"delta": 0, "peak": 0})
+                slot["delta"] += current - mem0
+                slot["peak"] = max(slot["peak"], peak - mem0)
+
+    def count(self, **counts: int):
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + int(v)
+
+    def as_dict(self, seconds: float) -> Dict[str, Any]:
+        out = {"seconds": round(seconds, 6), "stages": {k: round(v, 6) for k, v in self.stages.items()},
+               "counts": dict(self.counts)}
+        if self.memory: out["memory"] = self.alloc
+        return out
+
+class _NoMetrics:
+    """Stand-in used when instrumentation is off; every call is a no-op."""
+    memory = False
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def count(self, **counts: int):
+        pass
+
+NO_METRICS = _NoMetrics()
+
+class MetricsSummary:
+    """
+    Per-document totals of page metrics, plus the `top` slowest pages. With `memory` the summary
+    keeps tracemalloc on for the whole document; stop_tracing() ends it once the document is done.
+    """
+
+    def __init__(self, path: str, top: int = 5, memory: bool = False):
+        self.path, self.top = path, top
+        self.started_tracing = start_tracing(memory)
+        self.pages = 0
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._slowest: List[tuple] = []
+        self._t0 = time.perf_counter()
+
+    def add(self, page_number: int, metrics: Dict[str, Any]):
+        self.pages += 1
+        for k, v in metrics["stages"].items():
+            self.stages[k] = self.stages.get(k, 0.0) + v
+        for k, v in metrics["counts"].items():
+            self.counts[k] = self.counts.get(k, 0) + v
+        heapq.heappush(self._slowest, (metrics["seconds"], page_number, metrics["stages"]))
+        if len(self._slowest) > self.top: heapq.heappop(self._slowest)
+
+    def stop_tracing(self):
+        stop_tracing(self.started_tracing)
+        self.started_tracing = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._t0
+        slowest = []
+        for seconds, pno, stages in sorted(self._slowest, reverse=True):
+            stage = max(stages, key=stages.get) if stages else None
+            slowest.append({"page_number": pno, "seconds": seconds, "slowest_stage": stage})
+        return {
+            "path": self.path, "pages": self.pages, "wall_seconds": round(wall, 6),
+            "pages_per_second": round(self.pages / wall, 2) if wall > 0 else None,
+            "stages": {k: round(v, 6) for k, v in sorted(self.stages.items(), key=lambda kv: -kv[1])},
+            "counts": dict(self.counts), "slowest_pages": slowest,
+        }
+
+def ndjson_hook(path: str) -> MetricsHook:
+    """A hook that appends every page/document event to an NDJSON file."""
+    def hook(event: str, data: Dict[str, Any]):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"event": event, **data}, ensure_ascii=False) + "\n")
+    return hook
+
+def format_profile(summary: Dict[str, Any]) -> str:
+    """Human-readable report of a document summary: stage breakdown and slowest pages."""
+    out = [f"{summary['pages']} page(s) in {summary['wall_seconds']:.3f}s ({summary['pages_per_second'] or 0:.1f} pages/s)"]
+    busy = sum(summary["stages"].values()) or 1.0
+    out.append("stages (summed over pages, includes time spent in workers):")
+    for name, seconds in summary["stages"].items():
+        out.append(f"  {name:12s} {seconds:9.3f}s {100 * seconds / busy:5.1f}%")
+    if summary["counts"]:
+        out.append("counts: " + ", ".join(f"{k}={v}" for k, v in summary["counts"].items()))
+    out.append("slowest pages:")
+    for p in summary["slowest_pages"]:
+        out.append(f"  page {p['page_number']:5d} {p['seconds']:9.3f}s  (mostly {p['slowest_stage']})")
+    return "\n".join(out)
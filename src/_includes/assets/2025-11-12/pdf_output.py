@@ -0,0 +1,306 @@
+# Compact output formats for analyzed documents
+# - normalized pages: lines refer to spans and paragraphs refer to lines by index, and values
+#   derivable from the bbox (x0..y1, cx, cy) are dropped, so every span is written once instead
+#   of up to three times (text, lines, paragraphs_by_col). expand_page restores the nested dict.
+# - compact JSON: a normalized structure written without indentation
+# - columnar store: a directory of .npy arrays (spans, lines, paragraphs, vectors and
+#   their index lists over all pages) plus a small index.json with per-page row ranges, the
+#   string pools and the remaining small per-page values (images, tables). Arrays are opened
+#   with np.load(mmap_mode="r"), so reading one page only touches that page's rows.
+#
+# Round trip: expand_page(normalize_page(page)) == page, and so does a page read back from a
+# columnar store with expand=True (for pages produced by analyze_pdf / iter_analyzed_pages).
+
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from pdf_spans import _Pool
+
+NORMALIZED_FORMAT = "normalized-1"
+COLUMNAR_VERSION = 1
+
+# -------------------------
+# Normalized page dicts
+# -------------------------
+
+def _bbox_fields(item: Dict[str, Any], out: Dict[str, Any]) -> Dict[str, Any]:
+    # x0..y1 always mirror the bbox; centers are kept only if they are not the bbox midpoints
+    x0, y0, x1, y1 = item["bbox"]
+    if item.get("cx", (x0 + x1) / 2) != (x0 + x1) / 2 or item.get("cy", (y0 + y1) / 2) != (y0 + y1) / 2:
+        out["cx"], out["cy"] = item["cx"], item["cy"]
+    return out
+
+def _expand_bbox(item: Dict[str, Any], out: Dict[str, Any]) -> Dict[str, Any]:
+    x0, y0, x1, y1 = item["bbox"]
+    out.update(x0=x0, y0=y0, x1=x1, y1=y1, cx=item.get("cx", (x0 + x1) / 2), cy=item.get("cy", (y0 + y1) / 2))
+    return out
+
+def _indexer(items: List[Dict[str, Any]]):
+    """item -> position in `items`: by identity, or by (text, bbox) for copies (e.g. pages loaded from JSON)."""
+    by_id = {id(x): i for i, x in enumerate(items)}
+    by_key: Dict[tuple, int] = {}
+
+    def index(x: Dict[str, Any]) -> int:
+        i = by_id.get(id(x))
+        if i is None:
+            if not by_key: by_key.update(((t["text"], tuple(t["bbox"])), j) for j, t in reversed(list(enumerate(items))))
+            i = by_key[(x["text"], tuple(x["bbox"]))]
+        return i
+    return index
+
+def normalize_page(page: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of an analyzed page with spans stored once; line "spans" and paragraphs become index lists."""
+    out: Dict[str, Any] = {}
+    for key, value in page.items():
+        if key == "text":
+            out[key] = [_bbox_fields(s, {"text": s["text"], "bbox": s["bbox"], "font": s.get("font"), "size": s.get("size"),
+                                         "flags": s.get("flags"), **({"col": s["col"]} if "col" in s else {})}) for s in value]
+        elif key == "lines":
+            span_index = _indexer(page.get("text", []))
+            out[key] = [_bbox_fields(ln, {"spans": [span_index(s) for s in ln["spans"]], "text": ln["text"], "bbox": ln["bbox"],
+                                          **({"col": ln["col"]} if "col" in ln else {}),
+                                          **({"boilerplate": True} if ln.get("boilerplate") else {})}) for ln in value]
+        elif key == "paragraphs_by_col":
+            line_index = _indexer(page.get("lines", []))
+            out[key] = {col: [[line_index(ln) for ln in para] for para in paras] for col, paras in value.items()}
+        else:
+            out[key] = value
+    return out
+
+def expand_page(page: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of normalize_page: nested span and line dicts, as analyze_pdf returns them."""
+    out: Dict[str, Any] = {}
+    spans: List[Dict[str, Any]] = []
+    lines: List[Dict[str, Any]] = []
+    for key, value in page.items():
+        if key == "text":
+            for s in value:
+                span = _expand_bbox(s, {"text": s["text"], "bbox": s["bbox"], "font": s["font"], "size": s["size"], "flags": s["flags"]})
+                if "col" in s: span["col"] = s["col"]
+                spans.append(span)
+            out["text"] = spans
+        elif key == "lines":
+            for ln in value:
+                line = _expand_bbox(ln, {"spans": [spans[i] for i in ln["spans"]], "text": ln["text"], "bbox": ln["bbox"]})
+                if "col" in ln: line["col"] = ln["col"]
+                if ln.get("boilerplate"): line["boilerplate"] = True
+                lines.append(line)
+            out["lines"] = lines
+        elif key == "paragraphs_by_col":
+            out[key] = {col: [[lines[i] for i in para] for para in paras] for col, paras in value.items()}
+        else:
+            out[key] = value
+    return out
+
+def normalize_structure(struct: Dict[str, Any]) -> Dict[str, Any]:
+    return {**struct, "format": NORMALIZED_FORMAT, "pages": [normalize_page(p) for p in struct.get("pages", [])]}
+
+def expand_structure(struct: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in struct.items() if k != "format"}
+    out["pages"] = [expand_page(p) for p in struct.get("pages", [])]
+    return out
+
+def save_compact_json(struct: Dict[str, Any], out_json_path: str):
+    """Normalized structure without indentation (see save_structure_json for the nested, indented form)."""
+    with open(out_json_path, "w", encoding="utf-8") as fh:
+        json.dump(normalize_structure(struct), fh, ensure_ascii=False, separators=(",", ":"))
+    print(f"Saved compact JSON to {out_json_path}")
+
+def load_structure_json(path: str, expand: bool = True) -> Dict[str, Any]:
+    """Reads either JSON form; normalized files are expanded unless `expand=False`."""
+    with open(path, encoding="utf-8") as fh:
+        struct = json.load(fh)
+    return expand_structure(struct) if expand and struct.get("format") == NORMALIZED_FORMAT else struct
+
+# -------------------------
+# Columnar store (.npy arrays + index.json)
+# -------------------------
+
+# Record layouts. Boxed kinds also get x0, y0, x1, y1 in the document's coordinate type:
+# int32 hundredths of a point when that is exact (coordinates come rounded to 2 decimals and
+# k / 100 gives back the same float), float64 otherwise; index["coord_scale"] says which.
+RECORD_FIELDS = {
+    "spans": [("size", "f8"), ("flags", "i4"), ("font", "i4"), ("text", "i4"), ("col", "i2")],
+    "lines": [("text", "i4"), ("col", "i2"), ("span_start", "i4"), ("span_stop", "i4"), ("boilerplate", "?")],  # text -1: spans joined
+    "paragraphs": [("col", "i4"), ("line_start", "i4"), ("line_stop", "i4")],
+    "vectors": [("width", "f8"), ("type", "i2"), ("count", "i4")],  # width NaN: None, count -1: no count
+}
+BOXED = ("spans", "lines", "vectors")
+ARRAYS = (*RECORD_FIELDS, "line_spans", "paragraph_lines", "text_offsets")
+_ROW_KEYS = {"text", "lines", "paragraphs_by_col", "vectors"}
+
+def _coord_scale(boxes: np.ndarray) -> int:
+    q = np.round(boxes * 100)
+    return 100 if not boxes.size or (np.abs(q).max() < 2 ** 31 and np.array_equal(q / 100, boxes)) else 1
+
+def _records(kind: str, rest: List[tuple], boxes: np.ndarray | None, scale: int) -> np.ndarray:
+    fields = RECORD_FIELDS[kind]
+    if boxes is not None: fields = [(k, "i4" if scale == 100 else "f8") for k in ("x0", "y0", "x1", "y1")] + fields
+    arr = np.zeros(len(rest), dtype=fields)
+    if not rest: return arr
+    if boxes is not None:
+        b = np.round(boxes * 100) if scale == 100 else boxes
+        for i, k in enumerate(("x0", "y0", "x1", "y1")): arr[k] = b[:, i]
+    for (name, _), col in zip(RECORD_FIELDS[kind], zip(*rest)):
+        arr[name] = col
+    return arr
+
+def save_columnar(struct: Dict[str, Any] | Iterable[Dict[str, Any]], out_dir: str, path: str | None = None) -> Dict[str, Any]:
+    """
+    Writes analyzed pages (a structure from analyze_pdf, or any iterable of page dicts) to
+    `out_dir` as a columnar store. Span centers that are not bbox midpoints are not representable
+    here; pages from the pipeline always use midpoints. Returns the index.
+    """
+    if isinstance(struct, dict): path, pages = struct.get("path", path), struct.get("pages", [])
+    else: pages = struct
+    os.makedirs(out_dir, exist_ok=True)
+    texts, fonts, vtypes = _Pool(), _Pool(), _Pool()
+    rows: Dict[str, list] = {k: [] for k in RECORD_FIELDS}
+    boxes: Dict[str, list] = {k: [] for k in BOXED}
+    line_spans: List[int] = []
+    paragraph_lines: List[int] = []
+    index_pages = []
+    for page in pages:
+        page = normalize_page(page)
+        start = {k: len(v) for k, v in rows.items()}
+        spans = page.get("text", [])
+        for s in spans:
+            rows["spans"].append((s["size"], s["flags"], fonts.add(s["font"]), texts.add(s["text"]), s.get("col", -1)))
+            boxes["spans"].append(s["bbox"])
+        for ln in page.get("lines", []):
+            a = len(line_spans)
+            line_spans.extend(ln["spans"])
+            # line text is the span texts left to right; only store it when it is something else
+            joined = " ".join(spans[i]["text"] for i in sorted(ln["spans"], key=lambda i: spans[i]["bbox"][0]))
+            rows["lines"].append((-1 if joined == ln["text"] else texts.add(ln["text"]), ln.get("col", -1), a, len(line_spans),
+                                  bool(ln.get("boilerplate"))))
+            boxes["lines"].append(ln["bbox"])
+        for col, paras in page.get("paragraphs_by_col", {}).items():
+            for para in paras:
+                a = len(paragraph_lines)
+                paragraph_lines.extend(para)
+                rows["paragraphs"].append((int(col), a, len(paragraph_lines)))
+        for v in page.get("vectors", []):
+            rows["vectors"].append((np.nan if v.get("width") is None else v["width"], vtypes.add(v.get("type")), v.get("count", -1)))
+            boxes["vectors"].append(v["bbox"])
+        entry = {k: v for k, v in page.items() if k not in _ROW_KEYS}
+        entry["keys"] = list(page)  # key order and which layout keys the page had
+        entry["rows"] = {k: [start[k], len(v)] for k, v in rows.items()}
+        index_pages.append(entry)
+
+    box_arrays = {k: np.array(v, dtype=float).reshape(-1, 4) for k, v in boxes.items()}
+    scale = min(_coord_scale(b) for b in box_arrays.values())
+    arrays = {k: _records(k, rows[k], box_arrays.get(k), scale) for k in RECORD_FIELDS}
+    arrays["line_spans"] = np.array(line_spans, dtype=np.int32)
+    arrays["paragraph_lines"] = np.array(paragraph_lines, dtype=np.int32)
+    # Text pool: one UTF-8 blob plus offsets, so strings are decoded only when asked for
+    encoded = [t.encode("utf-8") for t in texts.items]
+    arrays["text_offsets"] = np.concatenate(([0], np.cumsum([len(b) for b in encoded]))).astype(np.int64)
+    with open(os.path.join(out_dir, "texts.bin"), "wb") as fh:
+        fh.write(b"".join(encoded))
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), arr, allow_pickle=False)
+    index = {"version": COLUMNAR_VERSION, "path": path, "page_count": len(index_pages), "coord_scale": scale,
+             "fonts": fonts.items, "vector_types": vtypes.items, "pages": index_pages}
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as fh:
+        json.dump(index, fh, ensure_ascii=False, separators=(",", ":"))
+    return index
+
+class ColumnarDocument:
+    """
+    Reader for save_columnar output. Arrays are memory-mapped (mmap=True) and pages are rebuilt
+    on request: `doc.records(i, "spans")` is a zero-copy slice of the span records, `doc.page(i)`
+    a page dict.
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.dir = path
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as fh:
+            self.index = json.load(fh)
+        if self.index.get("version") != COLUMNAR_VERSION:
+            raise ValueError(f"unsupported columnar store version {self.index.get('version')} in {path}")
+        mode = "r" if mmap else None
+        self.arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode, allow_pickle=False) for name in ARRAYS}
+        blob = os.path.join(path, "texts.bin")
+        # np.memmap refuses empty files
+        self._texts = np.memmap(blob, dtype=np.uint8, mode="r") if mmap and os.path.getsize(blob) else np.fromfile(blob, dtype=np.uint8)
+        self.path, self.page_count = self.index.get("path"), self.index["page_count"]
+        self.coord_scale, self.fonts, self.vector_types = self.index["coord_scale"], self.index["fonts"], self.index["vector_types"]
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def text(self, i: int) -> str:
+        off = self.arrays["text_offsets"]
+        return bytes(self._texts[int(off[i]):int(off[i + 1])]).decode("utf-8")
+
+    def records(self, pno: int, kind: str) -> np.ndarray:
+        """Raw records of one kind on page `pno` (0-based); coordinates are in 1/coord_scale pt."""
+        a, b = self.index["pages"][pno]["rows"][kind]
+        return self.arrays[kind][a:b]
+
+    def bboxes(self, pno: int, kind: str = "spans") -> np.ndarray:
+        """(N, 4) float array of x0, y0, x1, y1 for spans, lines or vectors of page `pno`."""
+        rec = self.records(pno, kind)
+        return np.column_stack([rec[k] for k in ("x0", "y0", "x1", "y1")]).astype(float).reshape(-1, 4) / self.coord_scale
+
+    def _boxes(self, pno: int, kind: str) -> List[List[float]]:
+        rec, s = self.records(pno, kind), self.coord_scale
+        # int / int is the correctly rounded float, i.e. exactly the value that was written
+        return [[x0 / s, y0 / s, x1 / s, y1 / s] for x0, y0, x1, y1 in zip(*(rec[k].tolist() for k in ("x0", "y0", "x1", "y1")))]
+
+    def page(self, pno: int, expand: bool = False) -> Dict[str, Any]:
+        """Page `pno` (0-based) as a normalized dict, or nested like analyze_pdf with expand=True."""
+        entry = self.index["pages"][pno]
+        out: Dict[str, Any] = {}
+        for key in entry["keys"]:
+            if key == "text": out[key] = self._span_dicts(pno)
+            elif key == "lines": out[key] = self._line_dicts(pno, out.get("text") or self._span_dicts(pno))
+            elif key == "paragraphs_by_col": out[key] = self._paragraphs(pno)
+            elif key == "vectors": out[key] = self._vector_dicts(pno)
+            else: out[key] = entry[key]
+        return expand_page(out) if expand else out
+
+    def _span_dicts(self, pno: int) -> List[Dict[str, Any]]:
+        rec, out = self.records(pno, "spans"), []
+        for bbox, size, flags, font, text, col in zip(self._boxes(pno, "spans"), *(rec[k].tolist() for k, _ in RECORD_FIELDS["spans"])):
+            span = {"text": self.text(text), "bbox": bbox, "font": self.fonts[font], "size": size, "flags": flags}
+            if col >= 0: span["col"] = col
+            out.append(span)
+        return out
+
+    def _line_dicts(self, pno: int, spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rec, ls, out = self.records(pno, "lines"), self.arrays["line_spans"], []
+        for bbox, text, col, a, b, boilerplate in zip(self._boxes(pno, "lines"), *(rec[k].tolist() for k, _ in RECORD_FIELDS["lines"])):
+            idx = ls[a:b].tolist()
+            if text < 0: text = " ".join(spans[i]["text"] for i in sorted(idx, key=lambda i: spans[i]["bbox"][0]))
+            else: text = self.text(text)
+            line = {"spans": idx, "text": text, "bbox": bbox}
+            if col >= 0: line["col"] = col
+            if boilerplate: line["boilerplate"] = True
+            out.append(line)
+        return out
+
+    def _paragraphs(self, pno: int) -> Dict[int, List[List[int]]]:
+        pl, out = self.arrays["paragraph_lines"], {}
+        for col, a, b in self.records(pno, "paragraphs").tolist():
+            out.setdefault(col, []).append(pl[a:b].tolist())
+        return out
+
+    def _vector_dicts(self, pno: int) -> List[Dict[str, Any]]:
+        rec, out = self.records(pno, "vectors"), []
+        for b, w, t, n in zip(self._boxes(pno, "vectors"), rec["width"].tolist(), rec["type"].tolist(), rec["count"].tolist()):
+            out.append({"type": self.vector_types[t], "bbox": b, "width": None if w != w else w})
+            if n >= 0: out[-1]["count"] = n
+        return out
+
+    def iter_pages(self, expand: bool = False) -> Iterator[Dict[str, Any]]:
+        for pno in range(self.page_count):
+            yield self.page(pno, expand=expand)
+
+    def to_structure(self, expand: bool = True) -> Dict[str, Any]:
+        """Whole document in analyze_pdf's shape (nested pages unless expand=False)."""
+        return {"path": self.path, "pages": list(self.iter_pages(expand)), "page_count": self.page_count}
@@ -1,19 +1,64 @@
 # PDF extraction with column, paragraph and table detection
-# Integrated script: - robust extraction via PyMuPDF (fitz)
-# - column detection (1D clustering / histogram gaps)
+# Integrated script: - robust extraction via PyMuPDF (fitz) into columnar span tables (pdf_spans.py)
+# - column detection (1D clustering, see pdf_clustering.py)
 # - paragraph grouping heuristics
-# - simple table detection using grid alignment
-# - visualization with corrected bbox rendering (PDF -> Matplotlib coordinate flip)
+# - table detection: aligned text segments (sweep-line) and ruled grids from vectors (pdf_tables.py)
+# - vector drawings merged and classified into NumPy arrays, capped per page (pdf_vectors.py)
+# - visualization with corrected bbox rendering (PDF -> Matplotlib coordinate flip), see pdf_visualize.py
+# - fast batched overlays (PNG on the rendered page, or SVG), pages rendered in parallel (pdf_render.py)
+# - optional per-stage metrics and profiling hooks (pdf_metrics.py)
+# - on-demand per-page analysis of large documents: LazyDocument (pdf_lazy.py)
+# - local HTTP service streaming pages as NDJSON from a warm worker pool (pdf_service.py)
+# - compact outputs: normalized JSON (spans stored once) and a memory-mapped columnar store (pdf_output.py)
+# - opt-in dedup: duplicate pages reuse one layout result, near duplicates are flagged, recurring
+#   header/footer lines are tagged and skip paragraph grouping (pdf_dedup.py)
+# - positional full-text index over paragraphs and table cells of many documents (pdf_index.py)
 
 import os
 import json
-from typing import List, Dict, Any
+import itertools
+import numbers
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Sequence
 
 import fitz  # PyMuPDF
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from sklearn.cluster import AgglomerativeClustering
+
+from pdf_cache import DEFAULT_CACHE_BYTES, PageCache, file_sha256, fingerprint
+from pdf_clustering import CLUSTER_ENGINES, DEFAULT_CLUSTER_ENGINE, cluster_1d, cluster_centers
+from pdf_dedup import (CONTENT_KEY, LayoutMemo, NearDuplicateIndex, add_boilerplate, layout_part, minhash, page_key,
+                       page_shingles, scan_boilerplate, split_boilerplate, with_layout)
+from pdf_images import DEFAULT_IMAGE_MODE, IMAGE_MODES, ImageStore, image_entries
+from pdf_metrics import (NO_METRICS, Metrics, MetricsHook, MetricsSummary, format_profile, ndjson_hook, start_tracing,
+                         stop_tracing)
+from pdf_output import normalize_page, save_columnar, save_compact_json
+from pdf_spatial import GridIndex, PageIndex, query_region  # noqa: F401  (query_region/PageIndex re-exported)
+from pdf_spans import SegmentTable, SpanTable, group_lines, split_segments
+from pdf_tables import line_alignment, nearest_center, ruled_tables
+from pdf_vectors import VectorTable
+
+# Tunables of the layout stage (analyze_page). They are also the cache fingerprint of that
+# stage, so bump LAYOUT_VERSION / EXTRACT_VERSION when the heuristics themselves change.
+DEFAULT_LAYOUT_PARAMS: Dict[str, Any] = {
+    "max_columns": 4,           # spans beyond the 4th column are folded into the last one
+    "gap_threshold": None,      # column clustering distance; None = derived from the median span width
+    "space_scale": 1.5,         # a gap wider than ~1.5 spaces splits a line into table segments
+    "table_tolerance": 5.0,     # min x-overlap (pt) for segments of consecutive lines to align
+    "table_col_distance": 20,   # clustering distance for the columns of one table
+    "ruled_tables": True,       # also read grid tables off the ruling lines among the vectors
+    "max_vectors": 5000,        # vector elements kept per page (rulings first, then by area); None = all
+    "max_decoration": 1000,     # beyond this many, decoration elements are aggregated into grid cells
+    "boilerplate_margin": 0.1,  # with dedup: share of the page height searched for headers/footers
+    "boilerplate_min_pages": 3, # with dedup: a header/footer must recur on this many pages
+    "cluster_engine": DEFAULT_CLUSTER_ENGINE,
+}
+INTEGER_LAYOUT_PARAMS = {"max_columns", "max_vectors", "max_decoration", "boilerplate_min_pages"}
+NULLABLE_LAYOUT_PARAMS = {"gap_threshold", "max_vectors", "max_decoration"}  # None: derived / no cap
+LAYOUT_VERSION = 4
+EXTRACT_VERSION = 4
+OUTPUT_FORMATS = ("json", "compact", "columnar")  # CLI --format, see pdf_output.py
 
 # -------------------------
 # Utilities
@@ -23,150 +68,129 @@ def safe_mkdir(path: str) -> str:
     os.makedirs(path, exist_ok=True)
     return path
 
-def _safe_filename(base: str, ext: str, idx: int = 0) -> str:
-    name = f"{base}_{idx}.{ext}" if idx else f"{base}.{ext}"
-    return "".join(c for c in name if c.isalnum() or c in ("_", ".", "-"))
-
 # -------------------------
 # Core extraction
 # -------------------------
 
-def extract_pdf_structure(pdf_path: str, output_dir: str = "extracted_pdf_assets") -> Dict[str, Any]:
-    safe_mkdir(output_dir)
-    structure: Dict[str, Any] = {"path": pdf_path, "pages": []}
+def extract_page(doc: "fitz.Document", pno: int, output_dir: str = "extracted_pdf_assets",
+                 images: str = DEFAULT_IMAGE_MODE, store: ImageStore | None = None,
+                 metrics: Metrics | None = None) -> Dict[str, Any]:
+    m = metrics or NO_METRICS
+    page = doc[pno]
+    page_w, page_h = page.rect.width, page.rect.height
+    page_dict = {"page_number": pno + 1, "width": page_w, "height": page_h, "text": page_text(page, m),
+                 "images": page_images(doc, page, store if store is not None else ImageStore(output_dir), images, m)}
+    page_dict["vectors"] = page_vectors(page, m)
+    m.count(spans=len(page_dict["text"]), images=len(page_dict["images"]), drawings=len(page_dict["vectors"]))
+    return page_dict
+
+# The extraction stages on their own (extract_page runs all three; pdf_lazy.py runs them on demand)
+
+def page_text(page: "fitz.Page", metrics: Metrics | None = None) -> SpanTable:
+    m = metrics or NO_METRICS
+    try:
+        with m.stage("get_text"): tdict = page.get_text("dict")
+        with m.stage("spans"): return SpanTable.from_text_dict(tdict)
+    except Exception as e:
+        print(f"[warn] text extraction failed on page {page.number + 1}: {e}")
+        return SpanTable.from_rows([])
+
+def page_images(doc: "fitz.Document", page: "fitz.Page", store: ImageStore, images: str = DEFAULT_IMAGE_MODE,
+                metrics: Metrics | None = None) -> List[Dict[str, Any]]:
+    try:
+        with (metrics or NO_METRICS).stage("images"):
+            return image_entries(doc, page, store, mode=images)
+    except Exception as e:
+        print(f"[warn] image extraction failed on page {page.number + 1}: {e}")
+        return []
+
+def page_vectors(page: "fitz.Page", metrics: Metrics | None = None) -> VectorTable:
+    """Drawings classified and merged into rulings, boxes, fills and decoration (pdf_vectors.py)."""
+    try:
+        with (metrics or NO_METRICS).stage("drawings"):
+            # get_cdrawings returns plain tuples instead of Point/Rect objects
+            drawings = page.get_cdrawings() if hasattr(page, "get_cdrawings") else page.get_drawings()
+            return VectorTable.from_drawings(drawings)
+    except Exception as e:
+        print(f"[warn] vector extraction failed on page {page.number + 1}: {e}")
+        return VectorTable.from_drawings([])
+
+def _open_pdf(pdf_path: str) -> "fitz.Document":
     try:
-        doc = fitz.open(pdf_path)
+        return fitz.open(pdf_path)
     except Exception as e:
         raise RuntimeError(f"Failed to open PDF '{pdf_path}': {e}")
+
+def extract_pdf_structure(pdf_path: str, output_dir: str = "extracted_pdf_assets", images: str = DEFAULT_IMAGE_MODE,
+                          metrics: bool | str = False, hooks: Sequence[MetricsHook] = ()) -> Dict[str, Any]:
+    safe_mkdir(output_dir)
+    structure: Dict[str, Any] = {"path": pdf_path, "pages": []}
+    doc = _open_pdf(pdf_path)
     structure["page_count"] = len(doc)
-    for pno, page in enumerate(doc):
-        page_w, page_h = page.rect.width, page.rect.height
-        page_dict = {"page_number": pno + 1, "width": page_w, "height": page_h, "text": [], "images": [], "vectors": []}
-        try:
-            tdict = page.get_text("dict")
-            for block in tdict.get("blocks", []):
-                if block.get("type") == 0:  # text
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            txt = span.get("text", "")
-                            if not txt.strip(): continue
-                            bbox = [round(v, 2) for v in span.get("bbox", [])]
-                            page_dict["text"].append({
-                                "text": txt, "bbox": bbox, "font": span.get("font"),
-                                "size": span.get("size"), "flags": span.get("flags"),
-                                "x0": bbox[0], "y0": bbox[1], "x1": bbox[2], "y1": bbox[3],
-                                "cx": (bbox[0] + bbox[2]) / 2.0, "cy": (bbox[1] + bbox[3]) / 2.0,
-                            })
-        except Exception as e:
-            print(f"[warn] text extraction failed on page {pno+1}: {e}")
-        try:
-            img_idx = 0
-            for img in page.get_images(full=True):
-                xref = img[0]
-                try:
-                    base = doc.extract_image(xref)
-                    img_bytes, img_ext = base["image"], base.get("ext", "png")
-                    fname = _safe_filename(f"page{pno+1}_img{img_idx+1}", img_ext)
-                    outpath = os.path.join(output_dir, fname)
-                    with open(outpath, "wb") as fh: fh.write(img_bytes)
-                    img_bbox = page.get_image_bbox(img).irect
-                    page_dict["images"].append({
-                        "bbox": [img_bbox.x0, img_bbox.y0, img_bbox.x1, img_bbox.y1],
-                        "xref": xref, "filename": outpath, "ext": img_ext,
-                        "width": base.get("width"), "height": base.get("height")
-                    })
-                    img_idx += 1
-                except Exception as e:
-                    print(f"[warn] could not extract image xref {xref} on page {pno+1}: {e}")
-        except Exception as e:
-            print(f"[warn] image extraction failed on page {pno+1}: {e}")
-        try:
-            for d in page.get_drawings():
-                r = d.get("rect")
-                if r:
-                    bbox = [round(r.x0, 2), round(r.y0, 2), round(r.x1, 2), round(r.y1, 2)]
-                    page_dict["vectors"].append({"type": "rect", "bbox": bbox, "width": d.get("width")})
-        except Exception:
-            pass
+    store = ImageStore(output_dir)
+    summary = MetricsSummary(pdf_path, memory=metrics == "memory") if metrics or hooks else None
+    for pno in range(len(doc)):
+        t0 = time.perf_counter()
+        m = Metrics(memory=metrics == "memory") if summary else None
+        page_dict = extract_page(doc, pno, output_dir=output_dir, images=images, store=store, metrics=m)
+        with (m or NO_METRICS).stage("to_dicts"):
+            page_dict["text"] = page_dict["text"].to_dicts()
+            _vectors_to_dicts(page_dict, page_dict["vectors"], DEFAULT_LAYOUT_PARAMS)
+        if summary:
+            page_dict["metrics"] = m.as_dict(time.perf_counter() - t0)
+            _record_page(page_dict, summary, hooks)
         structure["pages"].append(page_dict)
     doc.close()
+    if summary: structure["metrics"] = _finish_document(summary, hooks)
     return structure
 
 # -------------------------
 # Layout heuristics
 # -------------------------
+# The pipeline runs on the columnar SpanTable/LineTable (pdf_spans.py); the dict-based
+# functions below are thin wrappers kept for callers working with page["text"] dicts.
 
-def detect_columns_from_spans(spans: List[Dict[str, Any]], max_columns: int = 4, gap_threshold: float | None = None) -> List[int]:
-    if not spans: return []
-    centers = np.array([s["cx"] for s in spans]).reshape(-1, 1)
+def column_labels(cx: np.ndarray, widths: np.ndarray, max_columns: int = 4, gap_threshold: float | None = None,
+                  cluster_engine: str = DEFAULT_CLUSTER_ENGINE) -> np.ndarray:
+    if not cx.size: return np.zeros(0, dtype=int)
     if gap_threshold is None:
-        widths = np.array([s["x1"] - s["x0"] for s in spans])
         median_w = np.median(widths) if widths.size else 50
         gap_threshold = max(30.0, median_w * 0.6)
-    clustering = AgglomerativeClustering(n_clusters=None, distance_threshold=gap_threshold, linkage="ward")
-    labels = clustering.fit_predict(centers)
-    unique_labels, means = np.unique(labels, return_counts=False), [np.mean(centers[labels == l]) for l in np.unique(labels)]
-    sorted_labels = [label for _, label in sorted(zip(means, unique_labels))]
-    label_to_col = {label: idx for idx, label in enumerate(sorted_labels)}
-    cols = [min(label_to_col[l], max_columns - 1) for l in labels]
-    return cols
+    # cluster_1d numbers labels from left to right, so a label is already the column index
+    labels = cluster_1d(cx, gap_threshold, engine=cluster_engine)
+    return np.minimum(labels, max_columns - 1)
+
+def detect_columns_from_spans(spans: List[Dict[str, Any]], max_columns: int = 4, gap_threshold: float | None = None,
+                              cluster_engine: str = DEFAULT_CLUSTER_ENGINE) -> List[int]:
+    if not spans: return []
+    centers = np.array([s["cx"] for s in spans])
+    widths = np.array([s["x1"] - s["x0"] for s in spans])
+    return column_labels(centers, widths, max_columns, gap_threshold, cluster_engine).tolist()
 
 def group_spans_to_lines(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     if not spans: return []
-    sorted_spans = sorted(spans, key=lambda s: (s["y0"], s["x0"]))
-    lines: List[Dict[str, Any]] = []
-    heights = [s["y1"] - s["y0"] for s in spans if s["y1"] - s["y0"] > 0]
-    median_height = float(np.median(heights)) if heights else 10.0
-    line_threshold = max(2.0, median_height * 0.4)
-    current_line_spans = [sorted_spans[0]]
-    for i in range(1, len(sorted_spans)):
-        prev_s, curr_s = current_line_spans[-1], sorted_spans[i]
-        if abs(curr_s["cy"] - prev_s["cy"]) <= line_threshold:
-            current_line_spans.append(curr_s)
-        else:
-            all_x0, all_y0 = [s['x0'] for s in current_line_spans], [s['y0'] for s in current_line_spans]
-            all_x1, all_y1 = [s['x1'] for s in current_line_spans], [s['y1'] for s in current_line_spans]
-            bbox = [min(all_x0), min(all_y0), max(all_x1), max(all_y1)]
-            lines.append({
-                "spans": current_line_spans,
-                "text": " ".join(s['text'] for s in sorted(current_line_spans, key=lambda s: s['x0'])),
-                "bbox": bbox, "x0": bbox[0], "y0": bbox[1], "x1": bbox[2], "y1": bbox[3],
-                "cx": (bbox[0] + bbox[2]) / 2, "cy": (bbox[1] + bbox[3]) / 2,
-            })
-            current_line_spans = [curr_s]
-    if current_line_spans:
-        all_x0, all_y0 = [s['x0'] for s in current_line_spans], [s['y0'] for s in current_line_spans]
-        all_x1, all_y1 = [s['x1'] for s in current_line_spans], [s['y1'] for s in current_line_spans]
-        bbox = [min(all_x0), min(all_y0), max(all_x1), max(all_y1)]
-        lines.append({
-            "spans": current_line_spans,
-            "text": " ".join(s['text'] for s in sorted(current_line_spans, key=lambda s: s['x0'])),
-            "bbox": bbox, "x0": bbox[0], "y0": bbox[1], "x1": bbox[2], "y1": bbox[3],
-            "cx": (bbox[0] + bbox[2]) / 2, "cy": (bbox[1] + bbox[3]) / 2,
-        })
-    return lines
+    return group_lines(SpanTable.from_dicts(spans)).to_dicts(spans, with_col=False)
+
+def paragraph_runs(y0: np.ndarray, y1: np.ndarray, text: List[str], idx: np.ndarray) -> List[List[int]]:
+    """Splits the lines `idx` (top to bottom) into paragraphs; returns lists of line indices."""
+    if not idx.size: return []
+    idx = idx[np.argsort(y0[idx], kind="stable")]
+    ly0, ly1 = y0[idx], y1[idx]
+    heights = ly1 - ly0
+    heights = heights[heights > 0]
+    if not heights.size: return []
+    median_height = float(np.median(heights))
+    gap_threshold = median_height * 0.6
+    gaps = ly0[1:] - ly1[:-1]
+    ends_sentence = np.array([text[i].strip()[-1:] in {".", "!", "?", ":"} for i in idx[:-1].tolist()], dtype=bool)
+    breaks = (gaps > gap_threshold) | (ends_sentence & (gaps > (median_height * 0.2)))
+    return [run.tolist() for run in np.split(idx, np.nonzero(breaks)[0] + 1)]
 
 def group_lines_to_paragraphs(lines: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
     if not lines: return []
-    sorted_lines = sorted(lines, key=lambda l: l["y0"])
-    heights = [l["y1"] - l["y0"] for l in sorted_lines if l["y1"] - l["y0"] > 0]
-    if not heights: return []
-    median_height = float(np.median(heights))
-    gap_threshold = median_height * 0.6
-    paragraphs: List[List[Dict[str, Any]]] = []
-    current_para: List[Dict[str, Any]] = [sorted_lines[0]]
-    for i in range(1, len(sorted_lines)):
-        prev_ln, curr_ln = sorted_lines[i-1], sorted_lines[i]
-        gap = curr_ln["y0"] - prev_ln["y1"]
-        prev_end_char = prev_ln["text"].strip()[-1] if prev_ln["text"].strip() else ""
-        is_punct_break = prev_end_char in {".", "!", "?", ":"} and gap > (median_height * 0.2)
-        if gap > gap_threshold or is_punct_break:
-            paragraphs.append(current_para)
-            current_para = [curr_ln]
-        else:
-            current_para.append(curr_ln)
-    if current_para: paragraphs.append(current_para)
-    return paragraphs
+    y0, y1 = np.array([l["y0"] for l in lines]), np.array([l["y1"] for l in lines])
+    runs = paragraph_runs(y0, y1, [l["text"] for l in lines], np.arange(len(lines)))
+    return [[lines[i] for i in run] for run in runs]
 
 # -------------------------
 # Enhanced Table Detection
@@ -177,224 +201,488 @@ def get_line_segments(line: Dict[str, Any], space_scale: float = 2.0) -> List[Di
     Breaks a line into visual segments based on horizontal gaps.
     User Heuristic: Gap > space character.
     """
-    spans = sorted(line["spans"], key=lambda s: s["x0"])
+    spans = line["spans"]
     if not spans:
         return []
-
-    # Calculate an approximate space width for this specific line based on font size
-    # Average char width is roughly height / 2. A wide gap is ~ 2 to 3 spaces.
-    avg_font_size = np.mean([s["size"] for s in spans]) if spans else 10.0
-    gap_threshold = avg_font_size * 0.6 * space_scale 
-
-    segments = []
-    current_segment = [spans[0]]
-    
-    for i in range(1, len(spans)):
-        prev = spans[i-1]
-        curr = spans[i]
-        gap = curr["x0"] - prev["x1"]
-        
-        if gap > gap_threshold:
-            # Gap detected: close current segment and start new
-            segments.append(current_segment)
-            current_segment = [curr]
-        else:
-            current_segment.append(curr)
-    segments.append(current_segment)
-
-    # Convert list of spans into simplified segment dicts
-    segment_dicts = []
-    for seg in segments:
-        x0 = min(s["x0"] for s in seg)
-        x1 = max(s["x1"] for s in seg)
-        text = " ".join(s["text"] for s in seg)
-        segment_dicts.append({"x0": x0, "x1": x1, "text": text, "spans": seg})
-            
-    return segment_dicts
+    table = SpanTable.from_dicts(spans)
+    xorder = np.argsort(table.data["x0"], kind="stable")
+    segs = split_segments(table, xorder, np.array([0, len(spans)]), space_scale=space_scale)
+    idx, bounds = segs.spans_idx.tolist(), segs.starts.tolist()
+    return [{"x0": x0, "x1": x1, "text": text, "spans": [spans[j] for j in idx[a:b]]}
+            for x0, x1, text, a, b in zip(segs.x0.tolist(), segs.x1.tolist(), segs.text, bounds[:-1], bounds[1:])]
 
 def segments_overlap(seg1: Dict[str, Any], seg2: Dict[str, Any], tolerance: float = 5.0) -> bool:
     """Checks if two segments vertically align (share x-coordinates)."""
     return max(0, min(seg1["x1"], seg2["x1"]) - max(seg1["x0"], seg2["x0"])) > tolerance
 
-def detect_tables(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _segments_from_dicts(per_line: List[List[Dict[str, Any]]]) -> SegmentTable:
+    flat = [seg for segs in per_line for seg in segs]
+    line_starts = np.concatenate(([0], np.cumsum([len(segs) for segs in per_line]))).astype(int)
+    x0, x1 = np.array([s["x0"] for s in flat], dtype=float), np.array([s["x1"] for s in flat], dtype=float)
+    return SegmentTable(np.zeros(0, dtype=int), np.zeros(1, dtype=int), line_starts, x0, x1, [s["text"] for s in flat])
+
+def _line_boxes(line_dicts: List[Dict[str, Any]]) -> tuple:
+    return tuple(np.array([ln[k] for ln in line_dicts], dtype=float) for k in ("x0", "y0", "x1", "y1"))
+
+def detect_tables(lines: List[Dict[str, Any]], cluster_engine: str = DEFAULT_CLUSTER_ENGINE) -> List[Dict[str, Any]]:
     """
     Detects tables by finding consecutive lines that have multiple segments 
     which vertically align with each other.
     """
     if len(lines) < 2:
         return []
-
-    # 1. Analyze every line to see if it has "columns" (segments)
     # We use a looser threshold (1.5 spaces) to catch tight tables
-    line_structures = []
-    for ln in lines:
-        segs = get_line_segments(ln, space_scale=1.5)
-        line_structures.append({
-            "line_obj": ln,
-            "segments": segs,
-            "is_multi_col": len(segs) > 1
-        })
-
-    tables = []
-    current_table_lines = []
-    
-    # 2. Group consecutive lines that look like they belong to the same grid
-    for i in range(len(line_structures)):
-        curr = line_structures[i]
-        prev = line_structures[i-1] if i > 0 else None
+    segs = _segments_from_dicts([get_line_segments(ln, space_scale=1.5) for ln in lines])
+    boxes = _line_boxes(lines)
+    return [build_table(segs, boxes, a, b, cluster_engine=cluster_engine) for a, b in _table_blocks(segs)]
+
+def _table_blocks(segs: SegmentTable, tolerance: float = 5.0) -> List[tuple]:
+    """
+    Groups consecutive, vertically aligned multi-segment lines into table blocks.
+    Returns (first_line, stop_line) ranges over the lines described by `segs`.
+    """
+    n_lines = segs.line_starts.size - 1
+    # 1. A line has "columns" if it splits into more than one segment
+    multi_col = np.diff(segs.line_starts) > 1
+    # aligned[i]: some segment of line i overlaps some segment of line i+1 (one sweep for the page)
+    aligned = line_alignment(segs.line_starts, segs.x0, segs.x1, tolerance).tolist()
+    blocks, start = [], None
 
+    # 2. Group consecutive lines that look like they belong to the same grid
+    for i in range(n_lines):
         is_table_part = False
-        
-        if curr["is_multi_col"]:
-            # If it has columns, check if it aligns with the previous table line
-            if current_table_lines:
-                prev_table_line = current_table_lines[-1]
-                # Check alignment: Do at least 50% of segments align with the previous line?
-                matches = 0
-                for c_seg in curr["segments"]:
-                    for p_seg in prev_table_line["segments"]:
-                        if segments_overlap(c_seg, p_seg):
-                            matches += 1
-                            break
-                if matches > 0:
-                    is_table_part = True
-            else:
+        if multi_col[i]:
+            if start is not None:
+                # Part of the running table if it aligns with the previous (table) line
+                is_table_part = aligned[i - 1]
+            elif i + 1 < n_lines and multi_col[i + 1]:
                 # Start of a potential table
-                # Heuristic: Must be followed by another multi-col line to be a table
-                if i + 1 < len(line_structures):
-                    next_ln = line_structures[i+1]
-                    if next_ln["is_multi_col"]:
-                        # Check alignment with next
-                        matches = 0
-                        for c_seg in curr["segments"]:
-                            for n_seg in next_ln["segments"]:
-                                if segments_overlap(c_seg, n_seg):
-                                    matches += 1
-                                    break
-                        if matches > 0:
-                            is_table_part = True
-
-        # 3. Handle Vertical Isolation (Whitespace heuristic)
-        # If we have a table going, allows single-column lines if they are "sandwiched" closely
-        if not is_table_part and current_table_lines:
-            # Allow a single line break or a header line inside a table 
-            # if the vertical gap is small
-            gap = curr["line_obj"]["y0"] - current_table_lines[-1]["line_obj"]["y1"]
-            if gap < 15.0: # Small vertical gap threshold
-                # It might be a wrapped row. 
-                # (Simplification: for now, strict visual alignment is safer)
-                pass
-
+                # Heuristic: Must be followed by another aligned multi-col line to be a table
+                is_table_part = aligned[i]
+        # (Wrapped rows / headers sandwiched inside a table are not merged yet:
+        #  strict visual alignment is safer for now.)
         if is_table_part:
-            current_table_lines.append(curr)
+            if start is None: start = i
         else:
-            if len(current_table_lines) >= 2:
-                tables.append(process_table_block(current_table_lines))
-            current_table_lines = []
+            if start is not None and i - start >= 2:
+                blocks.append((start, i))
+            start = None
 
     # Catch trailing table
-    if len(current_table_lines) >= 2:
-        tables.append(process_table_block(current_table_lines))
+    if start is not None and n_lines - start >= 2:
+        blocks.append((start, n_lines))
+    return blocks
 
-    return tables
-
-def process_table_block(block_structs: List[Dict[str, Any]]) -> Dict[str, Any]:
+def build_table(segs: SegmentTable, line_boxes: tuple, start: int, stop: int, col_distance: float = 20,
+                cluster_engine: str = DEFAULT_CLUSTER_ENGINE) -> Dict[str, Any]:
     """
-    Converts a list of raw line structures into a clean table dictionary.
+    Converts lines start..stop-1 into a clean table dictionary.
     Recalculates columns based on the aggregate of all lines in the block.
     """
     # 1. Collect all x-intervals from all lines
-    all_segments = []
-    for item in block_structs:
-        all_segments.extend(item["segments"])
-    
+    s0, s1 = int(segs.line_starts[start]), int(segs.line_starts[stop])
+    if s1 <= s0: return {}
+
     # 2. Determine global column boundaries for this block using X-clustering
-    # (We reuse the logic from the old script here but restricted to this block)
-    if not all_segments: return {}
-    
-    xs = np.array([(s["x0"] + s["x1"])/2 for s in all_segments]).reshape(-1, 1)
-    # Cluster centers to find column buckets
-    from sklearn.cluster import AgglomerativeClustering
-    clustering = AgglomerativeClustering(n_clusters=None, distance_threshold=20, linkage="ward")
-    labels = clustering.fit_predict(xs)
-    
-    # Map unique labels to sorted x-positions
-    unique_labels = np.unique(labels)
-    col_centers = []
-    for l in unique_labels:
-        center = np.mean(xs[labels == l])
-        col_centers.append((l, center))
-    col_centers.sort(key=lambda x: x[1])
-    label_map = {l: i for i, (l, c) in enumerate(col_centers)}
-    num_cols = len(unique_labels)
+    # (labels come back sorted by x-position)
+    xs = (segs.x0[s0:s1] + segs.x1[s0:s1]) / 2
+    labels = cluster_1d(xs, col_distance, engine=cluster_engine)
+    centers = cluster_centers(xs, labels)
+    num_cols = len(centers)
+    # Closest column center per segment, by binary search over the (ascending) centers
+    seg_cols = nearest_center(xs, centers).tolist()
 
     # 3. Build the grid
     rows = []
-    for item in block_structs:
+    bounds = segs.line_starts[start:stop + 1].tolist()
+    for a, b in zip(bounds[:-1], bounds[1:]):
         row_cells = [""] * num_cols
-        for seg in item["segments"]:
-            # Find which column this segment belongs to
-            seg_cx = (seg["x0"] + seg["x1"]) / 2
-            # Find closest column center (naive but effective given the clustering)
-            closest_lbl = min(unique_labels, key=lambda l: abs(np.mean(xs[labels==l]) - seg_cx))
-            col_idx = label_map[closest_lbl]
-            
+        for k in range(a, b):
             # Append text (handle overlaps)
-            current_text = row_cells[col_idx]
-            row_cells[col_idx] = (current_text + " " + seg["text"]).strip()
+            col_idx = seg_cols[k - s0]
+            row_cells[col_idx] = (row_cells[col_idx] + " " + segs.text[k]).strip()
         rows.append(list(filter(bool, row_cells)))
 
     # 4. Calculate BBox
-    all_x0 = [l["line_obj"]["x0"] for l in block_structs]
-    all_y0 = [l["line_obj"]["y0"] for l in block_structs]
-    all_x1 = [l["line_obj"]["x1"] for l in block_structs]
-    all_y1 = [l["line_obj"]["y1"] for l in block_structs]
-    
-    bbox = [min(all_x0), min(all_y0), max(all_x1), max(all_y1)]
-
-    return {"rows": rows, "bbox": [round(v, 2) for v in bbox]}
+    x0, y0, x1, y1 = line_boxes
+    bbox = [x0[start:stop].min(), y0[start:stop].min(), x1[start:stop].max(), y1[start:stop].max()]
+
+    return {"rows": rows, "bbox": [round(float(v), 2) for v in bbox]}
+
+def _merge_ruled_tables(tables: List[Dict[str, Any]], vectors: VectorTable, segs: SegmentTable,
+                        lines) -> List[Dict[str, Any]]:
+    """Adds grid tables found from ruling lines; text-aligned tables centered inside a grid are dropped."""
+    seg_line = np.repeat(np.arange(len(lines)), np.diff(segs.line_starts))
+    ruled = ruled_tables(*vectors.ruling_lines(), (segs.x0 + segs.x1) / 2, lines.cy[seg_line], segs.text)
+    if not ruled: return tables
+    def in_grid(tbl):
+        bx0, by0, bx1, by1 = tbl["bbox"]
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        return any(r["bbox"][0] <= cx <= r["bbox"][2] and r["bbox"][1] <= cy <= r["bbox"][3] for r in ruled)
+    return sorted(ruled + [t for t in tables if t and not in_grid(t)], key=lambda t: t["bbox"][1])
+
+def process_table_block(block_structs: List[Dict[str, Any]], cluster_engine: str = DEFAULT_CLUSTER_ENGINE) -> Dict[str, Any]:
+    """
+    Converts a list of raw line structures ({"line_obj", "segments"}) into a clean table dictionary.
+    """
+    segs = _segments_from_dicts([item["segments"] for item in block_structs])
+    return build_table(segs, _line_boxes([item["line_obj"] for item in block_structs]), 0, len(block_structs),
+                       cluster_engine=cluster_engine)
 
 # -------------------------
 # High-level pipeline
 # -------------------------
 
-def analyze_pdf(pdf_path: str, output_dir: str = "extracted_pdf_assets") -> Dict[str, Any]:
-    struct = extract_pdf_structure(pdf_path, output_dir=output_dir)
-    for page in struct.get("pages", []):
-        spans = page.get("text", [])
-        if not spans: continue
-        lines = group_spans_to_lines(spans)
-        col_labels = detect_columns_from_spans(spans)
-        for s, c in zip(spans, col_labels): s["col"] = int(c)
-        for ln in lines:
-            span_cols = [sp.get("col", 0) for sp in ln.get("spans", [])]
-            ln["col"] = int(max(set(span_cols), key=span_cols.count)) if span_cols else 0
-        
-        # Detect tables FIRST
-        tables = detect_tables(lines)
+def layout_params(params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """DEFAULT_LAYOUT_PARAMS overridden by `params`; unknown keys and values of the wrong type are rejected."""
+    unknown = set(params or {}) - set(DEFAULT_LAYOUT_PARAMS)
+    if unknown: raise ValueError(f"unknown layout parameter(s): {sorted(unknown)}")
+    for key, value in (params or {}).items():
+        _check_param_type(key, value)
+    if params and params.get("cluster_engine", DEFAULT_CLUSTER_ENGINE) not in CLUSTER_ENGINES:
+        raise ValueError(f"cluster_engine must be one of {CLUSTER_ENGINES}")
+    return {**DEFAULT_LAYOUT_PARAMS, **(params or {})}
+
+def _check_param_type(key: str, value: Any):
+    default = DEFAULT_LAYOUT_PARAMS[key]
+    if value is None and key in NULLABLE_LAYOUT_PARAMS: return
+    if isinstance(default, bool): ok, name = isinstance(value, bool), "a bool"
+    elif isinstance(default, str): ok, name = isinstance(value, str), "a string"
+    elif key in INTEGER_LAYOUT_PARAMS: ok, name = isinstance(value, numbers.Integral) and not isinstance(value, bool), "an integer"
+    else: ok, name = isinstance(value, numbers.Real) and not isinstance(value, bool), "a number"
+    if key in NULLABLE_LAYOUT_PARAMS: name += " or null"
+    if not ok: raise TypeError(f"layout parameter {key!r} must be {name}, got {type(value).__name__}")
+
+def analyze_page(page: Dict[str, Any], params: Dict[str, Any] | None = None, metrics: Metrics | None = None,
+                 boilerplate: Iterable[str] | None = None) -> Dict[str, Any]:
+    """
+    Layout of one extracted page, in place. Spans matching `boilerplate` (header/footer keys, see
+    pdf_dedup.py) skip layout and are appended afterwards as lines with "boilerplate": true.
+    """
+    p = layout_params(params)
+    m = metrics or NO_METRICS
+    spans = page.get("text", [])
+    if not isinstance(spans, SpanTable): spans = SpanTable.from_dicts(spans)
+    if boilerplate:
+        content, extra = split_boilerplate(spans, page["height"], p["boilerplate_margin"], boilerplate)
+        if extra is not None:
+            page["text"] = content
+            return add_boilerplate(analyze_page(page, p, m), extra)
+    vectors = page.get("vectors", [])
+    if not isinstance(vectors, VectorTable): vectors = VectorTable.from_dicts(vectors)
+    if not len(spans):
+        page["text"] = []
+        with m.stage("to_dicts"): _vectors_to_dicts(page, vectors, p)
+        return page
+    lines = layout_lines(spans, p, m)
+    # Detect tables FIRST
+    segments, tables = layout_tables(spans, lines, vectors, p, m)
+    runs_by_col = layout_paragraphs(lines, tables, m)
+
+    # JSON boundary: only now turn the arrays into dicts
+    with m.stage("to_dicts"):
+        span_dicts = spans.to_dicts()
+        line_dicts = lines.to_dicts(span_dicts)
+        page["text"] = span_dicts
+        _vectors_to_dicts(page, vectors, p)
         page["tables"] = tables
+        page["lines"] = line_dicts
+        page["paragraphs_by_col"] = paragraphs_to_dicts(runs_by_col, line_dicts)
+    m.count(lines=len(lines), segments=len(segments), tables=len(tables),
+            paragraphs=sum(len(runs) for runs in runs_by_col.values()))
+    return page
+
+def _vectors_to_dicts(page: Dict[str, Any], vectors: VectorTable, p: Dict[str, Any]):
+    if "vectors" not in page: return
+    page["vectors"], dropped = vectors.to_dicts(p["max_vectors"], p["max_decoration"])
+    if dropped: page["vectors_dropped"] = dropped
+
+# The layout stages on their own; `p` is a full parameter dict (layout_params)
+
+def layout_lines(spans: SpanTable, p: Dict[str, Any], metrics: Metrics | None = None):
+    """Groups spans into lines and assigns span and line columns (writes spans.data["col"])."""
+    m = metrics or NO_METRICS
+    d = spans.data
+    with m.stage("lines"): lines = group_lines(spans)
+    with m.stage("columns"):
+        d["col"] = column_labels(d["cx"], d["x1"] - d["x0"], max_columns=p["max_columns"], gap_threshold=p["gap_threshold"],
+                                 cluster_engine=p["cluster_engine"])
+        # Majority column per line (argmax keeps the lowest column on ties)
+        line_id = np.repeat(np.arange(len(lines)), np.diff(lines.starts))
+        votes = np.zeros((len(lines), int(d["col"].max()) + 1), dtype=int)
+        np.add.at(votes, (line_id, d["col"][lines.order]), 1)
+        lines.col = votes.argmax(axis=1)
+    return lines
 
-        # Exclude table lines from paragraph analysis
-        table_line_indices = set()
+def layout_tables(spans: SpanTable, lines, vectors: VectorTable | None, p: Dict[str, Any],
+                  metrics: Metrics | None = None) -> tuple:
+    """(segments, tables): text-aligned tables plus, with p["ruled_tables"], grid tables from the rulings in `vectors`."""
+    m = metrics or NO_METRICS
+    with m.stage("segments"): segments = split_segments(spans, lines.xorder, lines.starts, space_scale=p["space_scale"])
+    with m.stage("tables"):
+        boxes = (lines.x0, lines.y0, lines.x1, lines.y1)
+        tables = [build_table(segments, boxes, a, b, col_distance=p["table_col_distance"], cluster_engine=p["cluster_engine"])
+                  for a, b in _table_blocks(segments, tolerance=p["table_tolerance"])]
+        if p["ruled_tables"] and vectors is not None and len(vectors):
+            tables = _merge_ruled_tables(tables, vectors, segments, lines)
+    return segments, tables
+
+def layout_paragraphs(lines, tables: List[Dict[str, Any]], metrics: Metrics | None = None) -> Dict[int, List[List[int]]]:
+    """Paragraphs as runs of line indices per column, leaving out lines inside tables that hold text."""
+    with (metrics or NO_METRICS).stage("paragraphs"):
+        # Exclude table lines from paragraph analysis; the grid only hands out lines near each table
+        in_table = np.zeros(len(lines), dtype=bool)
+        grid = GridIndex(lines.x0, lines.y0, lines.x1, lines.y1) if tables else None
         for tbl in tables:
+            if not any(cell for row in tbl.get("rows", ()) for cell in row): continue  # a bare grid holds no lines
             bx0, by0, bx1, by1 = tbl.get("bbox", [0, 0, 0, 0])
-            for i, ln in enumerate(lines):
-                if (by0 <= ln['cy'] <= by1) and (max(bx0, ln['x0']) < min(bx1, ln['x1'])):
-                    table_line_indices.add(i)
-
-        non_table_lines = [ln for i, ln in enumerate(lines) if i not in table_line_indices]
-        
-        # Group remaining lines into paragraphs per column
-        paragraphs_by_col: Dict[int, List[List[Dict[str, Any]]]] = {}
-        cols = sorted(list(set(ln.get("col", 0) for ln in non_table_lines)))
-        for col_id in cols:
-            col_lines = [ln for ln in non_table_lines if ln.get("col", 0) == col_id]
-            if col_lines:
-                paras = group_lines_to_paragraphs(col_lines)
-                paragraphs_by_col[col_id] = paras
-
-        page["lines"] = lines
-        page["paragraphs_by_col"] = paragraphs_by_col
+            near = grid.query(bx0, by0, bx1, by1)
+            cy, lx0, lx1 = lines.cy[near], lines.x0[near], lines.x1[near]
+            in_table[near] |= (by0 <= cy) & (cy <= by1) & (np.maximum(bx0, lx0) < np.minimum(bx1, lx1))
+        non_table = np.nonzero(~in_table)[0]
+
+        # Group remaining lines into paragraphs per column: one stable sort buckets them all
+        runs_by_col: Dict[int, List[List[int]]] = {}
+        by_col = non_table[np.argsort(lines.col[non_table], kind="stable")]
+        for bucket in np.split(by_col, np.flatnonzero(np.diff(lines.col[by_col])) + 1) if by_col.size else []:
+            runs_by_col[int(lines.col[bucket[0]])] = paragraph_runs(lines.y0, lines.y1, lines.text, bucket)
+    return runs_by_col
+
+def paragraphs_to_dicts(runs_by_col: Dict[int, List[List[int]]], line_dicts: List[Dict[str, Any]]) -> Dict[int, List[List[Dict[str, Any]]]]:
+    return {col: [[line_dicts[i] for i in run] for run in runs] for col, runs in runs_by_col.items()}
+
+def _process_page(doc: "fitz.Document", pno: int, opts: Dict[str, Any], store: ImageStore) -> Dict[str, Any]:
+    """
+    Extract + analyze one page, going through the page cache when `opts["cache"]` is set.
+    With `opts["metrics"]` the page gets a "metrics" entry (never cached, it describes this run).
+    """
+    t0 = time.perf_counter()
+    m = Metrics(memory=opts["metrics"] == "memory") if opts.get("metrics") else None
+    page = _cached_page(doc, pno, opts, store, m)
+    if m is not None: page["metrics"] = m.as_dict(time.perf_counter() - t0)
+    return page
+
+def _cached_page(doc: "fitz.Document", pno: int, opts: Dict[str, Any], store: ImageStore, m: Metrics | None) -> Dict[str, Any]:
+    cache = opts.get("cache")
+    if cache is None:
+        raw = extract_page(doc, pno, output_dir=opts["output_dir"], images=opts["images"], store=store, metrics=m)
+        return _analyze_raw(raw, opts, m)
+    doc_hash, mc = opts["doc_hash"], m or NO_METRICS
+    with mc.stage("cache"): page = cache.get(doc_hash, pno, "layout", opts["layout_fp"])
+    if page is not None:
+        mc.count(cache_hits=1)
+        return page
+    with mc.stage("cache"): raw = cache.get(doc_hash, pno, "extract", opts["extract_fp"])
+    if raw is None:
+        raw = extract_page(doc, pno, output_dir=opts["output_dir"], images=opts["images"], store=store, metrics=m)
+        with mc.stage("cache"): cache.put(doc_hash, pno, "extract", opts["extract_fp"], raw)
+    page = _analyze_raw(raw, opts, m)
+    with mc.stage("cache"): cache.put(doc_hash, pno, "layout", opts["layout_fp"], page)
+    return page
+
+def _analyze_raw(raw: Dict[str, Any], opts: Dict[str, Any], m: Metrics | None) -> Dict[str, Any]:
+    """
+    analyze_page, or with opts["memo"] (dedup): boilerplate spans split off, then the layout of an
+    equal page seen before (by this process, or any document in the cache) or a fresh one. The
+    page carries its content key (CONTENT_KEY) for _flag_duplicates in the parent.
+    """
+    memo = opts.get("memo")
+    if memo is None: return analyze_page(raw, opts["params"], metrics=m)
+    mc, p, cache = m or NO_METRICS, opts["params"], opts.get("cache")
+    with mc.stage("dedup"):
+        spans, vectors = raw["text"], raw["vectors"]
+        if not isinstance(spans, SpanTable): spans = SpanTable.from_dicts(spans)
+        if not isinstance(vectors, VectorTable): vectors = VectorTable.from_dicts(vectors)
+        content, extra = split_boilerplate(spans, raw["height"], p["boilerplate_margin"], opts["boilerplate"])
+        raw["text"], raw["vectors"] = content, vectors
+        key = page_key(content, vectors, raw["width"], raw["height"])
+        page = memo.reuse(key, raw)
+        if page is None and cache is not None:
+            layout = cache.get(f"page:{key}", 0, "layout", opts["content_fp"])
+            if layout is not None:
+                page = with_layout(raw, layout)
+                memo.remember(key, page)
+    if page is not None:
+        mc.count(reused_layouts=1)
+    else:
+        page = analyze_page(raw, p, metrics=m)
+        memo.remember(key, page)
+        if cache is not None:
+            with mc.stage("cache"): cache.put(f"page:{key}", 0, "layout", opts["content_fp"], layout_part(page))
+    if extra is not None: mc.count(boilerplate_spans=len(extra))
+    page = add_boilerplate(page, extra)
+    page[CONTENT_KEY] = key
+    return page
+
+def _record_page(page: Dict[str, Any], summary: MetricsSummary, hooks: Sequence[MetricsHook]):
+    summary.add(page["page_number"], page["metrics"])
+    for hook in hooks: hook("page", {"path": summary.path, "page_number": page["page_number"], **page["metrics"]})
+
+def _finish_document(summary: MetricsSummary, hooks: Sequence[MetricsHook]) -> Dict[str, Any]:
+    summary.stop_tracing()
+    doc_metrics = summary.as_dict()
+    for hook in hooks: hook("document", doc_metrics)
+    return doc_metrics
+
+def _run_options(pdf_path: str, output_dir: str, images: str, params: Dict[str, Any] | None,
+                 cache: "PageCache | str | None", metrics: bool | str = False, dedup: bool = False) -> Dict[str, Any]:
+    if images not in IMAGE_MODES: raise ValueError(f"unknown image mode '{images}', expected one of {IMAGE_MODES}")
+    opts = {"output_dir": output_dir, "images": images, "params": layout_params(params), "cache": None, "metrics": metrics}
+    if cache is not None:
+        opts["cache"] = cache if isinstance(cache, PageCache) else PageCache(cache)
+    try:
+        if cache is not None: opts["doc_hash"] = file_sha256(pdf_path)
+        if dedup: _dedup_options(pdf_path, opts)
+    except BaseException:
+        if cache is not None and not isinstance(cache, PageCache): opts["cache"].close()
+        raise
+    if cache is not None:
+        # Eager image filenames point into output_dir, so they are part of the raw stage's identity
+        opts["extract_fp"] = fingerprint({"version": EXTRACT_VERSION, "images": images,
+                                          "output_dir": os.path.abspath(output_dir) if images == "eager" else None})
+        opts["layout_fp"] = fingerprint({"version": LAYOUT_VERSION, "extract": opts["extract_fp"], **opts["params"],
+                                         "dedup": dedup, "boilerplate": sorted(opts.get("boilerplate", ()))})
+    return opts
+
+def _dedup_options(pdf_path: str, opts: Dict[str, Any]):
+    # Boilerplate keys need every page, so they are scanned (header/footer bands only) before any layout
+    p, cache = opts["params"], opts["cache"]
+    opts["memo"] = LayoutMemo()
+    if cache is not None:
+        scan_fp = fingerprint({"version": EXTRACT_VERSION, "margin": p["boilerplate_margin"], "min_pages": p["boilerplate_min_pages"]})
+        # Layout results stored under their page_key serve equal pages of any document
+        opts["content_fp"] = fingerprint({"version": LAYOUT_VERSION, "extract_version": EXTRACT_VERSION, **p})
+        keys = cache.get(opts["doc_hash"], -1, "boilerplate", scan_fp)
+        if keys is not None:
+            opts["boilerplate"] = keys
+            return
+    doc = _open_pdf(pdf_path)
+    try:
+        opts["boilerplate"] = scan_boilerplate(doc, p["boilerplate_margin"], p["boilerplate_min_pages"])
+    finally:
+        doc.close()
+    if cache is not None: cache.put(opts["doc_hash"], -1, "boilerplate", scan_fp, opts["boilerplate"])
+
+def _analyze_page_range(pdf_path: str, start: int, stop: int, opts: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Worker entry point: every process opens its own document by path, so only
+    # the finished page dicts travel back to the parent.
+    doc = _open_pdf(pdf_path)
+    tracing = start_tracing(opts.get("metrics") == "memory")  # one trace for the chunk, off again afterwards
+    try:
+        store = ImageStore(opts["output_dir"])
+        return [_process_page(doc, pno, opts, store) for pno in range(start, stop)]
+    finally:
+        stop_tracing(tracing)
+        doc.close()
+
+def _page_chunks(page_count: int, workers: int, max_chunk: int = 16) -> List[tuple]:
+    # A few chunks per worker keeps the pool busy when some pages are much heavier than others;
+    # the cap keeps the number of finished-but-unconsumed pages small when streaming
+    chunk = max(1, min(max_chunk, -(-page_count // (workers * 4))))
+    return [(a, min(a + chunk, page_count)) for a in range(0, page_count, chunk)]
+
+def _page_count(pdf_path: str) -> int:
+    doc = _open_pdf(pdf_path)
+    n = len(doc)
+    doc.close()
+    return n
+
+def iter_analyzed_pages(pdf_path: str, output_dir: str = "extracted_pdf_assets", workers: int = 1,
+                        images: str = DEFAULT_IMAGE_MODE, params: Dict[str, Any] | None = None,
+                        cache: "PageCache | str | None" = None, metrics: bool | str = False,
+                        hooks: Sequence[MetricsHook] = (), dedup: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one fully analyzed page dict at a time, in page order.
+    Nothing is kept once a page has been handed out, so peak memory follows
+    the largest page (times the number of in-flight chunks when workers > 1).
+    `params` overrides DEFAULT_LAYOUT_PARAMS; `cache` is a PageCache or a path to one.
+    `metrics` (True, or "memory" for tracemalloc deltas) adds page["metrics"]; `hooks` are
+    called with ("page", ...) per page and ("document", summary) once all pages are out.
+    `dedup` reuses the layout of duplicate pages ("duplicate_of"), flags near duplicates
+    ("near_duplicate_of") and tags header/footer lines as boilerplate, see pdf_dedup.py.
+    """
+    metrics = metrics or bool(hooks)
+    pages = _iter_pages(pdf_path, output_dir, workers, images, params, cache, metrics, dedup)
+    if dedup: pages = _flag_duplicates(pages)
+    if not metrics:
+        yield from pages
+        return
+    summary = MetricsSummary(pdf_path, memory=metrics == "memory")
+    try:
+        for page in pages:
+            _record_page(page, summary, hooks)
+            yield page
+        _finish_document(summary, hooks)
+    finally:
+        summary.stop_tracing()  # also when the caller stops early
+
+def _flag_duplicates(pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # In the parent and in page order, so serial and parallel runs flag the same pages
+    first: Dict[str, int] = {}
+    index = NearDuplicateIndex()
+    for page in pages:
+        key = page.pop(CONTENT_KEY, None)
+        if key is not None and key in first:
+            page["duplicate_of"] = first[key]
+        else:
+            if key is not None: first[key] = page["page_number"]
+            shingles = page_shingles(page.get("text", []))
+            hit = index.add(page["page_number"], minhash(shingles)) if shingles else None
+            if hit: page["near_duplicate_of"] = {"page_number": hit[0], "similarity": round(hit[1], 3)}
+        yield page
+
+def _iter_pages(pdf_path: str, output_dir: str, workers: int, images: str, params: Dict[str, Any] | None,
+                cache: "PageCache | str | None", metrics: bool | str, dedup: bool = False) -> Iterator[Dict[str, Any]]:
+    safe_mkdir(output_dir)
+    # Options first: bad params, image mode or cache raise before the document is opened
+    opts = _run_options(pdf_path, output_dir, images, params, cache, metrics, dedup)
+    try:
+        doc = _open_pdf(pdf_path)
+        if workers <= 1:
+            yield from _serial_pages(doc, opts)
+            return
+        page_count = len(doc)
+        doc.close()
+        yield from _parallel_pages(pdf_path, page_count, workers, opts)
+        if opts["cache"] is not None: opts["cache"].trim()  # the workers' writes were not counted
+    finally:
+        if cache is not None and not isinstance(cache, PageCache): opts["cache"].close()  # opened for this run
+
+def _serial_pages(doc: "fitz.Document", opts: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    try:
+        store = ImageStore(opts["output_dir"])
+        for pno in range(len(doc)):
+            yield _process_page(doc, pno, opts, store)
+    finally:
+        doc.close()
+
+def _parallel_pages(pdf_path: str, page_count: int, workers: int, opts: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    chunks = _page_chunks(page_count, workers)
+    if not chunks: return
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        pending: deque = deque()
+        todo = iter(chunks)
+        for a, b in itertools.islice(todo, workers * 2):
+            pending.append(pool.submit(_analyze_page_range, pdf_path, a, b, opts))
+        while pending:
+            pages = pending.popleft().result()  # submission order == page order
+            nxt = next(todo, None)
+            if nxt: pending.append(pool.submit(_analyze_page_range, pdf_path, nxt[0], nxt[1], opts))
+            while pages:
+                yield pages.pop(0)
+
+def analyze_pdf(pdf_path: str, output_dir: str = "extracted_pdf_assets", workers: int = 1,
+                images: str = DEFAULT_IMAGE_MODE, params: Dict[str, Any] | None = None,
+                cache: "PageCache | str | None" = None, metrics: bool | str = False,
+                hooks: Sequence[MetricsHook] = (), dedup: bool = False) -> Dict[str, Any]:
+    struct: Dict[str, Any] = {"path": pdf_path, "pages": []}
+    doc_metrics: Dict[str, Any] = {}
+    if metrics or hooks:
+        hooks = [*hooks, lambda event, data: doc_metrics.update(data) if event == "document" else None]
+    struct["pages"].extend(iter_analyzed_pages(pdf_path, output_dir=output_dir, workers=workers, images=images,
+                                               params=params, cache=cache, metrics=metrics, hooks=hooks, dedup=dedup))
+    struct["page_count"] = len(struct["pages"])
+    if doc_metrics: struct["metrics"] = doc_metrics
     return struct
 
 # -------------------------
@@ -402,63 +690,27 @@ def analyze_pdf(pdf_path: str, output_dir: str = "extracted_pdf_assets") -> Dict
 # -------------------------
 
 def visualize_page(struct: Dict[str, Any], page_number: int = 1, save_path: str | None = None, show: bool = False):
-    pages = struct.get("pages", [])
-    if not (1 <= page_number <= len(pages)): raise ValueError("page_number out of range")
-    page = pages[page_number - 1]
-    w, h = page["width"], page["height"]
-    fig, ax = plt.subplots(figsize=(w/72, h/72), dpi=150)
-    margin = max(20, min(w, h) * 0.03)
-    ax.set_xlim(-margin, w + margin); ax.set_ylim(-margin, h + margin)
-    
-    # Draw Images
-    for img in page.get("images", []):
-        x0, y0, x1, y1 = img.get("bbox", [0,0,0,0])
-        ax.add_patch(Rectangle((x0, y0), x1 - x0, y1 - y0, fill=True, alpha=0.18, color='gray'))
-        ax.text((x0 + x1) / 2, (y0 + y1) / 2, "[IMG]", ha='center', va='center', fontsize=6)
-
-    # Draw Text Spans (Cyan)
-    for t in page.get("text", []):
-        x0, y0, x1, y1 = t["bbox"]
-        ax.add_patch(Rectangle((x0, y0), x1 - x0, y1 - y0, fill=False, linewidth=0.25, edgecolor='cyan', alpha=0.5))
-
-    # Draw Paragraphs (Green)
-    for col, paras in page.get("paragraphs_by_col", {}).items():
-        for para in paras:
-            if not para: continue
-            
-            # Calculate paragraph bounding box
-            all_x0 = [ln['x0'] for ln in para]; all_y0 = [ln['y0'] for ln in para]
-            all_x1 = [ln['x1'] for ln in para]; all_y1 = [ln['y1'] for ln in para]
-            if not all_x0: continue
-            px0, py0, px1, py1 = min(all_x0), min(all_y0), max(all_x1), max(all_y1)
-            
-            # Draw the Paragraph Box
-            ax.add_patch(Rectangle((px0, py0), px1 - px0, py1 - py0, fill=False, edgecolor='green', linewidth=0.8, alpha=0.7))
-            
-            # Draw the Text
-            for ln in para:
-                # FIX: removed stale 'x0' variable and corrected alignment
-                l_x0, l_y0, _, _ = ln['bbox']
-                ax.text(l_x0, l_y0, s=ln['text'], ha='left', va='top', fontsize=6)
-
-    # Draw Tables (Red)
-    for tbl in page.get("tables", []):
-        bx0, by0, bx1, by1 = tbl.get("bbox", [0, 0, 0, 0])
-        ax.add_patch(Rectangle((bx0, by0), bx1 - bx0, by1 - by0, fill=False, edgecolor='red', linewidth=1.2, alpha=0.7))
-        
-    ax.set_aspect('equal'); ax.invert_yaxis(); ax.axis('off')
-    
-    if save_path:
-        plt.savefig(save_path, bbox_inches='tight')
-        print(f"Saved visualization to {save_path}")
-    if show: plt.show()
-    plt.close(fig)
+    from pdf_visualize import visualize_page as draw  # matplotlib is only imported when something is drawn
+    draw(struct, page_number=page_number, save_path=save_path, show=show)
 
 def save_structure_json(struct: Dict[str, Any], out_json_path: str):
     with open(out_json_path, "w", encoding="utf-8") as fh:
         json.dump(struct, fh, indent=2, ensure_ascii=False)
     print(f"Saved structure JSON to {out_json_path}")
 
+def save_pages_ndjson(pages: Iterable[Dict[str, Any]], out_path: str, header: Dict[str, Any] | None = None) -> int:
+    """Writes one JSON document per line (optional header first) as pages arrive; returns the page count."""
+    n = 0
+    with open(out_path, "w", encoding="utf-8") as fh:
+        if header is not None:
+            fh.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for page in pages:
+            fh.write(json.dumps(page, ensure_ascii=False) + "\n")
+            fh.flush()
+            n += 1
+    print(f"Saved {n} page(s) as NDJSON to {out_path}")
+    return n
+
 # -------------------------
 # CLI-like main (demo)
 # -------------------------
@@ -470,14 +722,61 @@ if __name__ == "__main__":
     parser.add_argument("--outdir", default="extracted_pdf_assets", help="output dir for assets")
     parser.add_argument("--json", default="pdf_structure.json", help="output JSON file")
     parser.add_argument("--visualize", action="store_true", help="save visualizations for all pages")
+    parser.add_argument("--vis-format", default="png", choices=("png", "svg", "matplotlib"),
+                        help="png/svg: batched overlays (pdf_render.py), rendered in parallel; matplotlib: pdf_visualize.py")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (pages are split across them)")
+    parser.add_argument("--cluster-engine", default=DEFAULT_CLUSTER_ENGINE, choices=CLUSTER_ENGINES, help="1-D clustering engine for columns and table cells")
+    parser.add_argument("--images", default=DEFAULT_IMAGE_MODE, choices=IMAGE_MODES, help="image handling: none, metadata, lazy or eager")
+    parser.add_argument("--ndjson", default=None, help="stream pages to this NDJSON file instead of writing --json")
+    parser.add_argument("--format", default="json", choices=OUTPUT_FORMATS,
+                        help="json: nested, indented; compact: spans stored once, lines/paragraphs by index; columnar: .npy arrays + index.json in the --json path (a directory)")
+    parser.add_argument("--max-columns", type=int, default=DEFAULT_LAYOUT_PARAMS["max_columns"], help="maximum number of text columns")
+    parser.add_argument("--space-scale", type=float, default=DEFAULT_LAYOUT_PARAMS["space_scale"], help="gap (in spaces) that splits table cells")
+    parser.add_argument("--table-tolerance", type=float, default=DEFAULT_LAYOUT_PARAMS["table_tolerance"], help="min x-overlap (pt) of aligned table cells")
+    parser.add_argument("--max-vectors", type=int, default=DEFAULT_LAYOUT_PARAMS["max_vectors"], help="vector elements kept per page (0 = no cap)")
+    parser.add_argument("--dedup", action="store_true", help="reuse layout of duplicate pages, flag near duplicates, tag header/footer boilerplate")
+    parser.add_argument("--cache", default=None, help="SQLite file for the per-page result cache")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_CACHE_BYTES // 1024 ** 2, help="cache size limit (LRU eviction)")
+    parser.add_argument("--profile", action="store_true", help="record per-stage metrics and print the slowest pages and stages")
+    parser.add_argument("--profile-memory", action="store_true", help="with --profile, also record tracemalloc deltas per stage")
+    parser.add_argument("--metrics-ndjson", default=None, help="append page/document metrics events to this NDJSON file")
     args = parser.parse_args()
     if not os.path.exists(args.pdf):
         print(f"[error] {args.pdf} not found"); raise SystemExit(2)
-    result = analyze_pdf(args.pdf, output_dir=args.outdir)
-    save_structure_json(result, args.json)
+    params = {"max_columns": args.max_columns, "space_scale": args.space_scale,
+              "table_tolerance": args.table_tolerance, "cluster_engine": args.cluster_engine,
+              "max_vectors": args.max_vectors or None}
+    cache = PageCache(args.cache, max_bytes=args.cache_size_mb * 1024 ** 2) if args.cache else None
+    metrics = ("memory" if args.profile_memory else True) if args.profile or args.profile_memory else False
+    hooks = [ndjson_hook(args.metrics_ndjson)] if args.metrics_ndjson else []
+    if metrics: hooks.append(lambda event, data: print(format_profile(data)) if event == "document" else None)
+    if args.ndjson:
+        if args.format == "columnar": parser.error("--format columnar writes a directory, it cannot be streamed with --ndjson")
+        def _stream():
+            for page in iter_analyzed_pages(args.pdf, output_dir=args.outdir, workers=args.workers, images=args.images,
+                                            params=params, cache=cache, metrics=metrics, hooks=hooks, dedup=args.dedup):
+                yield normalize_page(page) if args.format == "compact" else page
+                if args.visualize and args.vis_format == "matplotlib":
+                    visualize_page({"pages": [page]}, page_number=1, save_path=f"layout_page{page['page_number']}.png")
+                elif args.visualize:
+                    from pdf_render import render_pages
+                    render_pages({"path": args.pdf, "pages": [page]}, fmt=args.vis_format)
+        save_pages_ndjson(_stream(), args.ndjson, header={"path": args.pdf, "page_count": _page_count(args.pdf)})
+        print("Done."); raise SystemExit(0)
+    result = analyze_pdf(args.pdf, output_dir=args.outdir, workers=args.workers, images=args.images,
+                         params=params, cache=cache, metrics=metrics, hooks=hooks, dedup=args.dedup)
+    if args.format == "compact": save_compact_json(result, args.json)
+    elif args.format == "columnar":
+        save_columnar(result, args.json)
+        print(f"Saved columnar store to {args.json}")
+    else: save_structure_json(result, args.json)
     if args.visualize and result.get("pages"):
         page_count = result.get("page_count", 0)
         print(f"Visualizing {page_count} page(s)...")
-        for i in range(page_count):
-            visualize_page(result, page_number=i + 1, save_path=f"layout_page{i+1}.png")
+        if args.vis_format == "matplotlib":
+            for i in range(page_count):
+                visualize_page(result, page_number=i + 1, save_path=f"layout_page{i+1}.png")
+        else:
+            from pdf_render import render_pages
+            render_pages(result, fmt=args.vis_format, workers=args.workers)
     print("Done.")
@@ -0,0 +1,182 @@
+# Fast layout overlays without matplotlib
+# - png: MuPDF renders the real page; the overlay boxes are drawn onto it first through one
+#        Shape with one path per layer (every span rect in a single draw/finish), so the cost
+#        is one content stream per page instead of one matplotlib artist per box
+# - svg: one self-contained SVG per page, one <path> per layer (all rects in a single "d"),
+#        paragraph line text as <text>; the page itself can be embedded as a PNG background
+# - render_pages draws many pages in a process pool (chunks of pages per worker, the PDF is
+#   opened once per chunk); pdf_visualize.py stays the matplotlib version
+#
+#     render_pages(analyze_pdf("doc.pdf"), out_dir="layout", fmt="svg", workers=8)
+
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+RENDER_FORMATS = ("png", "svg")
+
+# Drawn in this order, later layers on top: (name, stroke RGB, fill RGB or None, line width, opacity)
+LAYERS = (
+    ("images", (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), 0.0, 0.18),
+    ("spans", (0.0, 0.8, 0.8), None, 0.25, 0.5),
+    ("rulings", (1.0, 0.55, 0.0), None, 0.6, 0.8),
+    ("paragraphs", (0.0, 0.5, 0.0), None, 0.8, 0.7),
+    ("tables", (0.9, 0.0, 0.0), None, 1.2, 0.7),
+)
+
+def overlay_boxes(page: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """(N, 4) x0, y0, x1, y1 arrays per layer of LAYERS; paragraph boxes are the union of their lines."""
+    def arr(boxes):
+        return np.array(boxes, dtype=float).reshape(-1, 4)
+    paras = [[min(ln["x0"] for ln in p), min(ln["y0"] for ln in p), max(ln["x1"] for ln in p), max(ln["y1"] for ln in p)]
+             for paras in page.get("paragraphs_by_col", {}).values() for p in paras if p]
+    return {
+        "images": arr([img.get("bbox", [0, 0, 0, 0]) for img in page.get("images", [])]),
+        "spans": arr([t["bbox"] for t in page.get("text", [])]),
+        "rulings": arr([v["bbox"] for v in page.get("vectors", []) if v.get("type") == "ruling"]),
+        "paragraphs": arr(paras),
+        "tables": arr([t.get("bbox", [0, 0, 0, 0]) for t in page.get("tables", [])]),
+    }
+
+def _overlay(page: Dict[str, Any]) -> Dict[str, Any]:
+    # Only what a renderer needs; this is what travels to the worker processes
+    lines = [(ln["bbox"], ln["text"]) for paras in page.get("paragraphs_by_col", {}).values() for p in paras for ln in p]
+    return {"page_number": page["page_number"], "width": page["width"], "height": page["height"],
+            "boxes": overlay_boxes(page), "lines": lines}
+
+# -------------------------
+# PNG (PyMuPDF)
+# -------------------------
+
+def _draw_png(doc: "fitz.Document", ov: Dict[str, Any], path: str, dpi: int):
+    import fitz
+    page = doc[ov["page_number"] - 1]
+    # get_text coordinates are unrotated page space, the same space Shape draws in
+    shape = page.new_shape()
+    for name, stroke, fill, width, opacity in LAYERS:
+        boxes = ov["boxes"][name]
+        if not len(boxes): continue
+        for x0, y0, x1, y1 in boxes.tolist():
+            shape.draw_rect(fitz.Rect(x0, y0, x1, y1))
+        shape.finish(color=stroke if width else None, fill=fill, width=width or 1,
+                     stroke_opacity=opacity, fill_opacity=opacity)
+    shape.commit(overlay=True)
+    page.get_pixmap(dpi=dpi).save(path)
+
+# -------------------------
+# SVG
+# -------------------------
+
+def _rgb(c: Sequence[float]) -> str:
+    return "#%02x%02x%02x" % tuple(round(v * 255) for v in c)
+
+def _path_data(boxes: np.ndarray) -> str:
+    b = np.round(boxes, 2)
+    w, h = b[:, 2] - b[:, 0], b[:, 3] - b[:, 1]
+    return "".join(f"M{x:g} {y:g}h{dx:g}v{dy:g}h{-dx:g}z" for x, y, dx, dy in zip(b[:, 0].tolist(), b[:, 1].tolist(),
+                                                                            w.tolist(), h.tolist()))
+
+def svg_page(ov: Dict[str, Any], background: bytes | None = None, text: bool = True,
+             transform: Sequence[float] | None = None) -> str:
+    """
+    SVG document for one overlay (see _overlay); `background` is a PNG of the page. `transform`
+    (a, b, c, d, e, f) maps the overlay's unrotated coordinates onto a rotated page.
+    """
+    w, h = ov["width"], ov["height"]
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {w:g} {h:g}" width="{w:g}pt" height="{h:g}pt">',
+           f'<rect width="{w:g}" height="{h:g}" fill="#fff"/>']
+    if background:
+        import base64
+        out.append(f'<image width="{w:g}" height="{h:g}" href="data:image/png;base64,{base64.b64encode(background).decode()}"/>')
+    if transform: out.append(f'<g transform="matrix({" ".join(f"{v:g}" for v in transform)})">')
+    for name, stroke, fill, width, opacity in LAYERS:
+        boxes = ov["boxes"][name]
+        if not len(boxes): continue
+        paint = f'fill="{_rgb(fill)}" fill-opacity="{opacity}"' if fill else 'fill="none"'
+        if width: paint += f' stroke="{_rgb(stroke)}" stroke-width="{width}" stroke-opacity="{opacity}"'
+        out.append(f'<path class="{name}" {paint} d="{_path_data(boxes)}"/>')
+    if text and ov["lines"] and not background:
+        out.append('<g class="lines" font-family="Helvetica, Arial, sans-serif" fill="#000">')
+        for (x0, y0, x1, y1), s in ov["lines"]:
+            fs = max(1.0, min(6.0, (y1 - y0) * 0.8))
+            out.append(f'<text x="{x0:g}" y="{y0 + fs:g}" font-size="{fs:.1f}">{html.escape(s)}</text>')
+        out.append("</g>")
+    if transform: out.append("</g>")
+    out.append("</svg>")
+    return "\n".join(out)
+
+def _draw_svg(doc: "fitz.Document | None", ov: Dict[str, Any], path: str, dpi: int):
+    background = transform = None
+    if doc is not None:
+        page = doc[ov["page_number"] - 1]
+        background = page.get_pixmap(dpi=dpi).tobytes("png")
+        if page.rotation: transform = tuple(page.rotation_matrix)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(svg_page(ov, background, transform=transform))
+
+# -------------------------
+# Pages in parallel
+# -------------------------
+
+def _render_chunk(pdf_path: str | None, overlays: List[Dict[str, Any]], out_dir: str, fmt: str, dpi: int) -> List[str]:
+    import fitz
+    doc = fitz.open(pdf_path) if pdf_path else None
+    draw = _draw_png if fmt == "png" else _draw_svg
+    paths = []
+    try:
+        for ov in overlays:
+            path = os.path.join(out_dir, f"layout_page{ov['page_number']}.{fmt}")
+            draw(doc, ov, path, dpi)
+            paths.append(path)
+    finally:
+        if doc is not None: doc.close()
+    return paths
+
+def render_pages(struct: Dict[str, Any], out_dir: str = ".", fmt: str = "png", pages: Iterable[int] | None = None,
+                 workers: int = 1, dpi: int = 100, background: bool = True) -> List[str]:
+    """
+    Writes layout_page<N>.<fmt> for the given page numbers (1-based, default: all) and returns the paths.
+    png needs struct["path"] (the page is rendered from the PDF); svg embeds the page only with
+    `background`, otherwise it draws the line text itself like pdf_visualize does.
+    """
+    if fmt not in RENDER_FORMATS: raise ValueError(f"unknown render format {fmt!r}, expected one of {RENDER_FORMATS}")
+    pdf_path = struct.get("path") if fmt == "png" or background else None
+    if fmt == "png" and not pdf_path: raise ValueError("png rendering needs struct['path'] (the source PDF)")
+    by_number = {p["page_number"]: p for p in struct.get("pages", [])}
+    wanted = sorted(by_number) if pages is None else list(pages)
+    missing = [n for n in wanted if n not in by_number]
+    if missing: raise ValueError(f"page number(s) {missing} not in the structure")
+    os.makedirs(out_dir, exist_ok=True)
+    overlays = [_overlay(by_number[n]) for n in wanted]
+    if workers <= 1 or len(overlays) < 2:
+        return _render_chunk(pdf_path, overlays, out_dir, fmt, dpi)
+    chunk = max(1, -(-len(overlays) // (workers * 4)))
+    paths: List[str] = []
+    with ProcessPoolExecutor(max_workers=min(workers, -(-len(overlays) // chunk))) as pool:
+        futures = [pool.submit(_render_chunk, pdf_path, overlays[a:a + chunk], out_dir, fmt, dpi)
+                   for a in range(0, len(overlays), chunk)]
+        for f in futures:
+            paths.extend(f.result())
+    return paths
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from pdf_output import load_structure_json
+    parser = argparse.ArgumentParser(description="Render layout overlays of an analyzed PDF")
+    parser.add_argument("json", help="structure JSON written by pdf_parser.py (json or compact format)")
+    parser.add_argument("--outdir", default=".", help="where layout_page<N>.<format> files go")
+    parser.add_argument("--format", default="png", choices=RENDER_FORMATS, help="png: overlays on the rendered page; svg: vector layer")
+    parser.add_argument("--pages", default=None, help="comma-separated 1-based page numbers (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pages rendered in parallel")
+    parser.add_argument("--dpi", type=int, default=100, help="resolution of the rendered page")
+    parser.add_argument("--no-background", action="store_true", help="svg: draw line text instead of embedding the page")
+    args = parser.parse_args()
+    struct = load_structure_json(args.json)
+    pages = [int(n) for n in args.pages.split(",")] if args.pages else None
+    t0 = time.perf_counter()
+    out = render_pages(struct, args.outdir, args.format, pages, args.workers, args.dpi, not args.no_background)
+    print(f"Rendered {len(out)} page(s) to {args.outdir} in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,376 @@
+# Local HTTP extraction service (asyncio, standard library only)
+# - one long-lived process pool whose workers import pdf_parser at startup, so a request
+#   only pays for its own pages, not for interpreter startup and imports
+# - POST /analyze takes a PDF upload (any non-JSON body) or a JSON body {"path": ...};
+#   pages are split into chunks across the pool and streamed back in page order as NDJSON:
+#   {"path", "page_count"} header, one line per page, then {"done": true, ...} or {"error": ...};
+#   ?format=compact sends normalized pages (pdf_output.normalize_page)
+# - at most `max_concurrent` requests run at once and `max_queue` more may wait for a slot
+#   (requests still sending their upload count as waiting); beyond that the service answers 429
+#   with Retry-After before reading the upload. Error answers are followed by a half-close and a
+#   bounded drain of the unread body, so the client reads the answer instead of a connection reset
+# - every request has a deadline (queue wait + analysis); a request that runs out of time gets
+#   503 while queued or an {"error": "timed out ..."} trailer once streaming has started
+# - GET /health reports the pool size and the active / queued / rejected counters
+#
+# usage: python pdf_service.py --workers 4 --path-root docs/
+#        curl -s --data-binary @doc.pdf "http://127.0.0.1:8765/analyze?images=none"
+#        curl -s -H "Content-Type: application/json" -d '{"path": "docs/a.pdf"}' http://127.0.0.1:8765/analyze
+
+import asyncio
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+from typing import Any, Dict, Iterator, List
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import pdf_parser
+from pdf_cache import PageCache
+from pdf_images import IMAGE_MODES
+from pdf_output import normalize_page
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SERVICE_IMAGE_MODE = "metadata"  # eager writes files on the server side, so uploads don't default to it
+MAX_HEADER_BYTES = 64 * 1024
+DRAIN_BYTES = 64 * 1024 ** 2  # unread request body discarded after an error answer, at most
+DRAIN_SECONDS = 5.0
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+class HTTPError(Exception):
+    """An error answered with a JSON body {"error": message} before any page has been sent."""
+
+    def __init__(self, status: int, message: str, headers: Dict[str, str] | None = None):
+        super().__init__(message)
+        self.status, self.message, self.headers = status, message, headers or {}
+
+def _warm_worker():
+    import pdf_parser  # noqa: F401  (imports are paid once per worker, at pool start)
+
+def _ping() -> int:
+    return os.getpid()
+
+def _analyze_chunk(pdf_path: str, start: int, stop: int, opts: Dict[str, Any], compact: bool = False) -> List[str]:
+    # Pages are serialized in the worker: the event loop only forwards finished lines
+    pages = pdf_parser._analyze_page_range(pdf_path, start, stop, opts)
+    return [json.dumps(normalize_page(p) if compact else p, ensure_ascii=False, separators=(",", ":")) for p in pages]
+
+class ExtractionService:
+    """
+    Process pool + admission control behind the HTTP handlers. `path_root` enables {"path": ...}
+    requests for files below that directory (None: uploads only). `cache` is a PageCache path.
+    """
+
+    def __init__(self, workers: int = 2, max_concurrent: int = 4, max_queue: int = 16, timeout: float = 120.0,
+                 max_upload_bytes: int = 256 * 1024 ** 2, output_dir: str = "service_assets",
+                 images: str = SERVICE_IMAGE_MODE, cache: str | None = None, path_root: str | None = None):
+        self.workers, self.max_concurrent, self.max_queue = max(1, workers), max(1, max_concurrent), max(0, max_queue)
+        self.timeout, self.max_upload_bytes = timeout, max_upload_bytes
+        self.output_dir, self.images, self.cache = pdf_parser.safe_mkdir(output_dir), images, cache
+        self.path_root = os.path.realpath(path_root) if path_root else None
+        self.spool_dir = pdf_parser.safe_mkdir(os.path.join(output_dir, "uploads"))
+        self._pool: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._cache: PageCache | None = None
+        self.active = self.waiting = self.served = self.rejected = 0
+
+    # -- pool --
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the parent runs an event loop and threads
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_warm_worker)
+
+    async def _warm_up(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)))
+
+    async def _replace_pool(self, broken: ProcessPoolExecutor):
+        if self._pool is not broken: return  # another request already replaced it
+        print("[warn] a worker process died, restarting the pool")
+        self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+        await self._warm_up()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        # The service's copy tracks the size and evicts; each worker opens one connection from the pickled path
+        if self.cache: self._cache = PageCache(self.cache)
+        self._pool = self._new_pool()
+        await self._warm_up()
+        return await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+
+    def close(self):
+        if self._pool is not None: self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._cache is not None: self._cache.close()
+        self._pool = self._cache = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"status": "ok", "workers": self.workers, "active": self.active, "queued": self.waiting,
+                "max_concurrent": self.max_concurrent, "max_queue": self.max_queue,
+                "served": self.served, "rejected": self.rejected}
+
+    # -- HTTP plumbing --
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target, headers = await asyncio.wait_for(_read_head(reader), self.timeout)
+                url = urlsplit(target)
+                if url.path == "/health":
+                    if method != "GET": raise HTTPError(405, "use GET")
+                    await _send_json(writer, 200, self.stats())
+                elif url.path == "/analyze":
+                    if method != "POST": raise HTTPError(405, "use POST")
+                    await self._analyze(reader, writer, parse_qs(url.query), headers)
+                else:
+                    raise HTTPError(404, f"no route {url.path}")
+            except HTTPError as e:
+                await _send_json(writer, e.status, {"error": e.message}, e.headers)
+                await _drain(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass  # client went away or never sent a full request
+        finally:
+            writer.close()
+            with suppress(Exception): await writer.wait_closed()
+
+    async def _analyze(self, reader, writer, query: Dict[str, List[str]], headers: Dict[str, str]):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        # Counted at admission: requests still uploading have not taken a slot yet
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise HTTPError(429, "service busy, retry later", {"Retry-After": "1"})
+        self.waiting += 1
+        upload = None
+        try:
+            try:
+                job = await self._read_job(reader, query, headers)
+                upload = job["upload"]
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    raise HTTPError(503, "timed out waiting for a free slot", {"Retry-After": "1"})
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            try:
+                await self._stream(writer, job, deadline)
+            finally:
+                self.active -= 1
+                self._slots.release()
+        finally:
+            if upload:
+                with suppress(OSError): os.remove(upload)
+
+    async def _read_job(self, reader, query: Dict[str, List[str]], headers: Dict[str, str]) -> Dict[str, Any]:
+        """Request options plus the PDF to analyze: a spooled upload or a file below path_root."""
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_upload_bytes: raise HTTPError(413, f"body larger than {self.max_upload_bytes} bytes")
+        job: Dict[str, Any] = {"images": (query.get("images") or [self.images])[0], "upload": None,
+                               "metrics": (query.get("metrics") or ["0"])[0] in ("1", "true"),
+                               "format": (query.get("format") or ["json"])[0]}
+        try:
+            job["params"] = json.loads(query["params"][0]) if "params" in query else None
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"params is not valid JSON: {e}")
+        if headers.get("content-type", "").startswith("application/json"):
+            try:
+                body = json.loads(await reader.readexactly(length) or b"{}")
+            except json.JSONDecodeError as e:
+                raise HTTPError(400, f"body is not valid JSON: {e}")
+            if not isinstance(body, dict): raise HTTPError(400, "JSON body must be an object")
+            job.update({k: body[k] for k in ("images", "params", "metrics", "format") if k in body})
+            _check_options(job)
+            job["path"] = self._allowed_path(body.get("path"))
+            job["name"] = body["path"]
+        else:
+            if not length: raise HTTPError(400, "empty upload (send the PDF as the body, or JSON with a path)")
+            _check_options(job)  # before spooling, so a rejected upload leaves no file behind
+            job["path"] = job["upload"] = await self._spool(reader, length)
+            job["name"] = (query.get("name") or ["upload.pdf"])[0]
+        return job
+
+    def _allowed_path(self, path: str | None) -> str:
+        if not path: raise HTTPError(400, "JSON body needs a 'path'")
+        if self.path_root is None: raise HTTPError(403, "path requests are disabled (start the service with --path-root)")
+        real = os.path.realpath(os.path.join(self.path_root, path))
+        if os.path.commonpath([real, self.path_root]) != self.path_root: raise HTTPError(403, f"{path} is outside the path root")
+        if not os.path.isfile(real): raise HTTPError(404, f"{path} not found")
+        return real
+
+    async def _spool(self, reader, length: int) -> str:
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.spool_dir)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(1 << 20, remaining))
+                    if not chunk: raise HTTPError(400, "upload ended before Content-Length bytes")
+                    fh.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    async def _stream(self, writer, job: Dict[str, Any], deadline: float):
+        loop = asyncio.get_running_loop()
+        try:
+            page_count = await loop.run_in_executor(None, pdf_parser._page_count, job["path"])
+            opts = await loop.run_in_executor(None, pdf_parser._run_options, job["path"], self.output_dir, job["images"],
+                                              job["params"], self._cache, job["metrics"])
+        except RuntimeError as e:
+            raise HTTPError(400, str(e).replace(job["path"], job["name"]))  # don't leak the spool path
+        writer.write(_head(200, "application/x-ndjson", {"Transfer-Encoding": "chunked"}))
+        await _send_line(writer, json.dumps({"path": job["name"], "page_count": page_count}, ensure_ascii=False))
+
+        # Like _iter_pages with workers > 1, but a request keeps at most `workers` chunks in
+        # flight, so concurrent requests share the pool instead of queueing behind each other
+        t0, sent = time.perf_counter(), 0
+        pool = self._pool
+        todo = iter(pdf_parser._page_chunks(page_count, self.workers))
+        compact = job["format"] == "compact"
+        pending: deque = deque(loop.run_in_executor(pool, _analyze_chunk, job["path"], a, b, opts, compact)
+                               for a, b in itertools.islice(todo, self.workers))
+        try:
+            while pending:
+                lines = await asyncio.wait_for(pending.popleft(), max(0.0, deadline - loop.time()))
+                nxt = next(todo, None)
+                if nxt: pending.append(loop.run_in_executor(pool, _analyze_chunk, job["path"], nxt[0], nxt[1], opts, compact))
+                for line in lines:
+                    await _send_line(writer, line)  # a slow reader holds back its own request, not the pool
+                    sent += 1
+            trailer = {"done": True, "page_count": sent, "seconds": round(time.perf_counter() - t0, 4)}
+            self.served += 1
+        except asyncio.TimeoutError:
+            trailer = {"error": f"timed out after {self.timeout:g}s", "pages_sent": sent}
+        except BrokenProcessPool:
+            await self._replace_pool(pool)
+            trailer = {"error": "worker process crashed", "pages_sent": sent}
+        except ConnectionError:
+            raise
+        except Exception as e:
+            trailer = {"error": f"{type(e).__name__}: {e}", "pages_sent": sent}
+        finally:
+            for fut in pending: fut.cancel()  # chunks not started yet; running ones finish in the background
+            if self._cache is not None: self._cache.trim()  # workers write without counting the size
+        await _send_line(writer, json.dumps(trailer, ensure_ascii=False))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+def _check_options(job: Dict[str, Any]):
+    if job["images"] not in IMAGE_MODES: raise HTTPError(400, f"images must be one of {IMAGE_MODES}")
+    if job["format"] not in ("json", "compact"): raise HTTPError(400, "format must be 'json' or 'compact'")
+    try:
+        pdf_parser.layout_params(job["params"])
+    except (ValueError, TypeError) as e:
+        raise HTTPError(400, str(e))
+
+async def _read_head(reader: asyncio.StreamReader) -> tuple:
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "request head too large")
+    lines = raw.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+        headers = dict((k.strip().lower(), v.strip()) for k, v in (ln.split(":", 1) for ln in lines[1:] if ln))
+    except ValueError:
+        raise HTTPError(400, "malformed request")
+    return method.upper(), target, headers
+
+def _head(status: int, content_type: str, headers: Dict[str, str] | None = None) -> bytes:
+    out = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+    out.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    return ("\r\n".join(out) + "\r\n\r\n").encode("latin-1")
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, body: Dict[str, Any], headers: Dict[str, str] | None = None):
+    data = json.dumps(body).encode("utf-8")
+    writer.write(_head(status, "application/json", {**(headers or {}), "Content-Length": str(len(data))}) + data)
+    await writer.drain()
+
+async def _drain(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """After an error answer: half-close, then discard what the client still sends (bounded), then close."""
+    with suppress(OSError, RuntimeError):
+        if writer.can_write_eof(): writer.write_eof()
+    loop = asyncio.get_running_loop()
+    deadline, left = loop.time() + DRAIN_SECONDS, DRAIN_BYTES
+    with suppress(ConnectionError, asyncio.TimeoutError):
+        while left > 0:
+            chunk = await asyncio.wait_for(reader.read(min(1 << 16, left)), max(0.0, deadline - loop.time()))
+            if not chunk: break
+            left -= len(chunk)
+
+async def _send_line(writer: asyncio.StreamWriter, line: str):
+    """One NDJSON line as one HTTP chunk."""
+    data = (line + "\n").encode("utf-8")
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+    await writer.drain()
+
+# -------------------------
+# Client (for scripts and tests against localhost)
+# -------------------------
+
+def iter_remote_pages(pdf_path: str | None = None, data: bytes | None = None, host: str = DEFAULT_HOST,
+                      port: int = DEFAULT_PORT, images: str | None = None, params: Dict[str, Any] | None = None,
+                      format: str | None = None, timeout: float | None = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams the NDJSON records of one /analyze call: header, pages, trailer. `pdf_path` is sent as a
+    path request (resolved below the service's path root), `data` as an upload.
+    Raises RuntimeError with the service's message on a non-200 answer.
+    """
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    query = {k: v for k, v in (("images", images), ("params", json.dumps(params) if params else None), ("format", format)) if v}
+    try:
+        if data is not None:
+            conn.request("POST", "/analyze?" + urlencode(query), body=data, headers={"Content-Type": "application/pdf"})
+        else:
+            conn.request("POST", "/analyze?" + urlencode(query), body=json.dumps({"path": pdf_path}),
+                         headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        if resp.status != 200:
+            raise RuntimeError(f"{resp.status} {resp.reason}: {json.loads(resp.read() or b'{}').get('error')}")
+        for line in resp:
+            if line.strip(): yield json.loads(line)
+    finally:
+        conn.close()
+
+async def serve(service: ExtractionService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    server = await service.start(host, port)
+    print(f"[service] {service.workers} warm worker(s), listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local HTTP service streaming analyzed PDF pages as NDJSON")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="bind address (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of warm worker processes")
+    parser.add_argument("--max-concurrent", type=int, default=4, help="requests analyzed at the same time")
+    parser.add_argument("--max-queue", type=int, default=16, help="requests waiting for a slot before 429 is returned")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request deadline in seconds (queue wait included)")
+    parser.add_argument("--max-upload-mb", type=int, default=256, help="largest accepted upload")
+    parser.add_argument("--outdir", default="service_assets", help="output dir for image assets and spooled uploads")
+    parser.add_argument("--images", default=SERVICE_IMAGE_MODE, choices=IMAGE_MODES, help="default image handling")
+    parser.add_argument("--cache", default=None, help="SQLite file for the per-page result cache")
+    parser.add_argument("--path-root", default=None, help="allow {\"path\": ...} requests for files below this directory")
+    args = parser.parse_args()
+    svc = ExtractionService(workers=args.workers, max_concurrent=args.max_concurrent, max_queue=args.max_queue,
+                            timeout=args.timeout, max_upload_bytes=args.max_upload_mb * 1024 ** 2, output_dir=args.outdir,
+                            images=args.images, cache=args.cache, path_root=args.path_root)
+    with suppress(KeyboardInterrupt):
+        asyncio.run(serve(svc, args.host, args.port))
@@ -0,0 +1,226 @@
+# Columnar span storage for the layout pipeline
+# - SpanTable:    one NumPy structured array row per span + interned font/text pools
+# - LineTable:    lines as index ranges over a span permutation (no per-line span lists)
+# - SegmentTable: gap-separated line segments as index ranges, used by table detection
+#
+# Dicts are only built at the JSON boundary (`to_dicts`), so a page under analysis
+# costs ~70 bytes per span instead of a 12-key dict plus a bbox list.
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+SPAN_DTYPE = np.dtype([
+    ("x0", "f8"), ("y0", "f8"), ("x1", "f8"), ("y1", "f8"), ("cx", "f8"), ("cy", "f8"),
+    ("size", "f8"), ("flags", "i8"), ("font", "i4"), ("text", "i4"), ("col", "i2"),
+])
+
+class _Pool:
+    """Interns strings into a list, returning stable indices."""
+    def __init__(self):
+        self.items: List[Any] = []
+        self._index: Dict[Any, int] = {}
+
+    def add(self, item: Any) -> int:
+        idx = self._index.get(item)
+        if idx is None:
+            idx = self._index[item] = len(self.items)
+            self.items.append(item)
+        return idx
+
+class SpanTable:
+    """
+    All text spans of a page. `data` holds geometry, font size, flags, pool indices and the
+    column label (-1 until assigned); `fonts` and `texts` are the interned string pools.
+    """
+    __slots__ = ("data", "fonts", "texts")
+
+    def __init__(self, data: np.ndarray, fonts: List[Any], texts: List[str]):
+        self.data, self.fonts, self.texts = data, fonts, texts
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple]) -> "SpanTable":
+        """Rows are (text, rounded_bbox, font, size, flags) tuples, in reading order."""
+        fonts, texts = _Pool(), _Pool()
+        data = np.empty(len(rows), dtype=SPAN_DTYPE)
+        if rows:
+            data["x0"], data["y0"], data["x1"], data["y1"] = np.array([r[1] for r in rows], dtype=float).T
+            data["cx"] = (data["x0"] + data["x1"]) / 2.0
+            data["cy"] = (data["y0"] + data["y1"]) / 2.0
+            data["size"] = [r[3] for r in rows]
+            data["flags"] = [r[4] for r in rows]
+            data["font"] = [fonts.add(r[2]) for r in rows]
+            data["text"] = [texts.add(r[0]) for r in rows]
+            data["col"] = -1
+        return cls(data, fonts.items, texts.items)
+
+    @classmethod
+    def from_text_dict(cls, tdict: Dict[str, Any]) -> "SpanTable":
+        """Builds the table straight from `page.get_text("dict")`, skipping whitespace-only spans."""
+        rows = []
+        for block in tdict.get("blocks", []):
+            if block.get("type") != 0: continue  # text only
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    txt = span.get("text", "")
+                    if not txt.strip(): continue
+                    bbox = [round(v, 2) for v in span.get("bbox", [])]
+                    rows.append((txt, bbox, span.get("font"), span.get("size"), span.get("flags")))
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_dicts(cls, spans: Sequence[Dict[str, Any]]) -> "SpanTable":
+        """Inverse of `to_dicts`, for callers of the dict-based API."""
+        table = cls.from_rows([(s["text"], [s["x0"], s["y0"], s["x1"], s["y1"]], s.get("font"), s.get("size"), s.get("flags"))
+                               for s in spans])
+        if spans:
+            # keep the caller's own centers, they may not be derived from the bbox
+            table.data["cx"] = [s["cx"] for s in spans]
+            table.data["cy"] = [s["cy"] for s in spans]
+            table.data["col"] = [s.get("col", -1) for s in spans]
+        return table
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        d = self.data
+        cols = d["col"].tolist()
+        out = []
+        for i, (x0, y0, x1, y1, cx, cy, size, flags, font, text) in enumerate(zip(
+                d["x0"].tolist(), d["y0"].tolist(), d["x1"].tolist(), d["y1"].tolist(), d["cx"].tolist(), d["cy"].tolist(),
+                d["size"].tolist(), d["flags"].tolist(), d["font"].tolist(), d["text"].tolist())):
+            span = {
+                "text": self.texts[text], "bbox": [x0, y0, x1, y1], "font": self.fonts[font],
+                "size": size, "flags": flags,
+                "x0": x0, "y0": y0, "x1": x1, "y1": y1, "cx": cx, "cy": cy,
+            }
+            if cols[i] >= 0: span["col"] = cols[i]
+            out.append(span)
+        return out
+
+def _segment_means(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Mean of values[starts[i]:starts[i+1]], bit-identical to np.mean on each slice.
+    Short slices (< 8 values, where np.mean sums sequentially) are summed column-wise in one
+    padded matrix; np.add.reduceat would round differently. Longer slices fall back to np.mean.
+    """
+    counts = np.diff(starts)
+    out = np.empty(counts.size)
+    if not counts.size: return out
+    short = counts < 8
+    width = int(counts[short].max()) if short.any() else 0
+    if width:
+        seg_id = np.repeat(np.arange(counts.size), counts)
+        pos = np.arange(values.size) - np.repeat(starts[:-1], counts)
+        keep = short[seg_id]
+        padded = np.zeros((width, counts.size))
+        padded[pos[keep], seg_id[keep]] = values[keep]
+        out[short] = padded.sum(axis=0)[short] / counts[short]
+    for i in np.nonzero(~short)[0]:
+        out[i] = np.mean(values[starts[i]:starts[i + 1]])
+    return out
+
+# -------------------------
+# Lines
+# -------------------------
+
+class LineTable:
+    """
+    Lines over a SpanTable. Line i owns spans `order[starts[i]:starts[i+1]]` in (y0, x0) order and
+    `xorder[starts[i]:starts[i+1]]` in left-to-right order.
+    """
+    __slots__ = ("order", "xorder", "starts", "x0", "y0", "x1", "y1", "cx", "cy", "text", "col")
+
+    def __init__(self, order, xorder, starts, x0, y0, x1, y1, text):
+        self.order, self.xorder, self.starts = order, xorder, starts
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.cx, self.cy = (x0 + x1) / 2, (y0 + y1) / 2
+        self.text = text
+        self.col = np.zeros(len(text), dtype=int)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def to_dicts(self, span_dicts: Sequence[Dict[str, Any]], with_col: bool = True) -> List[Dict[str, Any]]:
+        out = []
+        order, starts = self.order.tolist(), self.starts.tolist()
+        for i, (x0, y0, x1, y1, cx, cy) in enumerate(zip(self.x0.tolist(), self.y0.tolist(), self.x1.tolist(),
+                                                        self.y1.tolist(), self.cx.tolist(), self.cy.tolist())):
+            line = {
+                "spans": [span_dicts[j] for j in order[starts[i]:starts[i + 1]]],
+                "text": self.text[i],
+                "bbox": [x0, y0, x1, y1], "x0": x0, "y0": y0, "x1": x1, "y1": y1, "cx": cx, "cy": cy,
+            }
+            if with_col: line["col"] = int(self.col[i])
+            out.append(line)
+        return out
+
+def _join_texts(spans: SpanTable, idx: np.ndarray, starts: np.ndarray) -> List[str]:
+    texts, pool, bounds = spans.data["text"][idx].tolist(), spans.texts, starts.tolist()
+    return [" ".join([pool[t] for t in texts[a:b]]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+def group_lines(spans: SpanTable) -> LineTable:
+    """Vectorized group_spans_to_lines: sort by (y0, x0), break wherever consecutive centers drift apart."""
+    d, n = spans.data, len(spans)
+    if not n:
+        empty_i, empty_f = np.zeros(0, dtype=int), np.zeros(0)
+        return LineTable(empty_i, empty_i, np.zeros(1, dtype=int), empty_f, empty_f, empty_f, empty_f, [])
+    order = np.lexsort((d["x0"], d["y0"]))
+    heights = d["y1"] - d["y0"]
+    heights = heights[heights > 0]
+    median_height = float(np.median(heights)) if heights.size else 10.0
+    line_threshold = max(2.0, median_height * 0.4)
+    cy = d["cy"][order]
+    breaks = np.nonzero(np.abs(np.diff(cy)) > line_threshold)[0] + 1
+    starts = np.concatenate(([0], breaks, [n]))
+    heads = starts[:-1]
+    x0 = np.minimum.reduceat(d["x0"][order], heads)
+    y0 = np.minimum.reduceat(d["y0"][order], heads)
+    x1 = np.maximum.reduceat(d["x1"][order], heads)
+    y1 = np.maximum.reduceat(d["y1"][order], heads)
+    line_id = np.repeat(np.arange(heads.size), np.diff(starts))
+    xorder = order[np.lexsort((d["x0"][order], line_id))]  # stable: ties keep (y0, x0) order
+    return LineTable(order, xorder, starts, x0, y0, x1, y1, _join_texts(spans, xorder, starts))
+
+# -------------------------
+# Segments
+# -------------------------
+
+class SegmentTable:
+    """
+    Horizontal segments of every line. Segment k owns spans `spans_idx[starts[k]:starts[k+1]]`;
+    line i owns segments `line_starts[i]:line_starts[i+1]`.
+    """
+    __slots__ = ("spans_idx", "starts", "line_starts", "x0", "x1", "text")
+
+    def __init__(self, spans_idx, starts, line_starts, x0, x1, text):
+        self.spans_idx, self.starts, self.line_starts = spans_idx, starts, line_starts
+        self.x0, self.x1, self.text = x0, x1, text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+def split_segments(spans: SpanTable, xorder: np.ndarray, starts: np.ndarray, space_scale: float = 2.0) -> SegmentTable:
+    """
+    Vectorized get_line_segments over many lines at once. `xorder`/`starts` describe the lines
+    (spans in left-to-right order); a gap wider than ~space_scale spaces starts a new segment.
+    """
+    d = spans.data
+    n_lines = starts.size - 1
+    if not xorder.size:
+        return SegmentTable(xorder, np.zeros(1, dtype=int), np.zeros(n_lines + 1, dtype=int), np.zeros(0), np.zeros(0), [])
+    counts = np.diff(starts)
+    line_id = np.repeat(np.arange(n_lines), counts)
+    avg_font_size = _segment_means(d["size"][xorder], starts)
+    gap_threshold = avg_font_size * 0.6 * space_scale
+    x0s, x1s = d["x0"][xorder], d["x1"][xorder]
+    gaps = x0s[1:] - x1s[:-1]
+    same_line = line_id[1:] == line_id[:-1]
+    breaks = np.nonzero(same_line & (gaps > gap_threshold[line_id[1:]]))[0] + 1
+    seg_starts = np.union1d(starts, breaks)
+    heads = seg_starts[:-1]
+    seg_x0 = np.minimum.reduceat(x0s, heads)
+    seg_x1 = np.maximum.reduceat(x1s, heads)
+    line_starts = np.searchsorted(seg_starts, starts)
+    return SegmentTable(xorder, seg_starts, line_starts, seg_x0, seg_x1, _join_texts(spans, xorder, seg_starts))
@@ -0,0 +1,125 @@
+# Per-page spatial index over bboxes (uniform grid, built with NumPy)
+# - GridIndex:    boxes bucketed into square cells; a region query only visits the cells it
+#                 overlaps and then checks the candidates exactly
+# - PageIndex:    one lazily built GridIndex per element kind of an analyzed page dict
+# - query_region: "everything inside this box" for downstream code
+#
+# Cell size defaults to about twice the side of an average box's share of the page, so a
+# page of n boxes gets roughly n/4 cells and a query of a few lines visits a few cells.
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# kind -> key of the page dict that holds the elements
+KINDS = {"spans": "text", "lines": "lines", "images": "images", "vectors": "vectors", "tables": "tables"}
+
+class GridIndex:
+    """Uniform grid over boxes given as four coordinate arrays."""
+
+    def __init__(self, x0: Sequence[float], y0: Sequence[float], x1: Sequence[float], y1: Sequence[float],
+                 cell: float | None = None):
+        self.x0, self.y0 = np.asarray(x0, dtype=float), np.asarray(y0, dtype=float)
+        self.x1, self.y1 = np.asarray(x1, dtype=float), np.asarray(y1, dtype=float)
+        n = self.x0.size
+        if not n:
+            self.ox = self.oy = 0.0
+            self.cell, self.nx, self.ny = 1.0, 0, 0
+            self._ids, self._starts = np.zeros(0, dtype=int), np.zeros(1, dtype=int)
+            return
+        self.ox, self.oy = float(self.x0.min()), float(self.y0.min())
+        w, h = float(self.x1.max()) - self.ox, float(self.y1.max()) - self.oy
+        self.cell = cell or max(1.0, 2.0 * np.sqrt(max(w * h, 1.0) / n))
+        self.nx, self.ny = int(w // self.cell) + 1, int(h // self.cell) + 1
+        gx0, gy0 = self._cells(self.x0, self.y0)
+        gx1, gy1 = self._cells(self.x1, self.y1)
+        # Every box is registered in each cell it touches: expand (box, cell) pairs, then sort by cell
+        spanx = gx1 - gx0 + 1
+        k = spanx * (gy1 - gy0 + 1)
+        box_id = np.repeat(np.arange(n), k)
+        local = np.arange(int(k.sum())) - np.repeat(np.cumsum(k) - k, k)
+        gx = np.repeat(gx0, k) + local % np.repeat(spanx, k)
+        gy = np.repeat(gy0, k) + local // np.repeat(spanx, k)
+        cell_id = gy * self.nx + gx
+        order = np.argsort(cell_id, kind="stable")
+        self._ids = box_id[order]
+        self._starts = np.searchsorted(cell_id[order], np.arange(self.nx * self.ny + 1))
+
+    def __len__(self) -> int:
+        return self.x0.size
+
+    def _cells(self, x, y) -> tuple:
+        gx = np.clip(((np.asarray(x) - self.ox) // self.cell).astype(int), 0, self.nx - 1)
+        gy = np.clip(((np.asarray(y) - self.oy) // self.cell).astype(int), 0, self.ny - 1)
+        return gx, gy
+
+    def query(self, x0: float, y0: float, x1: float, y1: float, mode: str = "intersects") -> np.ndarray:
+        """
+        Sorted indices of the boxes that touch (mode="intersects", edges included) or lie
+        completely inside (mode="within") the query box.
+        """
+        if mode not in ("intersects", "within"):
+            raise ValueError(f"unknown query mode '{mode}', expected 'intersects' or 'within'")
+        if not self.nx or x1 < self.ox or y1 < self.oy: return np.zeros(0, dtype=int)
+        (gx0, gx1), (gy0, gy1) = self._cells([x0, x1], [y0, y1])
+        # Cells of one grid row are contiguous in the CSR layout, so each row is a single slice
+        rows = [self._ids[self._starts[gy * self.nx + gx0]:self._starts[gy * self.nx + gx1 + 1]] for gy in range(gy0, gy1 + 1)]
+        cand = np.unique(np.concatenate(rows)) if rows else np.zeros(0, dtype=int)
+        if mode == "within":
+            keep = (self.x0[cand] >= x0) & (self.y0[cand] >= y0) & (self.x1[cand] <= x1) & (self.y1[cand] <= y1)
+        else:
+            keep = (self.x0[cand] <= x1) & (self.x1[cand] >= x0) & (self.y0[cand] <= y1) & (self.y1[cand] >= y0)
+        return cand[keep]
+
+class PageIndex:
+    """Spatial index over the elements of one analyzed page dict, built per kind on first use."""
+
+    def __init__(self, page: Dict[str, Any]):
+        self.page = page
+        self._grids: Dict[str, GridIndex] = {}
+
+    def grid(self, kind: str) -> GridIndex:
+        if kind not in KINDS:
+            raise ValueError(f"unknown element kind '{kind}', expected one of {tuple(KINDS)}")
+        grid = self._grids.get(kind)
+        if grid is None:
+            items = self.page.get(KINDS[kind]) or []
+            boxes = np.array([it["bbox"] for it in items], dtype=float).reshape(-1, 4)
+            grid = self._grids[kind] = GridIndex(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3])
+        return grid
+
+    def query(self, bbox: Sequence[float], kinds: Iterable[str] = tuple(KINDS), mode: str = "intersects") -> Dict[str, List[Any]]:
+        out = {}
+        for kind in kinds:
+            hits = self.grid(kind).query(*bbox, mode=mode).tolist()
+            items = self.page.get(KINDS[kind]) or []
+            out[kind] = [items[i] for i in hits]
+        return out
+
+# Indexes of the most recently queried pages, keyed by page identity. The entry holds a
+# reference to the page so its id cannot be reused while cached.
+_PAGE_INDEXES: "OrderedDict[int, PageIndex]" = OrderedDict()
+_MAX_PAGE_INDEXES = 16
+
+def page_index(page: Dict[str, Any]) -> PageIndex:
+    """Cached PageIndex of `page`. Call `drop_page_index(page)` after mutating the page's elements."""
+    idx = _PAGE_INDEXES.get(id(page))
+    if idx is None or idx.page is not page:
+        idx = _PAGE_INDEXES[id(page)] = PageIndex(page)
+        if len(_PAGE_INDEXES) > _MAX_PAGE_INDEXES: _PAGE_INDEXES.popitem(last=False)
+    else:
+        _PAGE_INDEXES.move_to_end(id(page))
+    return idx
+
+def drop_page_index(page: Dict[str, Any]):
+    _PAGE_INDEXES.pop(id(page), None)
+
+def query_region(page: Dict[str, Any], bbox: Sequence[float], kinds: Iterable[str] = tuple(KINDS),
+                 mode: str = "intersects") -> Dict[str, List[Any]]:
+    """
+    Elements of an analyzed page that intersect (or, with mode="within", lie inside) `bbox`,
+    as {kind: [element, ...]} in page order. Kinds: spans, lines, images, vectors, tables.
+    The index is built on the first query of a page and reused for the following ones.
+    """
+    return page_index(page).query(bbox, kinds=kinds, mode=mode)
@@ -0,0 +1,157 @@
+# Table engine helpers
+# - line_alignment: for every pair of consecutive lines, do any two of their segments overlap
+#                   by more than `tolerance`? One sorted-interval sweep over the whole page
+#                   instead of an all-pairs segment comparison per line
+# - nearest_center: segment -> column by binary search over sorted column centers
+# - ruled_tables:   grid tables found from ruling lines (thin rects, stroked cell borders, see
+#                   pdf_vectors.VectorTable.ruling_lines); rows/columns are the ruling positions,
+#                   cells are filled by binary search. A grid needs 2 x 2 cells closed on all four
+#                   sides by rulings (two overlapping frames only close the cell they share) and
+#                   some text in its cells
+#
+# All comparisons are evaluated on the same float expressions as the pairwise versions, so
+# the sweep finds exactly the alignments the old segment-by-segment loop found.
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+RULING_MAX_THICKNESS = 2.0  # a rect this thin (pt) is a line, not a box
+RULING_MIN_LENGTH = 8.0     # shorter strokes are decoration (bullets, underlines of single glyphs)
+RULING_SNAP = 2.0           # rulings closer than this are the same grid line
+
+def line_alignment(line_starts: np.ndarray, x0: np.ndarray, x1: np.ndarray, tolerance: float = 5.0) -> np.ndarray:
+    """
+    aligned[i] is True if some segment of line i and some segment of line i+1 overlap by more
+    than `tolerance`, i.e. min(a1, b1) - max(a0, b0) > tolerance. Segments of line i own
+    x0/x1[line_starts[i]:line_starts[i+1]].
+    """
+    n_lines = line_starts.size - 1
+    aligned = np.zeros(max(n_lines - 1, 0), dtype=bool)
+    if n_lines < 2 or not x0.size: return aligned
+    line_id = np.repeat(np.arange(n_lines), np.diff(line_starts))
+    # The overlap exceeds tolerance iff all four of a1-a0, b1-b0, a1-b0, b1-a0 do (each is one
+    # of the float differences the overlap formula can pick), so narrow segments drop out first
+    wide = x1 - x0 > tolerance
+
+    # b side: wide segments sorted by (line, x0), with a running max of x1 inside each line
+    b = np.flatnonzero(wide)
+    b = b[np.lexsort((x0[b], line_id[b]))]
+    if not b.size: return aligned
+    b_line, b0, b1 = line_id[b], x0[b], x1[b]
+    b_start = np.searchsorted(b_line, np.arange(n_lines + 1))
+    # integer keys keep the sweep exact: rank of x0 among all b0, rank of x1 among all b1
+    big = b.size + 1
+    sorted_b0 = np.sort(b0)
+    b0_key = b_line * big + np.searchsorted(sorted_b0, b0, side="left")
+    x1_order = np.argsort(b1, kind="stable")
+    x1_rank = np.empty(b.size, dtype=int)
+    x1_rank[x1_order] = np.arange(b.size)
+    run_max = np.maximum.accumulate(b_line * big + x1_rank)  # earlier lines always have smaller keys
+    prefix_max_b1 = b1[x1_order[run_max - b_line * big]]
+
+    # a side: wide segments of lines 0..n-2 look into the next line. The b's with a1 - b0 > tol
+    # are a prefix of that line (b0 ascending); its largest x1 decides b1 - a0 > tol.
+    a = np.flatnonzero(wide & (line_id < n_lines - 1))
+    if not a.size: return aligned
+    a0, a1, nxt = x0[a], x1[a], line_id[a] + 1
+    lo, hi = b_start[nxt], b_start[nxt + 1]
+    p = np.searchsorted(b0_key, nxt * big + np.searchsorted(sorted_b0, a1 - tolerance, side="left"), side="left")
+    # a1 - tol and a1 - b0 round independently: settle the boundary on the exact predicate
+    at = np.minimum(p, b.size - 1)
+    p = np.where((p < hi) & (a1 - b0[at] > tolerance), p + 1, p)
+    before = np.maximum(p - 1, 0)
+    p = np.where((p > lo) & ~(a1 - b0[before] > tolerance), p - 1, p)
+    hit = (p > lo) & (prefix_max_b1[np.maximum(p - 1, 0)] - a0 > tolerance)
+    aligned[line_id[a[hit]]] = True
+    return aligned
+
+def nearest_center(xs: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Index of the closest center (lowest index on ties) for each x; `centers` must be ascending."""
+    if not centers.size: return np.zeros(xs.size, dtype=int)
+    hi = np.clip(np.searchsorted(centers, xs, side="left"), 0, centers.size - 1)
+    lo = np.maximum(hi - 1, 0)
+    return np.where(np.abs(xs - centers[lo]) <= np.abs(xs - centers[hi]), lo, hi)
+
+# -------------------------
+# Ruled (grid) tables
+# -------------------------
+
+def _snap(values: np.ndarray, tol: float = RULING_SNAP) -> np.ndarray:
+    """Sorted positions with near-duplicates (closer than `tol`) merged into their mean."""
+    if not values.size: return values
+    v = np.sort(values)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(v) > tol) + 1))
+    return np.add.reduceat(v, starts) / np.diff(np.append(starts, v.size))
+
+def _components(n: int, pairs_a: np.ndarray, pairs_b: np.ndarray) -> np.ndarray:
+    """Connected component id per node of an undirected graph given as edge endpoint arrays."""
+    parent = list(range(n))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for a, b in zip(pairs_a.tolist(), pairs_b.tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb: parent[max(ra, rb)] = min(ra, rb)
+    return np.array([find(i) for i in range(n)], dtype=int)
+
+def _covered(rulings: np.ndarray, edges: np.ndarray, spans: np.ndarray, snap: float = RULING_SNAP) -> np.ndarray:
+    """
+    covered[i, j]: a ruling (pos, lo, hi) lies on grid line edges[i] and runs from spans[j] to
+    spans[j + 1]. One difference array per grid line instead of a cells x rulings comparison.
+    """
+    diff = np.zeros((len(edges), len(spans)), dtype=int)
+    i = nearest_center(rulings[:, 0], edges)
+    a = np.searchsorted(spans, rulings[:, 1] - snap, side="left")
+    b = np.searchsorted(spans, rulings[:, 2] + snap, side="right") - 1
+    ok = (np.abs(rulings[:, 0] - edges[i]) <= snap) & (b > a)
+    np.add.at(diff, (i[ok], a[ok]), 1)
+    np.add.at(diff, (i[ok], b[ok]), -1)
+    return np.cumsum(diff, axis=1)[:, :-1] > 0
+
+def grid_regions(hor: np.ndarray, ver: np.ndarray, snap: float = RULING_SNAP) -> List[tuple]:
+    """
+    Groups crossing rulings into grids. Returns (row_edges, col_edges) per grid of at least 2 x 2
+    closed cells (a framed page with one separator is not a table), trimmed to the closed cells;
+    edges are ascending y and x positions.
+    """
+    if len(hor) < 2 or len(ver) < 2: return []
+    # h crosses v when each one's position falls within the other's extent (plus snap)
+    cross = ((ver[None, :, 0] >= hor[:, None, 1] - snap) & (ver[None, :, 0] <= hor[:, None, 2] + snap) &
+             (hor[:, None, 0] >= ver[None, :, 1] - snap) & (hor[:, None, 0] <= ver[None, :, 2] + snap))
+    hi, vi = np.nonzero(cross)
+    comp = _components(len(hor) + len(ver), hi, vi + len(hor))
+    grids = []
+    for c in np.unique(comp[np.concatenate((hi, vi + len(hor)))]).tolist() if hi.size else []:
+        h, v = hor[comp[:len(hor)] == c], ver[comp[len(hor):] == c]
+        rows, cols = _snap(h[:, 0], snap), _snap(v[:, 0], snap)
+        if len(rows) < 3 or len(cols) < 3: continue
+        # A cell is closed when rulings run along all four of its sides
+        top, side = _covered(h, rows, cols, snap), _covered(v, cols, rows, snap)
+        closed = top[:-1] & top[1:] & side[:-1].T & side[1:].T
+        r, k = np.flatnonzero(closed.any(axis=1)), np.flatnonzero(closed.any(axis=0))
+        if closed.sum() < 4 or r.size < 2 or k.size < 2: continue
+        grids.append((rows[r[0]:r[-1] + 2], cols[k[0]:k[-1] + 2]))
+    grids.sort(key=lambda g: (g[0][0], g[1][0]))
+    return grids
+
+def ruled_tables(hor: np.ndarray, ver: np.ndarray, cx: np.ndarray, cy: np.ndarray, text: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Grid tables from horizontal (y, x0, x1) and vertical (x, y0, y1) ruling lines. Text pieces
+    (centers cx/cy, in reading order) inside a grid are placed into their cell by binary search
+    over the grid lines. Rows keep empty cells as ""; grids without any text are not tables.
+    """
+    tables = []
+    for rows, cols in grid_regions(hor, ver):
+        inside = np.flatnonzero((cx >= cols[0]) & (cx <= cols[-1]) & (cy >= rows[0]) & (cy <= rows[-1]))
+        r = np.clip(np.searchsorted(rows, cy[inside], side="right") - 1, 0, len(rows) - 2).tolist()
+        c = np.clip(np.searchsorted(cols, cx[inside], side="right") - 1, 0, len(cols) - 2).tolist()
+        cells = [[""] * (len(cols) - 1) for _ in range(len(rows) - 1)]
+        for k, i, j in zip(inside.tolist(), r, c):
+            cells[i][j] = (cells[i][j] + " " + text[k]).strip()
+        if not any(cell for row in cells for cell in row): continue
+        bbox = [cols[0], rows[0], cols[-1], rows[-1]]
+        tables.append({"rows": cells, "bbox": [round(float(v), 2) for v in bbox], "ruled": True})
+    return tables
@@ -0,0 +1,277 @@
+# Vector drawings as NumPy arrays (one row per merged element)
+# - parse:    page.get_cdrawings() (plain tuples, about half the cost of get_drawings) -> items
+# - classify: ruling (thin axis-aligned line or rect), box (stroked rect), fill (filled rect or
+#             axis-aligned polygon) or decoration (curves, diagonals, curved fills, short strokes;
+#             one row per drawing path)
+# - merge:    collinear ruling pieces that touch (dashes, per-cell borders) become one ruling,
+#             boxes sharing a full edge with a neighbour (cell-by-cell tables) or met by a ruling
+#             inside them (a table frame) are split into their edges and merged as ruling pieces; a
+#             box on its own stays a box and is no table evidence. Fills sharing a row or column band that touch become
+#             one fill, duplicate boxes collapse
+# - caps:     at the JSON boundary (to_dicts) a page keeps at most `max_vectors` elements, rulings
+#             first, then boxes, fills and decoration by decreasing area; beyond `max_decoration`
+#             decoration rows are aggregated into grid cells first
+#
+# Table detection reads the rulings straight off the arrays (ruling_lines), before any cap.
+
+from typing import Any, Dict, Iterable, Sequence
+
+import numpy as np
+
+from pdf_tables import RULING_MAX_THICKNESS, RULING_MIN_LENGTH, RULING_SNAP
+
+VECTOR_KINDS = ("ruling", "box", "fill", "decoration")
+RULING, BOX, FILL, DECORATION = range(len(VECTOR_KINDS))
+VECTOR_DTYPE = np.dtype([("x0", "f8"), ("y0", "f8"), ("x1", "f8"), ("y1", "f8"),
+                         ("width", "f8"), ("kind", "i1"), ("count", "i4")])  # width NaN: not stroked
+
+COLLINEAR_TOLERANCE = 0.5  # ruling pieces whose centerlines are this close lie on one line
+FILL_GAP = 0.5             # fills closer than this touch
+
+def _item_box(item: Sequence[Any]) -> tuple:
+    """(x0, y0, x1, y1, axis_aligned) of one path item; works for get_drawings and get_cdrawings items."""
+    op = item[0]
+    if op == "re":
+        r = item[1]
+        return min(r[0], r[2]), min(r[1], r[3]), max(r[0], r[2]), max(r[1], r[3]), True
+    if op == "qu":
+        ul, ur, ll, lr = item[1]
+        xs, ys = (ul[0], ur[0], ll[0], lr[0]), (ul[1], ur[1], ll[1], lr[1])
+        return min(xs), min(ys), max(xs), max(ys), abs(ul[1] - ur[1]) < 0.5 and abs(ul[0] - ll[0]) < 0.5
+    pts = item[1:]
+    xs, ys = [p[0] for p in pts], [p[1] for p in pts]
+    straight = op == "l" and (abs(xs[0] - xs[1]) <= 0.5 or abs(ys[0] - ys[1]) <= 0.5)
+    return min(xs), min(ys), max(xs), max(ys), straight
+
+class VectorTable:
+    """All vector elements of a page; `data` rows follow VECTOR_DTYPE, `kind` indexes VECTOR_KINDS."""
+    __slots__ = ("data",)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @classmethod
+    def from_drawings(cls, drawings: Iterable[Dict[str, Any]]) -> "VectorTable":
+        pieces, boxes, fills, decoration = [], [], [], []
+        for d in drawings:
+            kind = d.get("type") or ""
+            stroked, filled = "s" in kind, "f" in kind
+            width = d.get("width") if stroked else None
+            w = np.nan if width is None else width
+            outline, deco = [], []
+            for item in d.get("items", ()):
+                x0, y0, x1, y1, straight = _item_box(item)
+                thin = min(x1 - x0, y1 - y0) <= RULING_MAX_THICKNESS
+                if item[0] in ("re", "qu") and straight:
+                    if thin: pieces.append((x0, y0, x1, y1, w))
+                    elif stroked: boxes.append((x0, y0, x1, y1, w))
+                    elif filled: fills.append((x0, y0, x1, y1, w))
+                elif not stroked:
+                    outline.append((x0, y0, x1, y1, straight))  # edge of a filled area, not drawn by itself
+                elif item[0] == "l" and straight:
+                    pieces.append((x0, y0, x1, y1, w))
+                else:
+                    deco.append((x0, y0, x1, y1))
+            if outline and filled:
+                b = np.array(outline, dtype=float)
+                x0, y0, x1, y1 = b[:, 0].min(), b[:, 1].min(), b[:, 2].max(), b[:, 3].max()
+                if not b[:, 4].all(): deco.extend(b[:, :4].tolist())  # curved or slanted shape: markers, glyph-like art
+                elif min(x1 - x0, y1 - y0) <= RULING_MAX_THICKNESS: pieces.append((x0, y0, x1, y1, w))
+                else: fills.append((x0, y0, x1, y1, w))
+            if deco:
+                b = np.array(deco, dtype=float)
+                decoration.append((b[:, 0].min(), b[:, 1].min(), b[:, 2].max(), b[:, 3].max(), w, len(deco)))
+        return cls._build(pieces, boxes, fills, decoration)
+
+    @classmethod
+    def from_dicts(cls, vectors: Sequence[Dict[str, Any]]) -> "VectorTable":
+        """Inverse of to_dicts; one-rect-per-path dicts of older outputs ({"type": "rect"}) are classified again."""
+        pieces, boxes, fills, rows = [], [], [], []
+        for v in vectors:
+            x0, y0, x1, y1 = v["bbox"]
+            w = np.nan if v.get("width") is None else v["width"]
+            if v.get("type") in VECTOR_KINDS:
+                rows.append((x0, y0, x1, y1, w, VECTOR_KINDS.index(v["type"]), v.get("count", 1)))
+            elif min(x1 - x0, y1 - y0) <= RULING_MAX_THICKNESS: pieces.append((x0, y0, x1, y1, w))
+            elif v.get("width") is not None: boxes.append((x0, y0, x1, y1, w))
+            else: fills.append((x0, y0, x1, y1, w))
+        table = cls._build(pieces, boxes, fills, [])
+        if rows: table.data = np.concatenate((np.array(rows, dtype=VECTOR_DTYPE), table.data))
+        return table
+
+    @classmethod
+    def _build(cls, pieces: list, boxes: list, fills: list, decoration: list) -> "VectorTable":
+        pieces = _rows(pieces, RULING)
+        boxes, edges = _split_grid_boxes(_unique_boxes(_rows(boxes, BOX)), pieces)
+        rulings, short = _merge_rulings(np.concatenate((pieces, edges)))
+        parts = [rulings, short, boxes, _merge_fills(_rows(fills, FILL))]
+        deco = np.zeros(len(decoration), dtype=VECTOR_DTYPE)
+        if decoration:
+            b = np.array(decoration, dtype=float)
+            for i, k in enumerate(("x0", "y0", "x1", "y1", "width", "count")): deco[k] = b[:, i]
+            deco["kind"] = DECORATION
+        parts.append(deco)
+        data = np.concatenate(parts)
+        for k in ("x0", "y0", "x1", "y1"): data[k] = np.round(data[k], 2)
+        return cls(data[np.lexsort((data["x0"], data["y0"], data["kind"]))])
+
+    def counts(self) -> Dict[str, int]:
+        n = np.bincount(self.data["kind"], minlength=len(VECTOR_KINDS))
+        return {k: int(c) for k, c in zip(VECTOR_KINDS, n)}
+
+    def ruling_lines(self) -> tuple:
+        """
+        Horizontal and vertical rulings as (N, 3) arrays (y, x0, x1) and (x, y0, y1), along their
+        long side. Box outlines are not rulings; the edges of grid cells and table frames already
+        are (_split_grid_boxes).
+        """
+        r = self.data[self.data["kind"] == RULING]
+        hor = (r["x1"] - r["x0"]) >= (r["y1"] - r["y0"])
+        h, v = r[hor], r[~hor]
+        return (np.column_stack(((h["y0"] + h["y1"]) / 2, h["x0"], h["x1"])),
+                np.column_stack(((v["x0"] + v["x1"]) / 2, v["y0"], v["y1"])))
+
+    def capped(self, max_vectors: int | None = None, max_decoration: int | None = None) -> tuple:
+        """(rows, dropped): decoration aggregated beyond `max_decoration`, then at most `max_vectors` rows."""
+        d = self.data
+        deco = d["kind"] == DECORATION
+        if max_decoration is not None and deco.sum() > max_decoration:
+            d = np.concatenate((d[~deco], _grid_aggregate(d[deco], max_decoration)))
+        dropped = 0
+        if max_vectors is not None and len(d) > max_vectors:
+            area = (d["x1"] - d["x0"]) * (d["y1"] - d["y0"])
+            keep = np.sort(np.lexsort((-area, d["kind"]))[:max_vectors])
+            dropped = len(d) - keep.size
+            d = d[keep]
+        return d, dropped
+
+    def to_dicts(self, max_vectors: int | None = None, max_decoration: int | None = None) -> tuple:
+        """([{"type", "bbox", "width", "count"}, ...], number of elements dropped by the caps)."""
+        d, dropped = self.capped(max_vectors, max_decoration)
+        out = []
+        for x0, y0, x1, y1, w, kind, count in zip(d["x0"].tolist(), d["y0"].tolist(), d["x1"].tolist(), d["y1"].tolist(),
+                                                  d["width"].tolist(), d["kind"].tolist(), d["count"].tolist()):
+            out.append({"type": VECTOR_KINDS[kind], "bbox": [x0, y0, x1, y1], "width": None if w != w else w, "count": count})
+        return out, dropped
+
+def _rows(items: list, kind: int) -> np.ndarray:
+    rows = np.zeros(len(items), dtype=VECTOR_DTYPE)
+    if items:
+        b = np.array(items, dtype=float)
+        for i, k in enumerate(("x0", "y0", "x1", "y1", "width")): rows[k] = b[:, i]
+        rows["kind"], rows["count"] = kind, 1
+    return rows
+
+def _runs(group: np.ndarray, lo: np.ndarray, hi: np.ndarray, gap: float) -> np.ndarray:
+    """
+    Run id per element, for elements sorted by (group, lo): a run continues while an element
+    starts within `gap` of the furthest end seen so far in its group.
+    """
+    if not group.size: return np.zeros(0, dtype=int)
+    base = float(lo.min())
+    stride = float(hi.max()) - base + gap + 1.0  # offsets keep the running max from leaking across groups
+    reach = np.maximum.accumulate(hi - base + group * stride) - group * stride
+    new = (group[1:] != group[:-1]) | (lo[1:] - base > reach[:-1] + gap)
+    return np.concatenate(([0], np.cumsum(new)))
+
+def _reduce(rows: np.ndarray, run: np.ndarray, kind: int | None = None) -> np.ndarray:
+    """One row per run: union bbox, widest stroke, summed counts. `rows` are in run order."""
+    if not rows.size: return rows
+    heads = np.flatnonzero(np.concatenate(([True], run[1:] != run[:-1])))
+    out = np.zeros(heads.size, dtype=VECTOR_DTYPE)
+    out["x0"], out["y0"] = np.minimum.reduceat(rows["x0"], heads), np.minimum.reduceat(rows["y0"], heads)
+    out["x1"], out["y1"] = np.maximum.reduceat(rows["x1"], heads), np.maximum.reduceat(rows["y1"], heads)
+    out["width"] = np.fmax.reduceat(rows["width"], heads)
+    out["count"] = np.add.reduceat(rows["count"], heads)
+    out["kind"] = rows["kind"][heads] if kind is None else kind
+    return out
+
+def _merge_rulings(pieces: np.ndarray) -> tuple:
+    """(rulings, short): collinear touching pieces merged; merged pieces shorter than RULING_MIN_LENGTH are decoration."""
+    merged = []
+    hor = (pieces["x1"] - pieces["x0"]) >= (pieces["y1"] - pieces["y0"])
+    for mask, pos_keys, lo_key, hi_key in ((hor, ("y0", "y1"), "x0", "x1"), (~hor, ("x0", "x1"), "y0", "y1")):
+        p = pieces[mask]
+        if not p.size: continue
+        pos = (p[pos_keys[0]] + p[pos_keys[1]]) / 2
+        by_pos = np.argsort(pos, kind="stable")
+        line = np.empty(p.size, dtype=int)
+        line[by_pos] = np.concatenate(([0], np.cumsum(np.diff(pos[by_pos]) > COLLINEAR_TOLERANCE)))
+        order = np.lexsort((p[lo_key], line))
+        p = p[order]
+        merged.append(_reduce(p, _runs(line[order], p[lo_key], p[hi_key], RULING_SNAP)))
+    if not merged: return pieces, pieces
+    m = np.concatenate(merged)
+    long_enough = np.maximum(m["x1"] - m["x0"], m["y1"] - m["y0"]) >= RULING_MIN_LENGTH
+    short = m[~long_enough]
+    short["kind"] = DECORATION
+    return m[long_enough], short
+
+def _merge_fills(fills: np.ndarray) -> np.ndarray:
+    """Fills with the same top/bottom that touch left-right are merged, then the same for left/right edges top-down."""
+    for band, lo_key, hi_key in ((("y0", "y1"), "x0", "x1"), (("x0", "x1"), "y0", "y1")):
+        if not fills.size: return fills
+        order = np.lexsort((fills[lo_key], fills[band[1]], fills[band[0]]))
+        f = fills[order]
+        key = np.column_stack((f[band[0]], f[band[1]]))
+        group = np.concatenate(([0], np.cumsum(np.any(key[1:] != key[:-1], axis=1))))
+        fills = _reduce(f, _runs(group, f[lo_key], f[hi_key], FILL_GAP))
+    return fills
+
+def _unique_boxes(boxes: np.ndarray) -> np.ndarray:
+    if not boxes.size: return boxes
+    key = np.column_stack((boxes["x0"], boxes["y0"], boxes["x1"], boxes["y1"]))
+    _, inverse = np.unique(key, axis=0, return_inverse=True)
+    order = np.argsort(inverse.ravel(), kind="stable")
+    return _reduce(boxes[order], inverse.ravel()[order])
+
+def _edge_key(pos: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """One int64 per edge (position, extent) at 0.1pt; coordinates up to ~100000pt."""
+    q = [np.round(np.asarray(a) * 10).astype(np.int64) + (1 << 20) for a in (pos, lo, hi)]
+    return (q[0] << 42) | (q[1] << 21) | q[2]
+
+def _frames(boxes: np.ndarray, pieces: np.ndarray) -> np.ndarray:
+    """Boxes met from inside by a ruling piece: it lies across the box and touches one of its sides."""
+    frame = np.zeros(boxes.size, dtype=bool)
+    hor = (pieces["x1"] - pieces["x0"]) >= (pieces["y1"] - pieces["y0"])
+    for mask, (lo, hi), (pos0, pos1) in ((hor, ("x0", "x1"), ("y0", "y1")), (~hor, ("y0", "y1"), ("x0", "x1"))):
+        p = pieces[mask]
+        if not p.size: continue
+        b = boxes[:, None]
+        pos = (p[pos0] + p[pos1]) / 2
+        within = ((pos > b[pos0] + RULING_SNAP) & (pos < b[pos1] - RULING_SNAP) &
+                  (p[lo] >= b[lo] - RULING_SNAP) & (p[hi] <= b[hi] + RULING_SNAP))
+        touches = (np.abs(p[lo] - b[lo]) <= RULING_SNAP) | (np.abs(p[hi] - b[hi]) <= RULING_SNAP)
+        frame |= (within & touches).any(axis=1)
+    return frame
+
+def _split_grid_boxes(boxes: np.ndarray, pieces: np.ndarray) -> tuple:
+    """
+    (boxes, edges): boxes with a neighbour on the other side of one of their edges, or framing a
+    ruling piece, become four ruling pieces.
+    """
+    if not boxes.size: return boxes, boxes
+    x0, y0, x1, y1 = boxes["x0"], boxes["y0"], boxes["x1"], boxes["y1"]
+    grid = (np.isin(_edge_key(x1, y0, y1), _edge_key(x0, y0, y1)) | np.isin(_edge_key(x0, y0, y1), _edge_key(x1, y0, y1))
+            | np.isin(_edge_key(y1, x0, x1), _edge_key(y0, x0, x1)) | np.isin(_edge_key(y0, x0, x1), _edge_key(y1, x0, x1))
+            | _frames(boxes, pieces))
+    g = boxes[grid]
+    edges = np.concatenate([g.copy() for _ in range(4)])
+    n = g.size
+    edges["y1"][:n], edges["y0"][n:2 * n] = g["y0"], g["y1"]           # top, bottom
+    edges["x1"][2 * n:3 * n], edges["x0"][3 * n:] = g["x0"], g["x1"]   # left, right
+    edges["kind"] = RULING
+    return boxes[~grid], edges
+
+def _grid_aggregate(rows: np.ndarray, max_cells: int) -> np.ndarray:
+    """Rows bucketed by center into a k x k grid (k*k <= max_cells) over their extent; one row per occupied cell."""
+    k = max(1, int(np.sqrt(max_cells)))
+    cx, cy = (rows["x0"] + rows["x1"]) / 2, (rows["y0"] + rows["y1"]) / 2
+    gx = np.clip(((cx - cx.min()) / max(float(np.ptp(cx)), 1e-9) * k).astype(int), 0, k - 1)
+    gy = np.clip(((cy - cy.min()) / max(float(np.ptp(cy)), 1e-9) * k).astype(int), 0, k - 1)
+    cell = gy * k + gx
+    order = np.argsort(cell, kind="stable")
+    return _reduce(rows[order], cell[order])
@@ -0,0 +1,62 @@
+# Page layout visualization (matplotlib)
+# Kept out of pdf_parser.py so that extraction, workers and the CLI without --visualize
+# never import matplotlib; pdf_parser.visualize_page loads this module on first use.
+# The CLI uses pdf_render.py (batched PNG/SVG overlays) unless --vis-format matplotlib is given.
+
+from typing import Any, Dict
+
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+
+def visualize_page(struct: Dict[str, Any], page_number: int = 1, save_path: str | None = None, show: bool = False):
+    pages = struct.get("pages", [])
+    if not (1 <= page_number <= len(pages)): raise ValueError("page_number out of range")
+    page = pages[page_number - 1]
+    w, h = page["width"], page["height"]
+    fig, ax = plt.subplots(figsize=(w/72, h/72), dpi=150)
+    margin = max(20, min(w, h) * 0.03)
+    ax.set_xlim(-margin, w + margin); ax.set_ylim(-margin, h + margin)
+    
+    # Draw Images
+    for img in page.get("images", []):
+        x0, y0, x1, y1 = img.get("bbox", [0,0,0,0])
+        ax.add_patch(Rectangle((x0, y0), x1 - x0, y1 - y0, fill=True, alpha=0.18, color='gray'))
+        ax.text((x0 + x1) / 2, (y0 + y1) / 2, "[IMG]", ha='center', va='center', fontsize=6)
+
+    # Draw Text Spans (Cyan)
+    for t in page.get("text", []):
+        x0, y0, x1, y1 = t["bbox"]
+        ax.add_patch(Rectangle((x0, y0), x1 - x0, y1 - y0, fill=False, linewidth=0.25, edgecolor='cyan', alpha=0.5))
+
+    # Draw Paragraphs (Green)
+    for col, paras in page.get("paragraphs_by_col", {}).items():
+        for para in paras:
+            if not para: continue
+            
+            # Calculate paragraph bounding box
+            all_x0 = [ln['x0'] for ln in para]; all_y0 = [ln['y0'] for ln in para]
+            all_x1 = [ln['x1'] for ln in para]; all_y1 = [ln['y1'] for ln in para]
+            if not all_x0: continue
+            px0, py0, px1, py1 = min(all_x0), min(all_y0), max(all_x1), max(all_y1)
+            
+            # Draw the Paragraph Box
+            ax.add_patch(Rectangle((px0, py0), px1 - px0, py1 - py0, fill=False, edgecolor='green', linewidth=0.8, alpha=0.7))
+            
+            # Draw the Text
+            for ln in para:
+                # FIX: removed stale 'x0' variable and corrected alignment
+                l_x0, l_y0, _, _ = ln['bbox']
+                ax.text(l_x0, l_y0, s=ln['text'], ha='left', va='top', fontsize=6)
+
+    # Draw Tables (Red)
+    for tbl in page.get("tables", []):
+        bx0, by0, bx1, by1 = tbl.get("bbox", [0, 0, 0, 0])
+        ax.add_patch(Rectangle((bx0, by0), bx1 - bx0, by1 - by0, fill=False, edgecolor='red', linewidth=1.2, alpha=0.7))
+        
+    ax.set_aspect('equal'); ax.invert_yaxis(); ax.axis('off')
+    
+    if save_path:
+        plt.savefig(save_path, bbox_inches='tight')
+        print(f"Saved visualization to {save_path}")
+    if show: plt.show()
+    plt.close(fig)
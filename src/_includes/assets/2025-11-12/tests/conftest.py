@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The pdf_* modules are flat scripts next to this folder, imported as `from pdf_x import ...`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,54 @@
+import pickle
+
+import fitz
+import pytest
+
+import pdf_cache
+import pdf_parser
+from pdf_cache import PageCache
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("cache") / "doc.pdf")
+    doc = fitz.open()
+    for i in range(12):
+        page = doc.new_page()
+        for j in range(30):
+            page.insert_text((72, 60 + j * 20), f"page {i} line {j} lorem ipsum dolor sit amet", fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+def test_worker_copies_share_one_connection_and_never_count(tmp_path):
+    owner = PageCache(str(tmp_path / "c.db"), max_bytes=1)
+    copies = [pickle.loads(pickle.dumps(owner)) for _ in range(3)]
+    try:
+        for i, c in enumerate(copies):
+            c.put("doc", i, "layout", "fp", b"x" * 1000)
+        assert copies[0]._db is copies[1]._db is copies[2]._db
+        assert all(c._total is None for c in copies)  # no SUM(size) scans on the worker side
+        assert owner.stats()["entries"] == 3  # and no eviction either: that is the owner's job
+        owner.trim()
+        assert owner.stats()["entries"] == 0
+        for c in copies: c.close()
+    finally:
+        owner.close()
+        pdf_cache.close_shared_connections()
+    assert not pdf_cache._shared
+
+def test_parallel_run_stays_within_max_bytes(pdf_path, tmp_path):
+    cache = PageCache(str(tmp_path / "c.db"), max_bytes=20_000)
+    try:
+        pdf_parser.analyze_pdf(pdf_path, str(tmp_path), workers=2, images="none", cache=cache)
+        assert 0 < cache.stats()["bytes"] <= 20_000
+    finally:
+        cache.close()
+
+def test_cache_opened_from_a_path_is_closed_after_the_run(pdf_path, tmp_path, monkeypatch):
+    closed = []
+    close = PageCache.close
+    monkeypatch.setattr(PageCache, "close", lambda self: closed.append(self._owner) or close(self))
+    for workers in (1, 2):
+        struct = pdf_parser.analyze_pdf(pdf_path, str(tmp_path), workers=workers, images="none", cache=str(tmp_path / "c.db"))
+        assert struct["page_count"] == 12
+    assert closed == [True, True]
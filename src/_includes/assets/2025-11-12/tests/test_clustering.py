@@ -0,0 +1,62 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from pdf_clustering import _ward_distance, cluster_1d, compare_engines
+
+def _runs(values, labels):
+    """Clusters as (size, sum) in sorted order; asserts that every cluster is a contiguous run."""
+    order = np.argsort(values, kind="stable")
+    xs, ls = values[order], labels[order]
+    assert np.all(np.diff(ls) >= 0), "clusters must be contiguous runs of the sorted values"
+    return [(int((ls == l).sum()), float(xs[ls == l].sum())) for l in range(ls.max() + 1)]
+
+def test_untied_inputs_match_sklearn():
+    pytest.importorskip("sklearn")
+    rng = np.random.default_rng(1)
+    for _ in range(500):
+        n = int(rng.integers(2, 60))
+        xs, threshold = rng.uniform(0, 500, n), float(rng.uniform(2, 80))
+        np.testing.assert_array_equal(cluster_1d(xs, threshold, "gap"), cluster_1d(xs, threshold, "sklearn"))
+
+def test_tied_inputs_are_valid_ward_cuts():
+    rng = np.random.default_rng(2)
+    for _ in range(500):
+        n = int(rng.integers(2, 60))
+        xs, threshold = np.round(rng.uniform(0, 100, n), 1), float(rng.uniform(2, 40))
+        labels = cluster_1d(xs, threshold, "gap")
+        for v in np.unique(xs):
+            assert len(set(labels[xs == v].tolist())) == 1, "equal values share a cluster"
+        runs = _runs(xs, labels)
+        # Stopped at the threshold: no two neighbouring clusters are closer than that
+        for (na, sa), (nb, sb) in zip(runs, runs[1:]):
+            assert _ward_distance(na, sa, nb, sb) >= threshold
+
+def test_tied_inputs_rarely_differ_from_sklearn():
+    pytest.importorskip("sklearn")
+    rng = np.random.default_rng(3)
+    differ = 0
+    for _ in range(1000):
+        n = int(rng.integers(2, 40))
+        xs, threshold = np.round(rng.uniform(0, 100, n), 1), float(rng.uniform(2, 40))
+        differ += not np.array_equal(cluster_1d(xs, threshold, "gap"), cluster_1d(xs, threshold, "sklearn"))
+    assert differ <= 10
+
+def test_equal_distances_merge_leftmost_pair_first():
+    # 0-1 and 1-2 tie; merging {0, 1} first leaves 2 at Ward distance sqrt(4/3) * 1.5 > 1.5
+    np.testing.assert_array_equal(cluster_1d([2.0, 0.0, 1.0], 1.5, "gap"), [1, 0, 0])
+
+def test_small_inputs_and_unknown_engine():
+    assert cluster_1d([], 10).tolist() == []
+    assert cluster_1d([5.0], 10).tolist() == [0]
+    with pytest.raises(ValueError):
+        cluster_1d([1.0, 2.0], 10, engine="kmeans")
+
+SAMPLE_PDFS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "*.pdf")))
+
+@pytest.mark.parametrize("pdf_path", SAMPLE_PDFS, ids=os.path.basename)
+def test_sample_pdfs_match_sklearn(pdf_path):
+    pytest.importorskip("sklearn")
+    assert compare_engines([pdf_path]), f"gap and sklearn labels differ on {os.path.basename(pdf_path)}"
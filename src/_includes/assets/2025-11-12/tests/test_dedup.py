@@ -0,0 +1,77 @@
+import fitz
+import numpy as np
+import pytest
+
+import pdf_parser
+from pdf_dedup import _MERSENNE, _PERM_A, _PERM_B, NUM_PERM, minhash, permute
+
+def _sets(n: int, jaccard: float, tag: str):
+    # |A| = |B| = n with |A & B| = k gives J = k / (2n - k)
+    k = int(round(2 * n * jaccard / (1 + jaccard)))
+    return {f"{tag}{i}" for i in range(n)}, {f"{tag}{i}" for i in range(n - k, 2 * n - k)}
+
+def test_permutations_are_exact_modular_arithmetic():
+    x = np.random.default_rng(0).integers(0, 1 << 32, 300, dtype=np.uint64)
+    x[:2] = 0, (1 << 32) - 1
+    expected = [[(int(a) * int(v) + int(b)) % _MERSENNE for v in x.tolist()] for a, b in zip(_PERM_A, _PERM_B)]
+    assert permute(x).tolist() == expected
+    # Different permutations pick different minima
+    assert len(set(permute(x).argmin(axis=1).tolist())) > NUM_PERM // 2
+
+@pytest.mark.parametrize("jaccard", [0.05, 0.2, 0.5, 0.8, 0.95])
+def test_minhash_tracks_jaccard(jaccard):
+    # One estimate is a mean of NUM_PERM Bernoulli(J) draws: within 3 standard deviations,
+    # and unbiased over several independent pairs
+    sd = np.sqrt(jaccard * (1 - jaccard) / NUM_PERM)
+    errors = []
+    for trial in range(10):
+        a, b = _sets(300, jaccard, f"t{trial}_")
+        true = len(a & b) / len(a | b)
+        errors.append(float(np.mean(minhash(a) == minhash(b))) - true)
+    assert max(abs(e) for e in errors) <= max(3 * sd, 0.05)
+    assert abs(np.mean(errors)) <= 0.05
+
+@pytest.fixture(scope="module")
+def report_pdf(tmp_path_factory):
+    """Running header, page-number footer, unique bodies; pages 11-16 repeat page 10, 18 nearly repeats 4."""
+    path = str(tmp_path_factory.mktemp("dedup") / "report.pdf")
+    doc = fitz.open()
+    words = "alpha beta gamma delta epsilon zeta eta theta iota kappa".split()
+    for i in range(24):
+        page = doc.new_page()
+        page.insert_text((60, 40), "ACME Corp - Annual Report 2025", fontsize=9)
+        page.insert_text((280, 820), f"Page {i + 1} of 24", fontsize=9)
+        body = 9 if 10 <= i <= 15 else 3 if i == 17 else i
+        rng = np.random.default_rng(body)
+        for j in range(30):
+            line = " ".join(rng.choice(words, 8))
+            if i == 17 and j == 29: line = "a different closing line"
+            page.insert_text((60, 90 + j * 22), f"Unique body {body} {line}", fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+def _flags(struct):
+    return [(p["page_number"], p.get("duplicate_of"), (p.get("near_duplicate_of") or {}).get("page_number"))
+            for p in struct["pages"]]
+
+def test_duplicate_flags_do_not_depend_on_workers(report_pdf, tmp_path):
+    serial = pdf_parser.analyze_pdf(report_pdf, str(tmp_path), images="none", dedup=True)
+    parallel = pdf_parser.analyze_pdf(report_pdf, str(tmp_path), workers=2, images="none", dedup=True)
+    assert parallel["pages"] == serial["pages"]
+    flags = {n: (dup, near) for n, dup, near in _flags(serial)}
+    assert all(flags[n] == (10, None) for n in range(11, 17))
+    assert flags[18] == (None, 4)
+    # Pages that only share the running header and footer are not near duplicates
+    assert all(flags[n] == (None, None) for n in list(range(1, 11)) + [17] + list(range(19, 25)))
+    assert all("_content_key" not in p for p in serial["pages"])
+
+def test_duplicate_flags_with_cache(report_pdf, tmp_path):
+    plain = pdf_parser.analyze_pdf(report_pdf, str(tmp_path), images="none", dedup=True)
+    cache = str(tmp_path / "cache.db")
+    for workers in (1, 2, 1):
+        struct = pdf_parser.analyze_pdf(report_pdf, str(tmp_path), workers=workers, images="none", cache=cache, dedup=True)
+        assert struct["pages"] == plain["pages"]
+    # A cached dedup run does not leak into a run without dedup
+    no_dedup = pdf_parser.analyze_pdf(report_pdf, str(tmp_path), images="none", cache=cache)
+    assert all("duplicate_of" not in p and "_content_key" not in p for p in no_dedup["pages"])
@@ -0,0 +1,39 @@
+import os
+import tracemalloc
+
+import pytest
+
+import pdf_parser
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test-pdf.pdf")
+
+@pytest.fixture(autouse=True)
+def no_tracing():
+    assert not tracemalloc.is_tracing()
+    yield
+    tracemalloc.stop()
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_memory_metrics_stop_tracing_when_the_document_is_done(workers, tmp_path):
+    struct = pdf_parser.analyze_pdf(PDF, str(tmp_path), workers=workers, images="none", metrics="memory")
+    assert "memory" in struct["pages"][0]["metrics"]
+    assert not tracemalloc.is_tracing()
+
+def test_extract_and_worker_chunks_stop_tracing(tmp_path):
+    struct = pdf_parser.extract_pdf_structure(PDF, str(tmp_path), images="none", metrics="memory")
+    assert "memory" in struct["pages"][0]["metrics"] and not tracemalloc.is_tracing()
+    opts = pdf_parser._run_options(PDF, str(tmp_path), "none", None, None, metrics="memory")
+    pages = pdf_parser._analyze_page_range(PDF, 0, 1, opts)
+    assert "memory" in pages[0]["metrics"] and not tracemalloc.is_tracing()
+
+def test_abandoned_document_stops_tracing(tmp_path):
+    pages = pdf_parser.iter_analyzed_pages(PDF, str(tmp_path), images="none", metrics="memory")
+    next(pages)
+    assert tracemalloc.is_tracing()
+    pages.close()
+    assert not tracemalloc.is_tracing()
+
+def test_tracing_started_by_the_caller_stays_on(tmp_path):
+    tracemalloc.start()
+    pdf_parser.analyze_pdf(PDF, str(tmp_path), images="none", metrics="memory")
+    assert tracemalloc.is_tracing()
@@ -0,0 +1,36 @@
+import glob
+import json
+import os
+
+import pytest
+
+import pdf_parser
+from pdf_bench import make_synthetic_pdf
+
+SAMPLE_PDFS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "*.pdf")))
+
+@pytest.mark.parametrize("pdf_path", SAMPLE_PDFS, ids=os.path.basename)
+def test_workers_give_byte_identical_json(pdf_path, tmp_path):
+    serial = json.dumps(pdf_parser.analyze_pdf(pdf_path, str(tmp_path)), ensure_ascii=False, indent=2)
+    for workers in (2, 3):
+        parallel = pdf_parser.analyze_pdf(pdf_path, str(tmp_path), workers=workers)
+        assert json.dumps(parallel, ensure_ascii=False, indent=2) == serial
+
+def test_workers_give_byte_identical_json_across_chunks(tmp_path):
+    # The sample PDFs are one page each; this one spreads over several chunks per worker
+    path = make_synthetic_pdf(str(tmp_path / "synthetic.pdf"), pages=20, spans_per_page=120, table_ruled=True,
+                              images_per_page=2, vectors_per_page=40)
+    serial = json.dumps(pdf_parser.analyze_pdf(path, str(tmp_path)), ensure_ascii=False, indent=2)
+    for workers in (2, 3):
+        parallel = pdf_parser.analyze_pdf(path, str(tmp_path), workers=workers)
+        assert json.dumps(parallel, ensure_ascii=False, indent=2) == serial
+
+@pytest.mark.parametrize("options", [{"params": {"space_scale": "a"}}, {"params": {"no_such_param": 1}},
+                                     {"images": "sometimes"}, {"cache": "/dev/null/cache.db"}])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bad_options_raise_before_the_document_is_opened(options, workers, tmp_path, monkeypatch):
+    opened = []
+    monkeypatch.setattr(pdf_parser, "_open_pdf", lambda path: opened.append(path))
+    with pytest.raises(Exception):
+        pdf_parser.analyze_pdf(SAMPLE_PDFS[0], str(tmp_path), workers=workers, **options)
+    assert not opened
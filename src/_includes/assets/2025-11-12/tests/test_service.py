@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from pdf_service import ExtractionService, iter_remote_pages
+
+@pytest.fixture
+def service(tmp_path):
+    """ExtractionService with one slot and one queue place, on an ephemeral port in a background loop."""
+    svc = ExtractionService(workers=1, max_concurrent=1, max_queue=1, timeout=60, output_dir=str(tmp_path / "svc"),
+                            cache=str(tmp_path / "cache.db"))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(svc.start("127.0.0.1", 0), loop).result(120)
+    yield svc, server.sockets[0].getsockname()[1]
+    async def stop():  # on the loop thread, which owns the cache connection
+        server.close()
+        svc.close()
+    asyncio.run_coroutine_threadsafe(stop(), loop).result(30)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+@pytest.fixture(scope="module")
+def pdf_bytes():
+    doc = fitz.open()
+    for i in range(60):
+        page = doc.new_page()
+        for j in range(40):
+            page.insert_text((72, 60 + j * 17), f"page {i} line {j} " + "lorem ipsum dolor sit amet " * 3, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def _upload(port, data, params=None):
+    try:
+        return list(iter_remote_pages(data=data, port=port, images="none", params=params, timeout=60))
+    except RuntimeError as e:
+        return str(e)
+
+def test_burst_beyond_the_queue_gets_429(service, pdf_bytes):
+    svc, port = service
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: _upload(port, pdf_bytes), range(8)))
+    rejected = [r for r in results if isinstance(r, str)]
+    done = [r for r in results if not isinstance(r, str)]
+    # Errors come back as answers (no connection resets), and at most slot + queue requests get in
+    assert all(r.startswith("429") for r in rejected), rejected
+    assert 1 <= len(done) <= 2 and len(rejected) == 8 - len(done)
+    assert all(r[-1].get("done") and r[-1]["page_count"] == 60 for r in done)
+    assert svc.rejected == len(rejected)
+
+def test_param_types_are_checked_before_analysis(service, pdf_bytes):
+    _, port = service
+    result = _upload(port, pdf_bytes, params={"space_scale": "a"})
+    assert isinstance(result, str) and result.startswith("400") and "space_scale" in result
+    assert _upload(port, pdf_bytes, params={"space_scale": 2.0})[-1].get("done")
@@ -0,0 +1,52 @@
+import fitz
+import numpy as np
+import pytest
+
+import pdf_parser
+from pdf_tables import grid_regions, ruled_tables
+
+def _frames(*rects):
+    """Horizontal (y, x0, x1) and vertical (x, y0, y1) edges of rectangle outlines."""
+    hor = [(y, x0, x1) for x0, y0, x1, y1 in rects for y in (y0, y1)]
+    ver = [(x, y0, y1) for x0, y0, x1, y1 in rects for x in (x0, x1)]
+    return np.array(hor, dtype=float), np.array(ver, dtype=float)
+
+def _grid(x0, y0, x1, y1, n_rows, n_cols):
+    ys, xs = np.linspace(y0, y1, n_rows + 1), np.linspace(x0, x1, n_cols + 1)
+    return (np.array([(y, x0, x1) for y in ys], dtype=float), np.array([(x, y0, y1) for x in xs], dtype=float))
+
+def test_overlapping_frames_are_not_a_grid():
+    # 4 x 4 edge positions, but only the shared middle cell is closed on all sides
+    assert grid_regions(*_frames((0, 0, 100, 100), (50, 50, 150, 150))) == []
+
+def test_grid_needs_two_by_two_closed_cells():
+    assert grid_regions(*_grid(0, 0, 200, 20, 1, 4)) == []
+    rows, cols = grid_regions(*_grid(0, 0, 200, 60, 3, 4))[0]
+    assert rows.tolist() == [0, 20, 40, 60] and cols.tolist() == [0, 50, 100, 150, 200]
+
+def test_grid_without_text_is_not_a_table():
+    hor, ver = _grid(0, 0, 200, 60, 3, 4)
+    assert ruled_tables(hor, ver, np.zeros(0), np.zeros(0), []) == []
+    table, = ruled_tables(hor, ver, np.array([75.0]), np.array([30.0]), ["x"])
+    assert table["rows"] == [["", "", "", ""], ["", "x", "", ""], ["", "", "", ""]]
+
+@pytest.fixture(scope="module")
+def framed_pdf(tmp_path_factory):
+    """A bordered ten-line paragraph with a bordered callout overlapping its lower right corner."""
+    path = str(tmp_path_factory.mktemp("tables") / "framed.pdf")
+    doc = fitz.open()
+    page = doc.new_page()
+    for j in range(10):
+        page.insert_text((80, 100 + j * 14), f"framed paragraph line {j} with some words in it", fontsize=10)
+    page.draw_rect(fitz.Rect(70, 85, 400, 245), color=(0, 0, 0), width=1)
+    page.draw_rect(fitz.Rect(300, 200, 520, 300), color=(0, 0, 0), width=1)
+    page.insert_text((320, 280), "Callout note", fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+def test_framed_paragraph_with_callout_stays_a_paragraph(framed_pdf, tmp_path):
+    for ruled in (True, False):
+        page = pdf_parser.analyze_pdf(framed_pdf, str(tmp_path), images="none", params={"ruled_tables": ruled})["pages"][0]
+        assert page["tables"] == []
+        assert [len(para) for para in page["paragraphs_by_col"][0]] == [10]
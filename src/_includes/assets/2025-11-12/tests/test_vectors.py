@@ -0,0 +1,42 @@
+import numpy as np
+
+from pdf_vectors import BOX, RULING, VectorTable
+
+def _stroked(*items):
+    return {"type": "s", "width": 1.0, "items": list(items)}
+
+def _rect(x0, y0, x1, y1):
+    return ("re", (x0, y0, x1, y1))
+
+def _line(x0, y0, x1, y1):
+    return ("l", (x0, y0), (x1, y1))
+
+def _lines(table):
+    hor, ver = table.ruling_lines()
+    return sorted(map(tuple, hor.tolist())), sorted(map(tuple, ver.tolist()))
+
+def test_isolated_boxes_are_not_rulings():
+    # A framed paragraph and an overlapping callout
+    table = VectorTable.from_drawings([_stroked(_rect(70, 85, 400, 245)), _stroked(_rect(300, 200, 520, 300))])
+    assert table.counts()["box"] == 2
+    hor, ver = table.ruling_lines()
+    assert hor.shape == (0, 3) and ver.shape == (0, 3)
+
+def test_rulings_and_grid_cell_edges():
+    # Two standalone rules, a 2 x 2 grid drawn cell by cell and one unrelated box
+    cells = [_stroked(_rect(x, y, x + 50, y + 20)) for x in (100, 150) for y in (300, 320)]
+    table = VectorTable.from_drawings([_stroked(_line(50, 100, 500, 100), _line(50, 200, 500, 200))] + cells
+                                      + [_stroked(_rect(400, 500, 450, 550))])
+    assert np.count_nonzero(table.data["kind"] == BOX) == 1
+    hor, ver = _lines(table)
+    assert hor == [(100, 50, 500), (200, 50, 500), (300, 100, 200), (320, 100, 200), (340, 100, 200)]
+    assert ver == [(100, 300, 340), (150, 300, 340), (200, 300, 340)]
+
+def test_table_frame_met_by_rulings_is_split():
+    frame = _stroked(_rect(50, 100, 350, 190))
+    rules = _stroked(_line(50, 130, 350, 130), _line(150, 100, 150, 190))
+    table = VectorTable.from_drawings([frame, rules])
+    assert np.all(table.data["kind"] == RULING)
+    hor, ver = _lines(table)
+    assert hor == [(100, 50, 350), (130, 50, 350), (190, 50, 350)]
+    assert ver == [(50, 100, 190), (150, 100, 190), (350, 100, 190)]